@@ -0,0 +1,121 @@
+# benchmarks/bench_artifacts.py
+"""
+ArtifactManager trên jobs_dir tạm với N thư mục job giả (main.py + stdout/stderr.log kiểu output chương trình
++ vài file job tự ghi).
+
+  settle  quét lúc khởi động (nén log, bỏ bản chép seccomp, đo du) của N job: jobs/s, dung lượng trước/sau
+  gc      retention hết hạn: 1 nửa số job xoá bằng rmtree trực tiếp (ms/job), nửa còn lại qua manager
+          (scan + rename vào .trash dưới lock + rmtree theo lô); rename = phần duy nhất giữ lock
+  read    đọc 64 KB cuối log (read_log_bytes, như /jobs/{id}/logs?offset=) trên log thường và .log.gz
+
+    PYTHONPATH=src python benchmarks/bench_artifacts.py -n 2000 --log-kb 256
+"""
+from __future__ import annotations
+import argparse, gzip, os, random, shutil, statistics, tempfile, time
+from pathlib import Path
+
+from sandbox.services.artifact_manager import ArtifactManager, _du
+from sandbox.services.artifact_store import ArtifactStore
+from sandbox.services.job_store import JobStore
+
+
+def _pct(xs: list[float], q: float) -> float:
+    xs = sorted(xs)
+    return xs[min(len(xs) - 1, int(q * len(xs)))]
+
+
+def make_jobs(art: ArtifactStore, n: int, log_kb: int):
+    rnd = random.Random(0)
+    words = [f"case {i}: ok value={rnd.randint(0, 1 << 20)}" for i in range(512)]
+    for i in range(n):
+        jid = f"job{i:06d}"
+        wd = art.job_workdir(jid)
+        wd.mkdir(parents=True)
+        art.write_code(jid, "main.py", "print(1)\n")
+        lines, size = [], 0
+        while size < log_kb << 10:
+            lines.append(rnd.choice(words))
+            size += len(lines[-1]) + 1
+        (wd / "stdout.log").write_text("\n".join(lines) + "\n")
+        (wd / "stderr.log").write_text("")
+        for name in ("_secwrap.py", "seccomp_helper.py", "seccomp.yaml"):
+            (wd / name).write_text("#" * 2048)
+        (wd / "out.dat").write_bytes(os.urandom(8192))
+
+
+def _wait(m: ArtifactManager, cond, timeout_s: float = 600.0):
+    end = time.monotonic() + timeout_s
+    while not cond(m.stats()) and time.monotonic() < end:
+        time.sleep(0.01)
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("-n", type=int, default=2000, help="số thư mục job")
+    ap.add_argument("--log-kb", type=int, default=256, help="kích thước stdout.log mỗi job")
+    ap.add_argument("--reads", type=int, default=500)
+    args = ap.parse_args()
+
+    root = Path(tempfile.mkdtemp(prefix="sbx-bench-artifacts-"))
+    try:
+        store = JobStore(f"sqlite:///{root}/jobs.db")  # rỗng -> mọi thư mục là ORPHAN
+        art = ArtifactStore(root / "jobs")
+        make_jobs(art, args.n, args.log_kb)
+        before = _du(art.jobs_dir)
+
+        # settle: scan lúc khởi động, retention 0 = giữ
+        m = ArtifactManager(art, store, interval_s=0.05)
+        t0 = time.monotonic()
+        m.start()
+        _wait(m, lambda st: st["scan_done"])
+        dt = time.monotonic() - t0
+        after = _du(art.jobs_dir)
+        st = m.stats()
+        m.close()
+        print(f"settle n={args.n} {dt:.2f}s ({args.n / dt:.0f} jobs/s) logs compressed={st['compressed_logs']} "
+              f"jobs_dir {before / 2**20:.1f}MB -> {after / 2**20:.1f}MB")
+
+        # read: tail 64KB, plain vs gz (cùng nội dung)
+        plain, gz = "job000000", "job000001"
+        packed = art.log_file(plain, "stdout")
+        art.log_path(plain, "stdout").write_bytes(gzip.decompress(packed.read_bytes()))
+        packed.unlink()
+        for name, jid in (("plain", plain), ("gz", gz)):
+            size = art.log_size(jid, "stdout")
+            ts = []
+            for _ in range(args.reads):
+                t1 = time.perf_counter()
+                art.read_log_bytes(jid, "stdout", max(0, size - (1 << 16)), 1 << 16)
+                ts.append(time.perf_counter() - t1)
+            print(f"read  {name:5s} tail 64KB of {size >> 10}KB p50={statistics.median(ts) * 1e3:.3f}ms "
+                  f"p99={_pct(ts, .99) * 1e3:.3f}ms")
+
+        # gc: thư mục ORPHAN lấy mtime làm lúc xong -> retention 1ms là hết hạn ngay
+        dirs = sorted(p for p in art.jobs_dir.iterdir() if not p.name.startswith("."))
+        half, rest = dirs[: args.n // 2], dirs[args.n // 2:]
+        t0 = time.monotonic()
+        for p in half:
+            shutil.rmtree(p)
+        direct = (time.monotonic() - t0) / len(half)
+        ren = []
+        for i, p in enumerate(rest[:100]):  # rename rồi trả về chỗ cũ: chỉ đo syscall
+            t1 = time.perf_counter()
+            os.rename(p, root / f"r{i}")
+            ren.append(time.perf_counter() - t1)
+            os.rename(root / f"r{i}", p)
+        m = ArtifactManager(art, store, retention={"default": 1e-3}, interval_s=0.05)
+        t0 = time.monotonic()
+        m.start()
+        _wait(m, lambda st: st["scan_done"] and not st["jobs"] and not st["trash_backlog"])
+        dt = time.monotonic() - t0
+        st = m.stats()
+        m.close()
+        n = max(1, st["deleted"]["retention"])
+        print(f"gc    rmtree direct {direct * 1e3:.3f}ms/job; rename p50={statistics.median(ren) * 1e3:.3f}ms; "
+              f"manager {st['deleted']['retention']} jobs in {dt:.2f}s ({dt / n * 1e3:.3f}ms/job)")
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
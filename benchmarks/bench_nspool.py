@@ -0,0 +1,144 @@
+# benchmarks/bench_nspool.py
+"""
+CHROOT mode (enable_loopback): namespace dựng theo job (unshare user/net/ipc/uts/pid/mnt + bật lo +
+sethostname trong preexec) so với NsPool (setns net/ipc/uts dựng sẵn, chỉ unshare user/mnt/pid).
+
+  step   riêng bước namespace trong process con (fork -> đo trong con), N lần liên tiếp
+  spawn  C thread gửi liên tục tổng N job /bin/true qua overlay launcher: spawn p50/p99 (Popen tới lúc
+         exec), jobs/s, hit/miss của pool. --gap-ms: nghỉ giữa 2 job của 1 thread (cho pool kịp dựng bù);
+         0 = dồn dập, pool hết thì unshare on-demand.
+
+    sudo USE_CGROUP=0 PYTHONPATH=src python benchmarks/bench_nspool.py -n 400 -c 4 --pool-size 16
+"""
+from __future__ import annotations
+import argparse, os, shutil, statistics, tempfile, threading, time
+from pathlib import Path
+
+from sandbox.executor.base import ExecSpec
+from sandbox.executor.ns_chroot import NsChrootExecutor
+from sandbox.executor.nspool import NsPool
+from sandbox.executor import rootfs
+from sandbox.executor.rootfs import OverlayRootfs
+
+from bench_rootfs import build_image
+
+
+def _pct(xs: list[float], q: float) -> float:
+    xs = sorted(xs)
+    return xs[min(len(xs) - 1, int(q * len(xs)))]
+
+
+def _ns_step(ns) -> float:
+    """Trong process con: đúng các bước namespace của launcher, trả về thời gian (giây)."""
+    uid, gid = os.getuid(), os.getgid()
+    t0 = time.perf_counter()
+    if ns is not None:
+        ns.enter()
+        rootfs.unshare(rootfs.CLONE_NEWUSER | rootfs.CLONE_NEWNS | rootfs.CLONE_NEWPID)
+    else:
+        rootfs.unshare(rootfs.CLONE_NEWUSER | rootfs.CLONE_NEWNS | rootfs.CLONE_NEWUTS | rootfs.CLONE_NEWIPC
+                       | rootfs.CLONE_NEWNET | rootfs.CLONE_NEWPID)
+    rootfs._write("/proc/self/setgroups", "deny")
+    rootfs._write("/proc/self/uid_map", f"0 {uid} 1")
+    rootfs._write("/proc/self/gid_map", f"0 {gid} 1")
+    if ns is None:
+        rootfs._check(rootfs._libc.sethostname(b"sandbox", 7), "sethostname")
+        rootfs._loopback_up()
+    return time.perf_counter() - t0
+
+
+def bench_step(mode: str, n: int) -> dict:
+    pool = NsPool(n, 0, enable_loopback=True) if mode == "pool" else None
+    if pool is not None:
+        pool.start()
+        while pool.stats()["idle"] < n:
+            time.sleep(0.01)
+    ts = []
+    for _ in range(n):
+        ns = pool.acquire() if pool is not None else None
+        r, w = os.pipe()
+        pid = os.fork()
+        if pid == 0:
+            os.close(r)
+            os.write(w, repr(_ns_step(ns)).encode())
+            os._exit(0)
+        os.close(w)
+        ts.append(float(os.read(r, 64)))
+        os.close(r)
+        os.waitpid(pid, 0)
+        if ns is not None:
+            pool.release(ns)
+    if pool is not None:
+        pool.close()
+    return {"p50_ms": statistics.median(ts) * 1e3, "p99_ms": _pct(ts, .99) * 1e3}
+
+
+def bench(mode: str, n: int, conc: int, gap_s: float, pool_size: int, base: Path, root: Path) -> dict:
+    pool = NsPool(pool_size, max(1, pool_size // 4), enable_loopback=True) if mode == "pool" else None
+    overlay = OverlayRootfs(base, root / "scratch", "16m", noexec_work=False, enable_loopback=True)
+    ex = NsChrootExecutor(base, noexec_work=False, overlay=overlay, ns_pool=pool)
+    if pool is not None:
+        pool.start()
+        while pool.stats()["idle"] < pool_size:  # bắt đầu với pool đầy
+            time.sleep(0.01)
+    spawn: list[float] = []
+    rcs: dict[int, int] = {}
+    lock = threading.Lock()
+    per = n // conc
+
+    def worker(w: int):
+        for i in range(per):
+            wd = root / f"{mode}-{w}-{i}"
+            ctx = ex.prepare(f"bench-{mode}-{w}-{i}", wd, {}, seccomp=False)
+            rc = ex.run(ctx, ExecSpec(cmd=["/bin/true"], workdir=wd, env={}, timeout_s=10))
+            with lock:
+                spawn.append(ctx.timings["spawn"])
+                rcs[rc] = rcs.get(rc, 0) + 1
+            ex.cleanup(ctx)
+            shutil.rmtree(wd, ignore_errors=True)
+            if gap_s:
+                time.sleep(gap_s)
+
+    t0 = time.monotonic()
+    ts = [threading.Thread(target=worker, args=(w,)) for w in range(conc)]
+    for t in ts:
+        t.start()
+    for t in ts:
+        t.join()
+    wall = time.monotonic() - t0
+    st = pool.stats() if pool is not None else {}
+    if pool is not None:
+        pool.close()
+    return {"spawn_p50_ms": statistics.median(spawn) * 1e3, "spawn_p99_ms": _pct(spawn, .99) * 1e3,
+            "jobs_per_s": len(spawn) / wall, "rcs": rcs, "hits": st.get("hits"), "misses": st.get("misses"),
+            "create_ms": st.get("create_ms_avg")}
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("-n", type=int, default=400, help="tổng số job")
+    ap.add_argument("-c", type=int, default=4, help="số thread gửi job cùng lúc")
+    ap.add_argument("--gap-ms", type=float, default=0)
+    ap.add_argument("--pool-size", type=int, default=16)
+    ap.add_argument("--base", type=Path, default=None, help="image có sẵn (phải chứa /bin/true)")
+    args = ap.parse_args()
+
+    root = Path(tempfile.mkdtemp(prefix="sbx-bench-nspool-"))
+    try:
+        base = args.base or build_image(root / "image", 1)
+        (root / "scratch").mkdir()
+        for mode in ("ondemand", "pool"):
+            r = bench_step(mode, args.n)
+            print(f"step  {mode:8s} n={args.n} namespace setup p50={r['p50_ms']:.3f}ms p99={r['p99_ms']:.3f}ms")
+        for mode in ("ondemand", "pool"):
+            r = bench(mode, args.n, args.c, args.gap_ms / 1000, args.pool_size, base, root)
+            extra = (f" hits={r['hits']} misses={r['misses']} create avg={r['create_ms']:.2f}ms"
+                     if mode == "pool" else "")
+            print(f"spawn {mode:8s} n={args.n} c={args.c} spawn p50={r['spawn_p50_ms']:.2f}ms "
+                  f"p99={r['spawn_p99_ms']:.2f}ms jobs/s={r['jobs_per_s']:.0f} rc={r['rcs']}{extra}")
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
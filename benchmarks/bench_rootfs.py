@@ -0,0 +1,147 @@
+# benchmarks/bench_rootfs.py
+"""
+CHROOT mode: overlay (image read-only + upper tmpfs mỗi job, launcher trong preexec) so với cách cũ
+(unshare + bash: bind /work, mount proc, remount, chroot, umount).
+
+  setup  thời gian spawn (Popen tới lúc exec lệnh của job) của N job /bin/true chạy lần lượt
+  cache  N job chạy cùng lúc, mỗi job đọc hết 1 file lớn trong image: Cached (page cache) tăng bao nhiêu
+         so với N x kích thước file, Shmem (tmpfs upper) tăng bao nhiêu
+
+Không chỉ định --base thì dựng 1 image nhỏ (bash, coreutils cần dùng + thư viện theo ldd) trong thư mục tạm.
+
+    sudo USE_CGROUP=0 PYTHONPATH=src python benchmarks/bench_rootfs.py -n 200 --jobs 16 --blob-mb 64
+"""
+from __future__ import annotations
+import argparse, os, shutil, statistics, subprocess, tempfile, time
+from pathlib import Path
+
+from sandbox.executor.base import ExecSpec
+from sandbox.executor.ns_chroot import NsChrootExecutor
+from sandbox.executor.rootfs import OverlayRootfs
+
+TOOLS = ("/bin/bash", "/bin/true", "/bin/cat", "/bin/sleep", "/bin/mkdir")
+
+
+def _pct(xs: list[float], q: float) -> float:
+    xs = sorted(xs)
+    return xs[min(len(xs) - 1, int(q * len(xs)))]
+
+
+def _meminfo(key: str) -> int:
+    with open("/proc/meminfo") as f:
+        for line in f:
+            if line.startswith(key + ":"):
+                return int(line.split()[1]) * 1024
+    return 0
+
+
+def build_image(dst: Path, blob_mb: int) -> Path:
+    """Image tối thiểu: TOOLS + mọi .so theo ldd, giữ nguyên đường dẫn; /blob.bin để đo page cache."""
+    files = set()
+    for tool in TOOLS:
+        real = os.path.realpath(tool)
+        files.add(real)
+        out = subprocess.run(["ldd", real], capture_output=True, text=True).stdout
+        for line in out.splitlines():
+            parts = line.split()
+            for p in parts:
+                if p.startswith("/"):
+                    files.add(p)
+    for f in files:
+        target = dst / f.lstrip("/")
+        target.parent.mkdir(parents=True, exist_ok=True)
+        shutil.copy2(os.path.realpath(f), target)
+    for d in ("bin", "lib", "lib64"):
+        if not (dst / d).exists() and (dst / "usr" / d).exists():
+            os.symlink(f"usr/{d}", dst / d)
+    (dst / "bin").mkdir(exist_ok=True)
+    for tool in TOOLS:
+        link = dst / tool.lstrip("/")
+        if not link.exists():
+            link.symlink_to(os.path.realpath(tool))
+    for d in ("proc", "work", "tmp"):
+        (dst / d).mkdir(exist_ok=True)
+    with open(dst / "blob.bin", "wb") as f:
+        chunk = os.urandom(1 << 20)
+        for _ in range(blob_mb):
+            f.write(chunk)
+    return dst
+
+
+def _executor(mode: str, base: Path, scratch: Path) -> NsChrootExecutor:
+    overlay = OverlayRootfs(base, scratch, "16m", noexec_work=False) if mode == "overlay" else None
+    return NsChrootExecutor(base, noexec_work=False, overlay=overlay)
+
+
+def bench_setup(mode: str, n: int, base: Path, scratch: Path, root: Path) -> dict:
+    ex = _executor(mode, base, scratch)
+    spawn, total, rcs = [], [], {}
+    for i in range(n):
+        wd = root / f"{mode}-setup-{i}"
+        ctx = ex.prepare(f"bench-{mode}-{i}", wd, {}, seccomp=False)
+        t0 = time.monotonic()
+        rc = ex.run(ctx, ExecSpec(cmd=["/bin/true"], workdir=wd, env={}, timeout_s=10))
+        total.append(time.monotonic() - t0)
+        spawn.append(ctx.timings["spawn"])
+        rcs[rc] = rcs.get(rc, 0) + 1
+        ex.cleanup(ctx)
+        shutil.rmtree(wd, ignore_errors=True)
+    return {"spawn_p50_ms": statistics.median(spawn) * 1e3, "spawn_p99_ms": _pct(spawn, .99) * 1e3,
+            "total_p50_ms": statistics.median(total) * 1e3, "rcs": rcs}
+
+
+def bench_cache(jobs: int, base: Path, scratch: Path, root: Path) -> dict:
+    blob = base / "blob.bin"
+    size = blob.stat().st_size
+    fd = os.open(blob, os.O_RDONLY)
+    os.fsync(fd)  # trang vừa ghi còn dirty thì DONTNEED không bỏ được
+    os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_DONTNEED)  # bắt đầu lạnh: file chưa nằm trong page cache
+    os.close(fd)
+    ex = _executor("overlay", base, scratch)
+    cached0, shmem0 = _meminfo("Cached"), _meminfo("Shmem")
+    ps = []
+    for i in range(jobs):
+        wd = root / f"cache-{i}"
+        wd.mkdir(parents=True)
+        ctx = ex.prepare(f"bench-cache-{i}", wd, {}, seccomp=False)
+        # đọc hết file rồi ghi 1 file nhỏ vào "/" (upper tmpfs), giữ job sống để đo lúc tất cả đang chạy
+        spec = ExecSpec(cmd=["/bin/bash", "-c", "cat /blob.bin > /dev/null; echo x > /tmp/x; sleep 2"],
+                        workdir=wd, env={}, timeout_s=30)
+        ps.append((ctx, ex._spawn(ctx, spec)[0]))
+    time.sleep(1.5)
+    cached1, shmem1 = _meminfo("Cached"), _meminfo("Shmem")
+    for ctx, p in ps:
+        p.wait()
+        ex.cleanup(ctx)
+    return {"blob_mb": size / 2**20, "jobs": jobs, "cached_delta_mb": (cached1 - cached0) / 2**20,
+            "unshared_mb": jobs * size / 2**20, "shmem_delta_mb": (shmem1 - shmem0) / 2**20}
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("-n", type=int, default=100, help="số job /bin/true cho phần setup")
+    ap.add_argument("--jobs", type=int, default=8, help="số job chạy cùng lúc cho phần page cache")
+    ap.add_argument("--blob-mb", type=int, default=64)
+    ap.add_argument("--base", type=Path, default=None, help="image có sẵn (phải chứa /bin/bash, /blob.bin)")
+    args = ap.parse_args()
+
+    root = Path(tempfile.mkdtemp(prefix="sbx-bench-rootfs-"))
+    try:
+        base = args.base or build_image(root / "image", args.blob_mb)
+        scratch = root / "scratch"
+        scratch.mkdir()
+        for mode in ("overlay", "legacy"):
+            # legacy mkdir + bind thẳng vào image dùng chung -> chạy trên bản sao cho image gốc sạch
+            b = base if mode == "overlay" else Path(shutil.copytree(base, root / "legacy-image", symlinks=True))
+            r = bench_setup(mode, args.n, b, scratch, root)
+            print(f"setup {mode:8s} n={args.n} spawn p50={r['spawn_p50_ms']:.2f}ms p99={r['spawn_p99_ms']:.2f}ms "
+                  f"run(/bin/true) p50={r['total_p50_ms']:.2f}ms rc={r['rcs']}")
+        r = bench_cache(args.jobs, base, scratch, root)
+        print(f"cache overlay jobs={r['jobs']} blob={r['blob_mb']:.0f}MB: Cached +{r['cached_delta_mb']:.1f}MB "
+              f"(unshared would be {r['unshared_mb']:.0f}MB), Shmem(upper tmpfs) +{r['shmem_delta_mb']:.2f}MB")
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
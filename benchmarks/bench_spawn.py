@@ -0,0 +1,57 @@
+# benchmarks/bench_spawn.py
+"""
+So sánh độ trễ spawn: "attach" (Popen rồi parent ghi pid vào cgroup.procs)
+với "preexec" (child tự join leaf trước exec).
+
+    sudo USE_CGROUP=1 PYTHONPATH=src python benchmarks/bench_spawn.py -n 200
+    USE_CGROUP=0 PYTHONPATH=src python benchmarks/bench_spawn.py   # chỉ đo Popen, không có cgroup
+"""
+from __future__ import annotations
+import argparse, os, statistics, subprocess, time, uuid
+
+from sandbox.executor.cgroups import attach, create_leaf, open_procs_fd, teardown
+from sandbox.executor.ns_chroot import NsChrootExecutor
+
+
+def _one(leaf, mode: str, argv: list[str]) -> tuple[float, float]:
+    t0 = time.perf_counter()
+    cg_fd = open_procs_fd(leaf) if mode == "preexec" else None
+    try:
+        p = subprocess.Popen(argv, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+                             preexec_fn=NsChrootExecutor._preexec_set_rlimits(None, None, cg_fd))
+    finally:
+        if cg_fd is not None:
+            os.close(cg_fd)
+    if mode == "attach":
+        attach(leaf, p.pid)
+    t_spawn = time.perf_counter() - t0
+    p.wait()
+    return t_spawn, time.perf_counter() - t0
+
+
+def _pct(xs: list[float], q: float) -> float:
+    xs = sorted(xs)
+    return xs[min(len(xs) - 1, int(q * len(xs)))]
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("-n", type=int, default=100)
+    ap.add_argument("--cmd", default="/bin/true")
+    args = ap.parse_args()
+
+    for mode in ("attach", "preexec"):
+        leaf = create_leaf(f"bench-{mode}-{uuid.uuid4().hex[:6]}")
+        spawn, total = [], []
+        try:
+            for _ in range(args.n):
+                a, b = _one(leaf, mode, [args.cmd])
+                spawn.append(a * 1e3); total.append(b * 1e3)
+        finally:
+            teardown(leaf)
+        print(f"{mode:8s} spawn p50={statistics.median(spawn):.3f}ms p95={_pct(spawn, .95):.3f}ms | "
+              f"exit p50={statistics.median(total):.3f}ms p95={_pct(total, .95):.3f}ms (n={args.n})")
+
+
+if __name__ == "__main__":
+    main()
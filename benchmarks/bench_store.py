@@ -0,0 +1,124 @@
+# benchmarks/bench_store.py
+"""
+JobStore dưới tải: W thread ghi đi hết vòng đời job (add -> get -> RUNNING -> FINISHED) trong khi
+R thread đọc trạng thái job ngẫu nhiên (kiểu client poll GET /jobs/{id}) + thỉnh thoảng 1 trang GET /jobs.
+
+  legacy  rollback journal, mỗi update 1 commit, mọi get đọc DB (như trước)
+  tuned   WAL + synchronous=NORMAL, update gom theo --coalesce-ms, job QUEUED/RUNNING đọc từ RAM
+
+    PYTHONPATH=src python benchmarks/bench_store.py -n 3000 --writers 8 --readers 8
+"""
+from __future__ import annotations
+import argparse, random, shutil, tempfile, threading, time, uuid
+from datetime import datetime
+from pathlib import Path
+
+from sqlalchemy.exc import OperationalError
+
+from sandbox.services.job_store import Job, JobStatus, JobStore
+
+
+def _pct(xs: list[float], q: float) -> float:
+    xs = sorted(xs)
+    return xs[min(len(xs) - 1, int(q * len(xs)))] if xs else float("nan")
+
+
+def bench(mode: str, n: int, writers: int, readers: int, coalesce_ms: float, interval_s: float, root: Path) -> dict:
+    url = f"sqlite:///{root / (mode + '.db')}"
+    if mode == "legacy":
+        store = JobStore(url, wal=False, coalesce_ms=0, active_cache=False)
+    else:
+        store = JobStore(url, coalesce_ms=coalesce_ms)
+    ids: list[str] = []
+    get_lat: list[float] = []
+    list_lat: list[float] = []
+    errors: list[str] = []  # "database is locked" khi writer chờ quá busy timeout
+    stop = threading.Event()
+    per_writer = n // writers
+
+    def writer():
+        for _ in range(per_writer):
+            job_id = uuid.uuid4().hex[:12]
+            try:
+                store.add(Job(id=job_id, status=JobStatus.QUEUED, created_at=datetime.utcnow()))
+                ids.append(job_id)
+                job = store.get(job_id)
+                job.status = JobStatus.RUNNING; job.started_at = datetime.utcnow()
+                store.update(job)
+                job.status = JobStatus.FINISHED; job.exit_code = 0; job.finished_at = datetime.utcnow()
+                store.update(job)
+            except OperationalError as e:
+                errors.append(str(e.orig))
+
+    def reader():
+        rnd = random.Random()
+        k = 0
+        while not stop.is_set():
+            if not ids:
+                time.sleep(0.001)
+                continue
+            job_id = ids[-1 - rnd.randrange(min(len(ids), 64))]  # job mới: phần lớn đang QUEUED/RUNNING
+            t0 = time.perf_counter()
+            try:
+                store.get(job_id)
+            except OperationalError as e:
+                errors.append(str(e.orig))
+                continue
+            get_lat.append(time.perf_counter() - t0)
+            time.sleep(interval_s)
+            k += 1
+            if k % 50 == 0:
+                t0 = time.perf_counter()
+                store.list_jobs(statuses=[JobStatus.FINISHED], limit=50)
+                list_lat.append(time.perf_counter() - t0)
+
+    rs = [threading.Thread(target=reader, daemon=True) for _ in range(readers)]
+    ws = [threading.Thread(target=writer) for _ in range(writers)]
+    for t in rs:
+        t.start()
+    t0 = time.monotonic()
+    for t in ws:
+        t.start()
+    for t in ws:
+        t.join()
+    store.flush()
+    wall = time.monotonic() - t0
+    stop.set()
+    for t in rs:
+        t.join()
+    st = store.stats()
+    store.close()
+    done = per_writer * writers
+    return {
+        "mode": mode, "jobs": done, "errors": len(errors), "wall_s": wall, "jobs_per_s": done / wall,
+        "commits": st["commits"], "commits_per_s": st["commits"] / wall, "updates": st["updates"],
+        "get_p50_us": _pct(get_lat, .5) * 1e6, "get_p99_us": _pct(get_lat, .99) * 1e6, "reads": len(get_lat),
+        "list_p50_ms": _pct(list_lat, .5) * 1e3, "list_p99_ms": _pct(list_lat, .99) * 1e3,
+    }
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("-n", type=int, default=2000, help="số job (mỗi job: 1 insert + 2 update)")
+    ap.add_argument("--writers", type=int, default=8)
+    ap.add_argument("--readers", type=int, default=8)
+    ap.add_argument("--coalesce-ms", type=float, default=5)
+    ap.add_argument("--read-interval-ms", type=float, default=1, help="nghỉ giữa 2 lần đọc của 1 reader (client poll)")
+    ap.add_argument("--mode", choices=("legacy", "tuned", "both"), default="both")
+    args = ap.parse_args()
+
+    modes = ("legacy", "tuned") if args.mode == "both" else (args.mode,)
+    root = Path(tempfile.mkdtemp(prefix="sbx-bench-store-"))
+    try:
+        for mode in modes:
+            r = bench(mode, args.n, args.writers, args.readers, args.coalesce_ms, args.read_interval_ms / 1000, root)
+            print(f"{r['mode']:7s} jobs={r['jobs']} wall={r['wall_s']:.2f}s jobs/s={r['jobs_per_s']:.0f} "
+                  f"commits={r['commits']} ({r['commits_per_s']:.0f}/s) for {r['updates']} updates | "
+                  f"get p50={r['get_p50_us']:.0f}us p99={r['get_p99_us']:.0f}us ({r['reads']} reads) | "
+                  f"list p50={r['list_p50_ms']:.2f}ms p99={r['list_p99_ms']:.2f}ms | errors={r['errors']}")
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
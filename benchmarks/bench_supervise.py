@@ -0,0 +1,114 @@
+# benchmarks/bench_supervise.py
+"""
+Bao nhiêu job đang chạy 1 process service giám sát được: N job "ngủ" chạy cùng lúc qua NsChrootExecutor.
+
+  threads     1 thread chặn trong run() cho mỗi job (kiểu cũ)
+  supervisor  start() + Supervisor: 1 vòng lặp epoll (pidfd + timer deadline) cho mọi job
+
+In ra: wall time, số thread lúc đỉnh, VmHWM của service, độ trễ phát hiện exit (lúc job xong - lúc
+đáng lẽ xong) p50/p99.
+
+    USE_CGROUP=0 PYTHONPATH=src python benchmarks/bench_supervise.py -n 500 --sleep 2
+    sudo USE_CGROUP=1 PYTHONPATH=src python benchmarks/bench_supervise.py -n 1000 --mode supervisor
+"""
+from __future__ import annotations
+import argparse, resource, shutil, statistics, tempfile, threading, time
+from pathlib import Path
+
+from sandbox.executor.base import ExecSpec
+from sandbox.executor.ns_chroot import NsChrootExecutor
+from sandbox.executor.supervisor import Supervisor
+
+
+def _status(key: str) -> int:
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith(key + ":"):
+                return int(line.split()[1])
+    return 0
+
+
+def _pct(xs: list[float], q: float) -> float:
+    xs = sorted(xs)
+    return xs[min(len(xs) - 1, int(q * len(xs)))]
+
+
+def bench(mode: str, n: int, sleep_s: float, timeout_s: float, root: Path) -> dict:
+    sup = Supervisor(completion_threads=4) if mode == "supervisor" else None
+    ex = NsChrootExecutor(Path("/nonexistent-rootfs"), supervisor=sup)
+    if sup is not None:
+        sup.start()
+    lags: list[float] = []
+    rcs: dict[int, int] = {}
+    lock = threading.Lock()
+    all_done = threading.Event()
+    peak_threads = threading.active_count()
+
+    def finished(i: int, ctx, rc, due: float):
+        lag = time.monotonic() - due
+        ex.cleanup(ctx)
+        with lock:
+            lags.append(lag)
+            rcs[rc] = rcs.get(rc, 0) + 1
+            if len(lags) == n:
+                all_done.set()
+
+    def one(i: int):
+        wd = root / f"{mode}-{i}"
+        ctx = ex.prepare(f"bench-{mode}-{i}", wd, {}, seccomp=False)
+        spec = ExecSpec(cmd=["/bin/sleep", str(sleep_s)], workdir=wd, env={}, timeout_s=timeout_s)
+        due = time.monotonic() + min(sleep_s, timeout_s)
+        if mode == "supervisor":
+            ok = ex.start(ctx, spec, lambda rc, exc: finished(i, ctx, rc if exc is None else -1, due))
+            assert ok, "supervisor not available (pidfd_open)"
+        else:
+            finished(i, ctx, ex.run(ctx, spec), due)
+
+    t0 = time.monotonic()
+    threads = []
+    for i in range(n):
+        if mode == "supervisor":
+            one(i)
+        else:
+            t = threading.Thread(target=one, args=(i,), daemon=True)
+            t.start()
+            threads.append(t)
+        peak_threads = max(peak_threads, threading.active_count())
+    while not all_done.wait(0.05):
+        peak_threads = max(peak_threads, threading.active_count())
+    wall = time.monotonic() - t0
+    if sup is not None:
+        sup.close()
+    return {
+        "mode": mode, "n": n, "wall_s": wall, "peak_threads": peak_threads,
+        "lag_p50_ms": statistics.median(lags) * 1e3, "lag_p99_ms": _pct(lags, .99) * 1e3, "rcs": rcs,
+    }
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("-n", type=int, default=300, help="số job chạy cùng lúc")
+    ap.add_argument("--sleep", type=float, default=2.0)
+    ap.add_argument("--timeout", type=float, default=10.0, help="< --sleep để đo cả đường kill theo deadline")
+    ap.add_argument("--mode", choices=("threads", "supervisor", "both"), default="both")
+    args = ap.parse_args()
+
+    # mỗi job giữ vài fd (pidfd, leaf...) -> nâng soft limit cho n lớn
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))
+
+    modes = ("supervisor", "threads") if args.mode == "both" else (args.mode,)
+    root = Path(tempfile.mkdtemp(prefix="sbx-bench-sup-"))
+    try:
+        for mode in modes:
+            hwm0 = _status("VmHWM")
+            r = bench(mode, args.n, args.sleep, args.timeout, root)
+            print(f"{r['mode']:10s} n={r['n']} wall={r['wall_s']:.2f}s threads(peak)={r['peak_threads']} "
+                  f"VmHWM={_status('VmHWM') / 1024:.1f}MB (+{(_status('VmHWM') - hwm0) / 1024:.1f}) "
+                  f"exit lag p50={r['lag_p50_ms']:.2f}ms p99={r['lag_p99_ms']:.2f}ms rc={r['rcs']}")
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -40,13 +40,13 @@ function moveHighlight(activeTab) {
     highlight.style.left = (rect.left - containerRect.left) + "px";
 }
 moveHighlight(document.querySelector(".tab.active"));
-async function create_job(entry, code) {
+async function create_job(entry, code, lang = "python") {
     const rest = await fetch("http://127.0.0.1:8000/jobs", {
         method: "POST",
         headers: {
             "Content-Type": "application/json",
         },
-        body: JSON.stringify({ entry, code }),
+        body: JSON.stringify({ entry, code, lang, priority: "interactive" }), // chạy từ editor: lấy trước job chấm hàng loạt
     });
 
     if (!rest.ok) {
@@ -95,12 +95,14 @@ function showinfo(tab, status) {
     // stdouttext.textContent = 
 }
 
+const TERMINAL = ["FINISHED", "FAILED", "TIMEOUT", "KILLED", "OOM", "PIDS_LIMIT"];
+
 function Displaylog(Logs, status) {
     const { stdout, stderr } = Logs;
     stdouttext.textContent = stdout || "No result";
     stderrtext.textContent = stderr || "No error";
 
-    if (status === 'FAILED' || status === 'FINISHED') { // So sánh đúng với '==='
+    if (TERMINAL.includes(status)) {
         statustext.textContent = `Status: ${status}`;
     } else {
         statustext.textContent = `Status: ${status} - Waiting`;
@@ -139,7 +141,8 @@ function ChangeTab(tab) {
 runbtn.addEventListener("click", async () => {
     
     const code = code_input.value.trim(); // 'ariaValueText' thành 'value'
-    const entry = "main.py";
+    const lang = langselect.value.toLowerCase(); // python | c | java
+    const entry = { python: "main.py", c: "main.c", java: "Main.java" }[lang];
     if (!code) {
         alert("Nhập code đi đừng ngại nữa!");
         return;
@@ -149,15 +152,44 @@ runbtn.addEventListener("click", async () => {
     statustext.textContent = "Đang tạo job...";
 
     try {
-        const jobid = await create_job(entry, code); // Thêm await để đợi kết quả
+        const jobid = await create_job(entry, code, lang); // Thêm await để đợi kết quả
         await runjob(jobid); // Thêm await để đợi kết quả
-        pollJobStatus(jobid); // Poll trạng thái job
+        if (window.EventSource) {
+            streamJob(jobid); // Nhận log + trạng thái qua SSE, không cần poll
+        } else {
+            pollJobStatus(jobid); // Poll trạng thái job
+        }
     } catch (error) {
         console.error(error);
         stderrtext.textContent = error.message || "Unknown error";
     }
 });
 
+function streamJob(jobid) {
+    const logs = { stdout: "", stderr: "" };
+    let status = "QUEUED";
+    const es = new EventSource(`${Base_url}/jobs/${jobid}/stream`);
+
+    es.addEventListener("stdout", (e) => {
+        logs.stdout += JSON.parse(e.data).data;
+        Displaylog(logs, status);
+    });
+    es.addEventListener("stderr", (e) => {
+        logs.stderr += JSON.parse(e.data).data;
+        Displaylog(logs, status);
+    });
+    es.addEventListener("status", (e) => {
+        status = JSON.parse(e.data).status;
+        Displaylog(logs, status);
+    });
+    es.addEventListener("end", (e) => {
+        status = JSON.parse(e.data).status;
+        Displaylog(logs, status);
+        es.close();
+    });
+    // EventSource tự kết nối lại với Last-Event-ID (offset log) nếu mất kết nối
+}
+
 async function pollJobStatus(jobid) {
     const interval = setInterval(async () => {
         try {
@@ -168,7 +200,7 @@ async function pollJobStatus(jobid) {
             const logs = await getLog(jobid);
             Displaylog(logs, status);
 
-            if (status === 'FINISHED' || status === 'FAILED') {
+            if (TERMINAL.includes(status)) {
                 clearInterval(interval);
             }
         } catch (error) {
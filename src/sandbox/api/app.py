@@ -1,12 +1,52 @@
-from fastapi import FastAPI, HTTPException 
+import asyncio, gzip, json, math, time
+from datetime import datetime
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, HTTPException, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import FileResponse, PlainTextResponse, StreamingResponse
 from pydantic import BaseModel
-from ..services.job_store import JobStore
+from ..services.admission import AdmissionController, Saturated, psi_files
+from ..services.artifact_store import LOG_STREAMS, utf8_safe_len
+from ..services.events import TERMINAL
+from ..services.job_store import JobStatus, JobStore
+from ..services.metrics import render_gauge
 from ..services.orchestrator import Orchestrator
+from ..services.scheduler import JobScheduler
+from ..settings import LiveSettings
 
-app = FastAPI(title="Sandbox Pro-Lite")
-store = JobStore()
-orc = Orchestrator(store)
+settings = LiveSettings()  # parse + validate 1 lần, reload khi sandbox.yaml / limits.yaml đổi
+_s = settings.current
+store = JobStore(_s.store_url, wal=_s.store_wal, synchronous=_s.store_synchronous,
+                 busy_timeout_ms=_s.store_busy_timeout_ms, coalesce_ms=_s.store_coalesce_ms,
+                 active_cache=_s.store_active_cache)
+orc = Orchestrator(store, settings)
+admission = (AdmissionController(
+    memory_budget=orc.s.admission_memory_budget,
+    cpu_budget=orc.s.admission_cpu_budget,
+    psi=psi_files(),
+    cpu_some_max=orc.s.admission_cpu_some_max,
+    memory_some_max=orc.s.admission_memory_some_max,
+    memory_full_reject=orc.s.admission_memory_full_reject,
+    max_wait_s=orc.s.admission_max_wait_s,
+) if orc.s.admission_enabled else None)
+sched = JobScheduler(orc, store, workers=orc.s.scheduler_workers, max_queue=orc.s.scheduler_max_queue,
+                     max_running=orc.s.scheduler_max_running, admission=admission)
+
+
+@asynccontextmanager
+async def lifespan(_app: FastAPI):
+    settings.start()
+    orc.start()
+    sched.start()
+    yield
+    sched.stop()
+    settings.close()
+    orc.close()
+    store.close()
+
+
+app = FastAPI(title="Sandbox Pro-Lite", lifespan=lifespan)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["http://127.0.0.1:5500", "http://127.0.0.1:8080", "http://localhost:63342",],  # Đảm bảo các cổng frontend đúng
@@ -16,38 +56,442 @@ app.add_middleware(
 )
 
 
+class CaseReq(BaseModel):
+    stdin: str = ""
+    expected: str | None = None       # None: chỉ xét exit code / timeout
+    time_limit_s: float | None = None  # None: default_timeout_s
+
 class JobReq(BaseModel):
     code: str
-    entry: str = "main.py"
+    entry: str | None = None  # mặc định theo lang: main.py / main.c / Main.java
+    lang: str = "python"      # python | c | java
+    cases: list[CaseReq] | None = None  # có -> 1 job chạy entry lần lượt với từng testcase
+    stop_on_failure: bool = False
+    cache: bool = True  # False: luôn chạy thật dù result cache đang bật
+    priority: str | None = None  # interactive | batch (None = priority.default_class)
+    tenant: str | None = None    # chủ job -> fair share giữa các tenant
+
+CASES_MAX = 1000
+
+def _priority(name: str | None) -> str | None:
+    if name is not None and name not in orc.s.priority_classes:
+        raise HTTPException(status_code=422, detail=f"Unknown priority class {name!r}")
+    return name
+
+def _saturated(e: Saturated) -> HTTPException:
+    return HTTPException(status_code=429, detail=str(e),
+                         headers={"Retry-After": str(max(1, math.ceil(e.retry_after_s)))})
+
+def _lang_entry(lang: str, entry: str | None) -> tuple[str, str]:
+    runner = orc.runners.get(lang.lower())
+    if runner is None:
+        raise HTTPException(status_code=422, detail=f"Unsupported language {lang!r}")
+    return runner.lang, entry or runner.default_entry
 
 @app.post("/jobs")
 def submit(req: JobReq):
-    jid = orc.submit_python(req.code, req.entry)
+    lang, entry = _lang_entry(req.lang, req.entry)
+    if req.cases:
+        if len(req.cases) > CASES_MAX:
+            raise HTTPException(status_code=413, detail=f"At most {CASES_MAX} test cases per job")
+        jid = orc.submit_cases(req.code, entry, [c.dict() for c in req.cases], req.stop_on_failure, lang,
+                               _priority(req.priority), req.tenant)
+    else:
+        jid = orc.submit(req.code, entry, lang, req.cache, _priority(req.priority), req.tenant)
     return {"job_id": jid}
 
-@app.post("/jobs/{job_id}/run")
+class BatchReq(BaseModel):
+    submissions: list[JobReq]
+    run: bool = False  # True: enqueue luôn sau khi tạo
+
+BATCH_MAX = 5000
+
+@app.post("/jobs:batch")
+def submit_batch(req: BatchReq):
+    if len(req.submissions) > BATCH_MAX:
+        raise HTTPException(status_code=413, detail=f"At most {BATCH_MAX} submissions per batch")
+    if any(x.cases for x in req.submissions):
+        raise HTTPException(status_code=422, detail="Test-case jobs must be submitted via POST /jobs")
+    items = []
+    for x in req.submissions:
+        lang, entry = _lang_entry(x.lang, x.entry)
+        items.append((x.code, entry, lang, x.cache, _priority(x.priority), x.tenant))
+    ids = orc.submit_batch(items)
+    scheduled = 0
+    out = {"job_ids": ids}
+    if req.run:
+        try:
+            for jid, item in zip(ids, items):
+                sched.enqueue(jid, fresh=True, priority=item[4], tenant=item[5])
+                scheduled += 1
+        except Saturated as e:
+            out["retry_after_s"] = e.retry_after_s  # phần còn lại vẫn QUEUED trong DB, client gọi /run sau
+        out["estimated_wait_s"] = sched.estimate_wait(items[-1][4] if items else None)
+    out["scheduled"] = scheduled
+    return out
+
+LIST_LIMIT_DEFAULT = 50
+LIST_LIMIT_MAX = 500
+
+@app.get("/jobs")
+def list_jobs(ids: str | None = None, status: str | None = None, lang: str | None = None,
+              tenant: str | None = None, priority: str | None = None,
+              created_after: datetime | None = None, created_before: datetime | None = None,
+              cursor: str | None = None, limit: int = LIST_LIMIT_DEFAULT):
+    """
+    /jobs?ids=a,b,c: trạng thái nhiều job trong 1 request (format cũ, có "missing").
+    Không có ids: liệt kê job mới nhất trước, lọc theo status=QUEUED,RUNNING / lang / tenant / priority /
+    created_after / created_before; trang sau: ?cursor=<next_cursor của trang trước> (cùng bộ lọc).
+    """
+    if ids is not None:
+        wanted = [x for x in ids.split(",") if x][:BATCH_MAX]
+        found = {j.id: j for j in store.get_many(wanted)}
+        return {
+            "jobs": [found[x].dict() for x in wanted if x in found],
+            "missing": [x for x in wanted if x not in found],
+        }
+    try:
+        statuses = [JobStatus(x.strip().upper()) for x in status.split(",") if x.strip()] if status else None
+    except ValueError:
+        raise HTTPException(status_code=422, detail=f"Unknown status in {status!r}; "
+                                                    f"expected {', '.join(s.value for s in JobStatus)}")
+    if not 1 <= limit <= LIST_LIMIT_MAX:
+        raise HTTPException(status_code=422, detail=f"limit must be between 1 and {LIST_LIMIT_MAX}")
+    try:
+        jobs, next_cursor = store.list_jobs(statuses=statuses, lang=lang, tenant=tenant, priority=priority,
+                                            created_after=created_after, created_before=created_before,
+                                            cursor=cursor, limit=limit)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"jobs": [j.dict() for j in jobs], "next_cursor": next_cursor}
+
+@app.post("/jobs/{job_id}/run", status_code=202)
 def run_job(job_id: str):
     # kiểm tra xem job có tồn tại không
     job = store.get(job_id)
     if not job:
         raise HTTPException(status_code=404, detail="Job not found")
+    if not orc.art.job_workdir(job_id).is_dir():
+        # artifact manager đã xoá thư mục job (retention/quota) -> không còn source để chạy lại
+        raise HTTPException(status_code=410, detail="Job artifacts were removed")
+
+    # chỉ enqueue, worker của scheduler sẽ chạy job
+    try:
+        if not sched.enqueue(job_id):
+            raise HTTPException(status_code=409, detail="Job is already queued or running")
+    except Saturated as e:
+        raise _saturated(e)
+    return {"ok": True, "status": "QUEUED", **sched.stats(), "estimated_wait_s": sched.estimate_wait(job.priority)}
+
+@app.post("/jobs/{job_id}/cancel", status_code=202)
+def cancel_job(job_id: str):
+    job = store.get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    if job.status in TERMINAL:
+        raise HTTPException(status_code=409, detail=f"Job already {job.status.value}")
+    # job đang chạy: giết cả leaf, trạng thái KILLED được publish khi worker xong (theo dõi qua /stream)
+    was = sched.cancel(job_id)
+    if was == "untracked":
+        raise HTTPException(status_code=409, detail="Job is RUNNING but not running in this service")
+    if was not in ("running", "queued"):
+        raise HTTPException(status_code=409, detail=f"Job already {was}")
+    return {"ok": True, "job_id": job_id, "was": was}
+
+class ExecutionReq(BaseModel):
+    code: str
+    entry: str | None = None
+    lang: str = "python"
+    wait_ms: int = 0  # >0: giữ request tới khi job xong (tối đa EXEC_WAIT_MAX_MS)
+    cache: bool = True
+    priority: str | None = "interactive"  # đường chạy thử từ editor
+    tenant: str | None = None
+
+EXEC_WAIT_MAX_MS = 30000
+EXEC_INLINE_LOG_BYTES = 1 << 16
+
+async def _wait_terminal(job_id: str, timeout_s: float) -> bool:
+    # chỉ đọc JobEvents trong RAM, không giữ thread nào trong lúc chờ
+    deadline = time.monotonic() + timeout_s
+    delay = 0.005
+    while True:
+        if orc.events.get(job_id)[1] in TERMINAL:
+            return True
+        left = deadline - time.monotonic()
+        if left <= 0:
+            return False
+        await asyncio.sleep(min(delay, left))
+        delay = min(delay * 2, 0.05)
 
+@app.post("/executions")
+async def execute(req: ExecutionReq, response: Response):
+    """Tạo job + enqueue trong 1 lần gọi; wait_ms>0 thì trả luôn kết quả + log (đã cắt) nếu kịp."""
+    # ghi file + insert DB là I/O chặn -> đẩy ra threadpool, event loop chỉ lo phần chờ
+    lang, entry = _lang_entry(req.lang, req.entry)
+    prio = _priority(req.priority)
+    jid = await run_in_threadpool(orc.submit, req.code, entry, lang, req.cache, prio, req.tenant)
     try:
-        orc.run(job_id)
-        return {"ok": True}
-    except Exception as e:
-        # log lỗi để debug nếu cần
-        print(f"Error while running job {job_id}: {e}")
-        raise HTTPException(status_code=500, detail=str(e))
+        await run_in_threadpool(sched.enqueue, jid, fresh=True, priority=prio, tenant=req.tenant)
+    except Saturated as e:
+        raise _saturated(e)
+
+    wait_s = min(max(req.wait_ms, 0), EXEC_WAIT_MAX_MS) / 1000
+    if not wait_s or not await _wait_terminal(jid, wait_s):
+        response.status_code = 202
+        return {"job_id": jid, "status": orc.events.get(jid)[1] or "QUEUED",
+                "estimated_wait_s": sched.estimate_wait(prio)}
+
+    j = await run_in_threadpool(store.get, jid)
+    out = await run_in_threadpool(orc.art.read_log_range, jid, "stdout", 0, EXEC_INLINE_LOG_BYTES)
+    err = await run_in_threadpool(orc.art.read_log_range, jid, "stderr", 0, EXEC_INLINE_LOG_BYTES)
+    return {
+        "job_id": jid,
+        "status": j.status,
+        "exit_code": j.exit_code,
+        "output_truncated": j.output_truncated,
+        "cache_hit": bool(j.cache_hit),
+        "compile_ms": j.compile_ms,
+        "compile_cache_hit": j.compile_cache_hit,
+        "peak_memory_bytes": j.peak_memory_bytes,
+        "cpu_user_ms": j.cpu_user_ms,
+        "cpu_system_ms": j.cpu_system_ms,
+        "stdout": out["data"],
+        "stderr": err["data"],
+        "logs_complete": out["eof"] and err["eof"],  # False -> lấy phần còn lại qua /jobs/{id}/logs
+    }
+
+@app.get("/scheduler")
+def scheduler_stats():
+    st = sched.stats()
+    st["store"] = store.stats()
+    st["settings"] = settings.stats()
+    if orc.leaf_pool is not None:
+        st["leaf_pool"] = orc.leaf_pool.stats()
+    if orc.ns_pool is not None:
+        st["ns_pool"] = orc.ns_pool.stats()
+    if orc.artifacts is not None:
+        st["artifacts"] = orc.artifacts.stats()
+    if orc.result_cache is not None:
+        st["result_cache"] = orc.result_cache.stats()
+    if orc.compile_cache is not None:
+        st["compile_cache"] = orc.compile_cache.stats()
+    if orc.supervisor is not None:
+        st["supervisor"] = orc.supervisor.stats()
+    st["log_relay"] = orc.log_relay.stats()
+    st["disk_watch"] = orc.disk_watch.stats()
+    return st
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def metrics():
+    """Prometheus text format: histogram theo phase, queue/running, số job theo status, cache."""
+    st = sched.stats()
+    lines = orc.metrics.render()
+    lines += render_gauge("sbx_queue_depth", "Jobs waiting for a worker", st["queue_depth"])
+    lines += render_gauge("sbx_running_jobs", "Jobs currently running", st["in_flight"])
+    lines += render_gauge("sbx_workers", "Scheduler worker threads", st["workers"])
+    if orc.supervisor is not None:
+        sv = orc.supervisor.stats()
+        lines += render_gauge("sbx_supervised_processes", "Job processes watched by the supervisor loop", sv["watching"])
+        lines += render_gauge("sbx_supervisor_timeouts_total", "Deadlines fired by the supervisor", sv["timeouts"], "counter")
+        lines += render_gauge("sbx_completion_backlog", "Exited jobs waiting for a completion thread", sv["completion_backlog"])
+    lines += render_gauge("sbx_jobs", "Jobs in the store by status",
+                          {(("status", k),): v for k, v in store.count_by_status().items()})
+    cs = settings.stats()
+    lines += render_gauge("sbx_settings_generation", "Settings snapshots swapped in since start (1 = none)",
+                          cs["generation"])
+    lines += render_gauge("sbx_settings_reload_errors_total", "Config reloads rejected (kept old snapshot)",
+                          cs["reload_errors"], "counter")
+    ss = store.stats()
+    lines += render_gauge("sbx_store_commits_total", "Job store transactions committed", ss["commits"], "counter")
+    lines += render_gauge("sbx_store_updates_total", "Job status updates (before coalescing)", ss["updates"], "counter")
+    lines += render_gauge("sbx_store_pending_updates", "Coalesced updates not yet committed", ss["pending"])
+    lines += render_gauge("sbx_store_active_cached", "QUEUED/RUNNING jobs served from memory", ss["active_cached"])
+    lines += render_gauge("sbx_store_cache_hits_total", "Job reads served from the active-job cache",
+                          ss["cache_hits"], "counter")
+    lines += render_gauge("sbx_store_cache_misses_total", "Job reads that went to SQLite", ss["cache_misses"], "counter")
+    for name, cache in (("result", orc.result_cache), ("compile", orc.compile_cache)):
+        if cache is not None:
+            cs = cache.stats()
+            lines += render_gauge(f"sbx_{name}_cache_hits_total", f"{name} cache hits", cs["hits"], "counter")
+            lines += render_gauge(f"sbx_{name}_cache_misses_total", f"{name} cache misses", cs["misses"], "counter")
+    if orc.leaf_pool is not None:
+        ps = orc.leaf_pool.stats()
+        lines += render_gauge("sbx_leaf_pool_idle", "Pre-created cgroup leaves ready",
+                              {(("profile", p),): n for p, n in ps["idle"].items()})
+        lines += render_gauge("sbx_leaf_pool_in_use", "Pool leaves held by running jobs", ps["in_use"])
+    if orc.ns_pool is not None:
+        ns = orc.ns_pool.stats()
+        lines += render_gauge("sbx_ns_pool_idle", "Pre-created namespace sets ready", ns["idle"])
+        lines += render_gauge("sbx_ns_pool_healthy", "1 while the namespace pool is refilling normally",
+                              int(ns["healthy"]))
+        lines += render_gauge("sbx_ns_pool_hits_total", "Jobs that joined a pre-created namespace set",
+                              ns["hits"], "counter")
+        lines += render_gauge("sbx_ns_pool_misses_total", "Jobs that fell back to on-demand unshare",
+                              ns["misses"], "counter")
+        lines += render_gauge("sbx_ns_pool_pending_tasks", "Namespace pool background tasks waiting (retire/refill)",
+                              ns["pending_tasks"])
+        lines += render_gauge("sbx_ns_pool_errors_total", "Namespace sets failing creation or health checks",
+                              ns["errors"], "counter")
+    if orc.artifacts is not None:
+        ar = orc.artifacts.stats()
+        lines += render_gauge("sbx_artifacts_bytes", "On-disk bytes of finished jobs in jobs_dir", ar["bytes"])
+        lines += render_gauge("sbx_artifacts_jobs", "Finished job directories tracked by the artifact manager",
+                              ar["jobs"])
+        lines += render_gauge("sbx_artifacts_reclaimed_bytes_total", "Bytes freed by compression, trimming and GC",
+                              ar["reclaimed_bytes"], "counter")
+        lines += render_gauge("sbx_artifacts_deleted_total", "Job directories removed by the artifact manager",
+                              {(("reason", k),): v for k, v in ar["deleted"].items()}, "counter")
+        lines += render_gauge("sbx_artifacts_compressed_logs_total", "Job logs gzipped after the job finished",
+                              ar["compressed_logs"], "counter")
+        lines += render_gauge("sbx_artifacts_backlog", "Artifact manager work waiting (settle/trash)",
+                              {(("queue", "settle"),): ar["settle_backlog"], (("queue", "trash"),): ar["trash_backlog"]})
+    lines += render_gauge("sbx_estimated_wait_seconds", "Estimated queue wait for a new job",
+                          {(("class", c),): cs["estimated_wait_s"] for c, cs in st["classes"].items()})
+    lines += render_gauge("sbx_class_queue_depth", "Jobs waiting per priority class",
+                          {(("class", c),): cs["queue_depth"] for c, cs in st["classes"].items()})
+    if "admission" in st:
+        ad = st["admission"]
+        lines += render_gauge("sbx_admission_memory_bytes", "Memory committed by running jobs vs budget",
+                              {(("kind", "committed"),): ad["memory_committed"], (("kind", "budget"),): ad["memory_budget"]})
+        lines += render_gauge("sbx_admission_cpu_cores", "CPU committed by running jobs vs budget",
+                              {(("kind", "committed"),): ad["cpu_committed"], (("kind", "budget"),): ad["cpu_budget"]})
+        lines += render_gauge("sbx_admission_delayed_jobs", "Jobs held back by admission control", ad["delayed"])
+        lines += render_gauge("sbx_admission_delays_total", "Jobs delayed by admission control", ad["delays"], "counter")
+        lines += render_gauge("sbx_admission_rejects_total", "Jobs rejected with 429", ad["rejects"], "counter")
+        lines += render_gauge("sbx_pressure_avg10", "PSI avg10 (%) of the sbx subtree",
+                              {(("resource", r), ("kind", k)): v for r, kv in ad["pressure"].items() for k, v in kv.items()})
+    return PlainTextResponse("\n".join(lines) + "\n", media_type="text/plain; version=0.0.4")
 
 @app.get("/jobs/{job_id}")
 def status(job_id: str):
     j = store.get(job_id)
     return j.dict() if j else {"error": "not found"}
 
+LOG_RANGE_DEFAULT = 1 << 16
+LOG_RANGE_MAX = 1 << 20
+
+@app.get("/jobs/{job_id}/cases")
+def case_results(job_id: str):
+    j = store.get(job_id)
+    if not j:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return {
+        "job_id": job_id,
+        "case_count": j.case_count,
+        "cases_passed": j.cases_passed,
+        "cases": [r.dict() for r in store.get_case_results(job_id)],
+    }
+
 @app.get("/jobs/{job_id}/logs")
-def logs(job_id: str):
-    return orc.logs(job_id)
+def logs(job_id: str,
+         stdout_offset: int | None = None, stdout_limit: int | None = None,
+         stderr_offset: int | None = None, stderr_limit: int | None = None):
+    # không có tham số range -> giữ format cũ {"stdout": str, "stderr": str}
+    if all(v is None for v in (stdout_offset, stdout_limit, stderr_offset, stderr_limit)):
+        return orc.logs(job_id)
+    ranges = {"stdout": (stdout_offset, stdout_limit), "stderr": (stderr_offset, stderr_limit)}
+    return {
+        name: orc.art.read_log_range(job_id, name, off or 0, min(lim or LOG_RANGE_DEFAULT, LOG_RANGE_MAX))
+        for name, (off, lim) in ranges.items()
+    }
+
+@app.get("/jobs/{job_id}/logs/{stream}")
+def log_file(job_id: str, stream: str, request: Request):
+    """
+    File log thô (sendfile, hỗ trợ header Range) — dùng cho log lớn thay vì JSON.
+    Log đã nén (.log.gz): client nhận gzip -> gửi nguyên file với Content-Encoding: gzip, không thì giải nén dần.
+    """
+    if stream not in LOG_STREAMS:
+        raise HTTPException(status_code=404, detail="Unknown log stream")
+    path = orc.art.log_file(job_id, stream)
+    if path is None:
+        raise HTTPException(status_code=404, detail="Log not found")
+    if path.suffix != ".gz":
+        return FileResponse(path, media_type="text/plain; charset=utf-8")
+    if "gzip" in request.headers.get("accept-encoding", ""):
+        return FileResponse(path, media_type="text/plain; charset=utf-8", headers={"Content-Encoding": "gzip"})
+
+    def chunks():
+        with gzip.open(path, "rb") as f:
+            while data := f.read(STREAM_CHUNK):
+                yield data
+    return StreamingResponse(chunks(), media_type="text/plain; charset=utf-8")
+
+STREAM_CHUNK = 1 << 16
+STREAM_POLL_S = 0.1
+STREAM_PING_S = 15.0
+
+def _sse(event: str, data: dict, event_id: str | None = None) -> str:
+    head = f"id: {event_id}\n" if event_id else ""
+    return f"{head}event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+@app.get("/jobs/{job_id}/stream")
+async def stream(job_id: str, request: Request, stdout_offset: int = 0, stderr_offset: int = 0):
+    """
+    Server-Sent Events: `stdout`/`stderr` (từng đoạn mới, kèm offset), `status` khi đổi trạng thái,
+    `end` (exit code + thông tin job) rồi đóng. Nối lại bằng ?stdout_offset=&stderr_offset=
+    hoặc header Last-Event-ID ("<stdout_offset>:<stderr_offset>").
+    Đọc DB / file log (kể cả giải nén .log.gz) là I/O chặn -> chạy trong threadpool, event loop chỉ lo chờ.
+    """
+    job = await run_in_threadpool(store.get, job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+
+    offsets = {"stdout": stdout_offset, "stderr": stderr_offset}
+    last_id = request.headers.get("last-event-id")
+    if last_id:
+        try:
+            o, e = last_id.split(":", 1)
+            offsets = {"stdout": int(o), "stderr": int(e)}
+        except ValueError:
+            pass
+
+    def pump(final: bool) -> list[str]:
+        out = []
+        for name in LOG_STREAMS:
+            while True:
+                data = orc.art.read_log_bytes(job_id, name, offsets[name], STREAM_CHUNK)
+                n = len(data) if final else utf8_safe_len(data)
+                if not n:
+                    break
+                off = offsets[name]
+                offsets[name] += n
+                out.append(_sse(name, {"offset": off, "data": data[:n].decode("utf-8", errors="replace")},
+                                f"{offsets['stdout']}:{offsets['stderr']}"))
+                if not final and len(data) < STREAM_CHUNK:
+                    break
+        return out
+
+    async def gen():
+        seq, status = orc.events.get(job_id)
+        status = status or job.status.value
+        yield _sse("status", {"status": status})
+        last_ping = time.monotonic()
+        while True:
+            if await request.is_disconnected():
+                return
+            chunks = await run_in_threadpool(pump, False)
+            for c in chunks:
+                yield c
+            new_seq, new_status = orc.events.get(job_id)
+            if new_seq != seq and new_status:
+                seq, status = new_seq, new_status
+                yield _sse("status", {"status": status})
+            if status in TERMINAL:
+                for c in await run_in_threadpool(pump, True):
+                    yield c
+                j = await run_in_threadpool(store.get, job_id)
+                yield _sse("end", j.dict() if j else {"status": status}, f"{offsets['stdout']}:{offsets['stderr']}")
+                return
+            if not chunks:
+                if time.monotonic() - last_ping > STREAM_PING_S:
+                    last_ping = time.monotonic()
+                    yield ": ping\n\n"
+                await asyncio.sleep(STREAM_POLL_S)
+
+    return StreamingResponse(gen(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
 @app.get("/")
 def read_root():
     return {"message": "Welcome to the Sandbox API"}
@@ -1,6 +1,6 @@
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from pathlib import Path
-from typing import Dict, List
+from typing import Any, Callable, Dict, List, Optional
 
 @dataclass
 class ExecSpec:
@@ -8,8 +8,46 @@ class ExecSpec:
     workdir: Path
     env: Dict[str,str]
     timeout_s: int
+    py_entry: Optional[Path] = None  # set cho job Python -> có thể chạy qua zygote
+    stdin_path: Optional[Path] = None   # mặc định /dev/null
+    stdout_path: Optional[Path] = None  # mặc định <workdir>/stdout.log
+    stderr_path: Optional[Path] = None  # mặc định <workdir>/stderr.log
+    stdout_max_bytes: Optional[int] = None  # None/0 = không giới hạn
+    stderr_max_bytes: Optional[int] = None
+    exec_dir: Optional[Path] = None  # thư mục trong workdir được exec (read-only) dù /work noexec, vd build/ của C
+
+@dataclass
+class ExecContext:
+    """State riêng của từng job (leaf cgroup, limits, pid...), trả về từ prepare()."""
+    job_id: str
+    workdir: Path
+    limits: dict
+    profile: str = "default"
+    leaf: Optional[Path] = None
+    pooled: bool = False  # leaf lấy từ LeafPool -> trả lại pool khi cleanup
+    rlimit_mem_bytes: Optional[int] = None
+    rlimit_nproc: Optional[int] = None
+    pid: Optional[int] = None
+    seccomp: bool = False                                  # job này có áp seccomp không
+    seccomp_bpf: Optional[Path] = None                     # blob BPF trong cache (HOST mode)
+    seccomp_loader: Optional[Callable[[], None]] = None    # nạp blob trong preexec
+    output_truncated: bool = False
+    log_pipes: List[Any] = field(default_factory=list)  # LogPipe của lần run() đang chạy (stream có cap)
+    peak_memory_kb: Optional[int] = None  # lần run() gần nhất: memory.peak của leaf, không có thì ru_maxrss
+    cpu_s: Optional[float] = None      # user+sys của lần run() gần nhất
+    timings: Dict[str, float] = field(default_factory=dict)  # giây, theo phase
+    usage: Optional[dict] = None  # cgroup accounting cuối (cgroups.read_usage), có sau cleanup()
+    cancelled: bool = False  # kill() từ API: run() không spawn thêm, orchestrator ghi KILLED
+    disk_exceeded: Optional[int] = None  # DiskWatch đã kill: byte job ghi thêm vào workdir; run() không spawn thêm
+    disk_watch: Optional[int] = None     # token DiskWatch từ prepare() tới cleanup()
+    settings: Any = None  # snapshot Settings lấy lúc prepare(), dùng tới cleanup dù service reload config
 
 class Executor:
-    def prepare(self, job_id: str, workdir: Path, limits: dict): ...
-    def run(self, job_id: str, spec: ExecSpec) -> int: ...
-    def cleanup(self, job_id: str): ...
+    def prepare(self, job_id: str, workdir: Path, limits: dict, profile: str = "default",
+                seccomp: bool = True, group: Optional[str] = None, settings: Any = None) -> ExecContext: ...
+    def run(self, ctx: ExecContext, spec: ExecSpec) -> int: ...
+    def start(self, ctx: ExecContext, spec: ExecSpec,
+              on_done: Callable[[Optional[int], Optional[BaseException]], None]) -> bool:
+        return False  # executor không hỗ trợ chạy không chặn -> orchestrator gọi run()
+    def cleanup(self, ctx: ExecContext): ...
+    def kill(self, ctx: ExecContext): ...
@@ -1,8 +1,9 @@
 # src/sandbox/executor/cgroups.py
 from __future__ import annotations
 from pathlib import Path
-import os, time
+import os, select, signal, time, threading, uuid
 import subprocess  # NEW
+from collections import deque
 
 USE_CGROUP = os.getenv("USE_CGROUP", "1") == "1"
 
@@ -126,7 +127,24 @@ def _enable_controllers(node: Path):
         raise PermissionError(f"{node} has PIDs; cannot set subtree_control")
     (node / "cgroup.subtree_control").write_text(" ".join(want))
 
-def create_leaf(job_id: str) -> Path:
+def ensure_class_group(name: str, cpu_weight: int) -> Path | None:
+    """
+    sbx/class-<name>: cgroup trung gian của 1 priority class, cpu.weight chia CPU giữa các class
+    (leaf của job nằm bên dưới, nên 100 job batch cũng không lấn được 1 job interactive).
+    """
+    if not USE_CGROUP:
+        return None
+    base = get_sbx_base()
+    base.mkdir(parents=True, exist_ok=True)
+    _enable_controllers(base)
+    node = base / f"class-{name}"
+    node.mkdir(exist_ok=True)
+    _enable_controllers(node)
+    if (node / "cpu.weight").exists():
+        _write_then_check(node / "cpu.weight", int(cpu_weight))
+    return node
+
+def create_leaf(job_id: str, group: str | None = None) -> Path:
     if not USE_CGROUP:
         print(f"[WARN] Skipping create_leaf for {job_id} (USE_CGROUP=0)")
         # chỉ tạo folder giả trong /tmp để code phía trên không lỗi
@@ -145,7 +163,8 @@ def create_leaf(job_id: str) -> Path:
     except PermissionError:
         raise
 
-    leaf = _ensure_cgroup_job(job_id)
+    parent = base / f"class-{group}" if group else None
+    leaf = parent / job_id if parent is not None and parent.is_dir() else _ensure_cgroup_job(job_id)
     leaf.mkdir(parents=True, exist_ok=True)
     return leaf
 
@@ -200,6 +219,41 @@ def attach(leaf: Path, pid: int):
         traceback.print_exc()
         raise
 
+def open_procs_fd(leaf: Path) -> int | None:
+    """
+    Mở sẵn <leaf>/cgroup.procs ở parent để child tự join leaf TRƯỚC exec
+    (os.write(fd, b"0") trong preexec_fn) -> không còn khoảng hở fork→attach.
+    fd có O_CLOEXEC nên không lọt vào chương trình user.
+    """
+    if not USE_CGROUP:
+        return None
+    return os.open(leaf / "cgroup.procs", os.O_WRONLY | os.O_CLOEXEC)
+
+def open_memory_peak(leaf: Path) -> int | None:
+    """
+    Mở <leaf>/memory.peak và reset peak cho riêng fd này (kernel >= 6.12: ghi chuỗi bất kỳ).
+    Đọc lại qua cùng fd -> peak kể từ lúc reset, nên leaf dùng lại (pool / nhiều testcase) vẫn đo đúng.
+    Trả về None nếu không có cgroup hoặc kernel chưa hỗ trợ reset.
+    """
+    if not USE_CGROUP or leaf is None:
+        return None
+    try:
+        fd = os.open(leaf / "memory.peak", os.O_RDWR | os.O_CLOEXEC)
+    except OSError:
+        return None
+    try:
+        os.write(fd, b"reset\n")
+    except OSError:
+        os.close(fd)
+        return None
+    return fd
+
+def read_memory_peak(fd: int) -> int | None:
+    try:
+        return int(os.pread(fd, 64, 0).strip())
+    except (OSError, ValueError):
+        return None
+
 def read_metrics(leaf: Path) -> dict:
     out: dict[str, str] = {}
     for name in ("memory.current", "memory.events", "cpu.stat", "pids.current"):
@@ -208,11 +262,302 @@ def read_metrics(leaf: Path) -> dict:
             out[name] = p.read_text().strip()
     return out
 
-def teardown(leaf: Path):
-    # leaf phải rỗng, best-effort retry
-    for _ in range(5):
+def _read_kv(p: Path) -> dict[str, int]:
+    """File dạng "key value" mỗi dòng (memory.events, cpu.stat, pids.events)."""
+    out: dict[str, int] = {}
+    try:
+        for line in p.read_text().splitlines():
+            k, _, v = line.partition(" ")
+            if v.strip().isdigit():
+                out[k] = int(v)
+    except OSError:
+        pass
+    return out
+
+def _read_int(p: Path) -> int | None:
+    try:
+        v = p.read_text().strip()
+    except OSError:
+        return None
+    return int(v) if v.isdigit() else None
+
+def read_usage(leaf: Path) -> dict | None:
+    """
+    Số liệu cuối của leaf, đọc ngay trước teardown (leaf mới cho mỗi job -> bộ đếm chỉ của job này).
+    peak: memory.peak / pids.peak (kernel mới), không có thì lấy giá trị hiện tại.
+    """
+    if not USE_CGROUP or leaf is None:
+        return None
+    mem_ev = _read_kv(leaf / "memory.events")
+    cpu = _read_kv(leaf / "cpu.stat")
+    pids_ev = _read_kv(leaf / "pids.events")
+    peak = _read_int(leaf / "memory.peak")
+    pids_peak = _read_int(leaf / "pids.peak")
+    return {
+        "peak_memory_bytes": peak if peak is not None else _read_int(leaf / "memory.current"),
+        "cpu_user_us": cpu.get("user_usec"),
+        "cpu_system_us": cpu.get("system_usec"),
+        "cpu_throttled_us": cpu.get("throttled_usec"),
+        "oom_kills": mem_ev.get("oom_kill", 0),
+        "pids_peak": pids_peak if pids_peak is not None else _read_int(leaf / "pids.current"),
+        "pids_limit_hits": pids_ev.get("max", 0),  # số lần fork/clone bị từ chối vì pids.max
+    }
+
+def read_oom_kills(leaf: Path) -> int:
+    if not USE_CGROUP or leaf is None:
+        return 0
+    return _read_kv(leaf / "memory.events").get("oom_kill", 0)
+
+def is_populated(leaf: Path) -> bool:
+    return _read_kv(leaf / "cgroup.events").get("populated", 0) == 1
+
+def kill_leaf(leaf: Path | None) -> bool:
+    """
+    SIGKILL mọi process trong leaf 1 lần (cgroup.kill, kernel >= 5.14), kể cả process đã setsid /
+    thoát khỏi process group của job. Kernel cũ: freeze leaf rồi kill từng pid trong cgroup.procs
+    (không fork kịp thêm con giữa lúc đọc và kill). False nếu không có cgroup để kill.
+    """
+    if not USE_CGROUP or leaf is None:
+        return False
+    try:
+        (leaf / "cgroup.kill").write_text("1")
+        return True
+    except FileNotFoundError:
+        if not leaf.exists():
+            return False
+    except OSError:
+        return False
+    freeze = leaf / "cgroup.freeze"
+    try:
+        freeze.write_text("1")
+    except OSError:
+        pass
+    try:
+        for pid in (leaf / "cgroup.procs").read_text().split():
+            try:
+                os.kill(int(pid), signal.SIGKILL)
+            except ProcessLookupError:
+                pass
+    except OSError:
+        return False
+    finally:
         try:
-            leaf.rmdir()
-            return
+            freeze.write_text("0")
         except OSError:
-            time.sleep(0.1)
+            pass
+    return True
+
+def wait_unpopulated(leaf: Path | None, timeout_s: float = 2.0) -> bool:
+    """
+    Chờ cgroup.events báo "populated 0". Kernel đánh thức poll (POLLPRI) mỗi khi file này đổi,
+    nên trả về ngay khi process cuối thoát thay vì sleep rồi thử lại.
+    """
+    if not USE_CGROUP or leaf is None:
+        return True
+    try:
+        fd = os.open(leaf / "cgroup.events", os.O_RDONLY | os.O_CLOEXEC)
+    except OSError:
+        return True  # leaf đã bị xoá
+    try:
+        poller = select.poll()
+        poller.register(fd, select.POLLPRI | select.POLLERR)
+        deadline = time.monotonic() + timeout_s
+        while True:
+            if b"populated 0" in os.pread(fd, 4096, 0):
+                return True
+            left = deadline - time.monotonic()
+            if left <= 0:
+                return False
+            poller.poll(left * 1000)
+    finally:
+        os.close(fd)
+
+def teardown(leaf: Path):
+    """Xoá leaf; còn process (timeout, cancel, con mồ côi) thì kill cả leaf và chờ rỗng rồi rmdir 1 lần."""
+    if USE_CGROUP and is_populated(leaf):
+        kill_leaf(leaf)
+        if not wait_unpopulated(leaf):
+            print(f"[WARN] teardown: {leaf} still populated after cgroup.kill")
+    try:
+        leaf.rmdir()
+    except FileNotFoundError:
+        pass
+    except OSError as e:
+        print(f"[WARN] teardown {leaf}: {e}")
+
+
+# ---------------- pool leaf dựng sẵn ----------------
+
+class LeafPool:
+    """
+    Pool leaf cgroup đã mkdir + set_limits sẵn theo từng profile (vd "default" = limits.yaml).
+    - acquire(): lấy leaf rảnh, hết thì tạo on-demand (như create_leaf cũ).
+    - release(): KHÔNG tái dùng leaf cũ (counter memory.peak/cpu.stat không reset được),
+      mà đẩy sang thread nền teardown + tạo leaf mới bù vào pool.
+    - group (priority class): key "<profile>@<class>", leaf nằm trong sbx/class-<class>.
+    USE_CGROUP=0: leaf giả trong /tmp, giống create_leaf.
+    """
+
+    def __init__(self, size: int = 8, low_watermark: int = 2):
+        self.size = max(0, int(size))
+        self.low_watermark = max(0, min(int(low_watermark), self.size))
+        self._profiles: dict[str, dict] = {}    # key -> {"limits", "size", "group"}
+        self._idle: dict[str, deque] = {}       # key -> deque[Path]
+        self._owner: dict[Path, str] = {}       # leaf đang cho mượn -> key
+        self._groups: dict[str, int] = {}       # priority class -> cpu.weight
+        self._lock = threading.Lock()
+        self._cv = threading.Condition(self._lock)
+        self._tasks: deque = deque()            # ("retire", leaf) | ("refill", key)
+        self._base: Path | None = None
+        self._stop = False
+        self._thread: threading.Thread | None = None
+        self.hits = 0
+        self.misses = 0
+
+    # ------------ setup ------------
+
+    @staticmethod
+    def _key(profile: str, group: str | None) -> str:
+        return f"{profile}@{group}" if group else profile
+
+    def add_group(self, name: str, cpu_weight: int):
+        """Priority class: leaf của class này nằm trong sbx/class-<name> (tạo lúc start())."""
+        with self._lock:
+            self._groups[name] = int(cpu_weight)
+
+    def register(self, profile: str, limits: dict, size: int | None = None, group: str | None = None):
+        key = self._key(profile, group)
+        with self._lock:
+            self._profiles[key] = {"limits": limits, "size": self.size if size is None else max(0, int(size)),
+                                   "group": group}
+            self._idle.setdefault(key, deque())
+            self._tasks.append(("refill", key))
+            self._cv.notify()
+
+    def start(self):
+        if self._thread:
+            return
+        if USE_CGROUP:
+            # chỉ làm 1 lần cho cả pool thay vì mỗi job
+            ensure_v2()
+            assert_controllers_on()
+            base = get_sbx_base()
+            base.mkdir(parents=True, exist_ok=True)
+            _enable_controllers(base)
+            self._base = base
+            for name, weight in self._groups.items():
+                ensure_class_group(name, weight)
+        self._thread = threading.Thread(target=self._loop, name="sbx-leaf-pool", daemon=True)
+        self._thread.start()
+
+    def close(self):
+        with self._lock:
+            self._stop = True
+            idle = [leaf for q in self._idle.values() for leaf in q]
+            idle += [arg for kind, arg in self._tasks if kind == "retire"]
+            for q in self._idle.values():
+                q.clear()
+            self._tasks.clear()
+            self._cv.notify()
+        if self._thread:
+            self._thread.join(timeout=5)
+            self._thread = None
+        for leaf in idle:
+            teardown(leaf)
+
+    # ------------ API ------------
+
+    def acquire(self, profile: str, limits: dict, group: str | None = None) -> Path:
+        key = self._key(profile, group)
+        with self._lock:
+            cfg = self._profiles.get(key)
+            q = self._idle.get(key)
+            # limits khác với profile đã đăng ký -> không dùng leaf dựng sẵn
+            if cfg is not None and cfg["limits"] == limits and q:
+                leaf = q.popleft()
+                self._owner[leaf] = key
+                self.hits += 1
+                if len(q) < self.low_watermark:
+                    self._tasks.append(("refill", key))
+                    self._cv.notify()
+                return leaf
+            self.misses += 1
+            if cfg is not None:
+                self._tasks.append(("refill", key))
+                self._cv.notify()
+
+        leaf = self._new_leaf(key, group)
+        try:
+            set_limits(leaf, limits)
+        except Exception:
+            teardown(leaf)
+            raise
+        with self._lock:
+            self._owner[leaf] = key
+        return leaf
+
+    def release(self, leaf: Path):
+        with self._lock:
+            self._owner.pop(leaf, None)
+            self._tasks.append(("retire", leaf))
+            self._cv.notify()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "idle": {p: len(q) for p, q in self._idle.items()},
+                "in_use": len(self._owner),
+                "pending_tasks": len(self._tasks),
+                "hits": self.hits,
+                "misses": self.misses,
+            }
+
+    # ------------ nền ------------
+
+    def _new_leaf(self, key: str, group: str | None = None) -> Path:
+        name = f"pool-{key.replace('@', '-')}-{uuid.uuid4().hex[:10]}"
+        if not USE_CGROUP:
+            leaf = Path(f"/tmp/fake_cgroup_{name}")
+        else:
+            base = self._base or get_sbx_base()
+            if group in self._groups:
+                base = base / f"class-{group}"
+            leaf = base / name
+        leaf.mkdir(parents=True, exist_ok=True)
+        return leaf
+
+    def _refill(self, key: str):
+        while True:
+            with self._lock:
+                cfg = self._profiles.get(key)
+                if self._stop or cfg is None or len(self._idle[key]) >= cfg["size"]:
+                    return
+                limits = cfg["limits"]
+            leaf = self._new_leaf(key, cfg["group"])
+            try:
+                set_limits(leaf, limits)
+            except Exception as e:
+                print(f"[WARN] leaf pool: set_limits failed for {leaf}: {e}")
+                teardown(leaf)
+                return
+            with self._lock:
+                if self._stop:
+                    break
+                self._idle[key].append(leaf)
+        teardown(leaf)
+
+    def _loop(self):
+        while True:
+            with self._lock:
+                while not self._tasks and not self._stop:
+                    self._cv.wait()
+                if self._stop:
+                    return
+                kind, arg = self._tasks.popleft()
+            try:
+                if kind == "retire":
+                    teardown(arg)
+                else:
+                    self._refill(arg)
+            except Exception as e:
+                print(f"[WARN] leaf pool task {kind} {arg}: {e}")
@@ -0,0 +1,130 @@
+# src/sandbox/executor/diskwatch.py
+"""
+Quota đĩa của workdir trong lúc job chạy: /work là bind mount của thư mục job trên host (không nằm trong
+upper tmpfs), nên 1 thread chung đo lại từng workdir đang được watch mỗi interval_s và gọi on_exceed
+(executor kill cả leaf) khi phần job ghi thêm trong 1 lần chạy vượt limit.
+
+- Tính theo block thật trên đĩa (st_blocks), không theo symlink; source/testcase có sẵn lúc prepare không tính.
+- Mốc đo lại mỗi lần process thoát (check(rebase=True)) -> quota theo từng lần run(), vd từng testcase.
+- Job ghi nhanh có thể vượt quá limit tối đa bằng lượng ghi được trong 1 interval trước khi bị kill;
+  job ghi vượt rồi thoát giữa 2 lượt đo vẫn bị tính ở lần check() lúc thoát.
+"""
+from __future__ import annotations
+import itertools, os, threading
+from pathlib import Path
+from typing import Callable, Optional
+
+
+def du(path: Path) -> int:
+    """Byte thật trên đĩa (st_blocks * 512) của cả cây, không theo symlink."""
+    total = 0
+    stack = [str(path)]
+    while stack:
+        try:
+            it = os.scandir(stack.pop())
+        except OSError:
+            continue
+        with it:
+            for e in it:
+                try:
+                    st = e.stat(follow_symlinks=False)
+                except OSError:
+                    continue
+                total += st.st_blocks * 512
+                if e.is_dir(follow_symlinks=False):
+                    stack.append(e.path)
+    return total
+
+
+class _Watch:
+    __slots__ = ("workdir", "limit", "base", "on_exceed", "exceeded")
+
+    def __init__(self, workdir: Path, limit: int, base: int, on_exceed: Callable[[int], None]):
+        self.workdir = workdir
+        self.limit = limit
+        self.base = base
+        self.on_exceed = on_exceed
+        self.exceeded = False
+
+
+class DiskWatch:
+    def __init__(self, interval_s: float = 0.2):
+        self.interval_s = float(interval_s)
+        self._lock = threading.Lock()
+        self._watches: dict[int, _Watch] = {}
+        self._ids = itertools.count(1)
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self.exceeded_total = 0
+
+    # ------------ lifecycle ------------
+
+    def start(self):
+        with self._lock:
+            if self._thread:
+                return
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._loop, name="sbx-disk-watch", daemon=True)
+            self._thread.start()
+
+    def close(self):
+        with self._lock:
+            if not self._thread:
+                return
+            self._stop.set()
+        self._thread.join(timeout=5)
+        self._thread = None
+
+    # ------------ API ------------
+
+    def watch(self, workdir: Path, limit: int, on_exceed: Callable[[int], None]) -> int:
+        """
+        Bắt đầu đo workdir (mốc = dung lượng hiện tại). on_exceed(bytes job đã ghi thêm) chạy trên thread nền,
+        lặp lại mỗi lượt đo còn vượt (process sinh sau lần kill trước cũng bị kill). Trả về token cho unwatch().
+        """
+        self.start()
+        w = _Watch(workdir, int(limit), du(workdir), on_exceed)
+        with self._lock:
+            token = next(self._ids)
+            self._watches[token] = w
+        return token
+
+    def unwatch(self, token: int):
+        with self._lock:
+            self._watches.pop(token, None)
+
+    def check(self, token: int, rebase: bool = False):
+        """Đo ngay (vd lúc process vừa thoát); rebase: chưa vượt thì lấy dung lượng hiện tại làm mốc mới."""
+        with self._lock:
+            w = self._watches.get(token)
+        if w is not None:
+            self._check(w, rebase)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"watching": len(self._watches), "exceeded_total": self.exceeded_total}
+
+    # ------------ loop ------------
+
+    def _check(self, w: _Watch, rebase: bool = False):
+        total = du(w.workdir)
+        used = total - w.base
+        if used <= w.limit:
+            if rebase:
+                w.base = total
+            return
+        with self._lock:
+            if not w.exceeded:
+                w.exceeded = True
+                self.exceeded_total += 1
+        try:
+            w.on_exceed(used)
+        except Exception as e:
+            print(f"[WARN] disk watch on_exceed failed for {w.workdir}: {e}")
+
+    def _loop(self):
+        while not self._stop.wait(self.interval_s):
+            with self._lock:
+                watches = list(self._watches.values())
+            for w in watches:
+                self._check(w)
@@ -0,0 +1,159 @@
+# src/sandbox/executor/logrelay.py
+"""
+Cap log theo stream mà không đổi kết quả của job: stdout/stderr có cap là pipe, 1 thread epoll chung
+chép sang file log tới đúng cap rồi đọc bỏ phần còn lại (job vẫn ghi được, không bị SIGXFSZ/EFBIG,
+không bị chặn vì pipe đầy). Service không giữ output trong RAM: mỗi lần đọc tối đa 1 chunk.
+
+- Stream không cap: child ghi thẳng vào file như cũ (không qua relay).
+- EOF khi mọi process giữ đầu ghi đã đóng; finish() chờ tối đa drain_s (vd process con chạy nền vẫn
+  giữ stdout) rồi bỏ pipe.
+"""
+from __future__ import annotations
+import os, select, threading
+from pathlib import Path
+from typing import Optional
+
+CHUNK = 1 << 16
+
+
+class LogPipe:
+    """1 stream của 1 job: wfd đưa cho child (caller đóng sau khi spawn), relay giữ đầu đọc + file."""
+    __slots__ = ("path", "cap", "wfd", "rfd", "file", "written", "dropped", "done")
+
+    def __init__(self, path: Path, cap: int):
+        self.path = path
+        self.cap = cap
+        self.rfd, self.wfd = os.pipe2(os.O_CLOEXEC)
+        os.set_blocking(self.rfd, False)
+        self.file = open(path, "wb", buffering=0)
+        self.written = 0
+        self.dropped = 0
+        self.done = threading.Event()
+
+    @property
+    def truncated(self) -> bool:
+        return self.dropped > 0
+
+
+class LogRelay:
+    def __init__(self, drain_s: float = 1.0):
+        self.drain_s = float(drain_s)
+        self._lock = threading.Lock()
+        self._new: list[LogPipe] = []
+        self._abandon: list[LogPipe] = []
+        self._by_fd: dict[int, LogPipe] = {}
+        self._ep: Optional[select.epoll] = None
+        self._wake_r = self._wake_w = -1
+        self._thread: Optional[threading.Thread] = None
+        self._stop = False
+        self.relayed_total = 0
+        self.dropped_bytes = 0
+        self.abandoned = 0
+
+    # ------------ lifecycle ------------
+
+    def start(self):
+        with self._lock:
+            if self._thread:
+                return
+            self._stop = False
+            self._ep = select.epoll()
+            self._wake_r, self._wake_w = os.pipe2(os.O_NONBLOCK | os.O_CLOEXEC)
+            self._ep.register(self._wake_r, select.EPOLLIN)
+            self._thread = threading.Thread(target=self._loop, name="sbx-log-relay", daemon=True)
+            self._thread.start()
+
+    def close(self):
+        with self._lock:
+            if not self._thread:
+                return
+            self._stop = True
+        os.write(self._wake_w, b"\0")
+        self._thread.join(timeout=5)
+        self._thread = None
+        for p in list(self._by_fd.values()) + self._new:
+            self._drop(p)
+        self._new, self._abandon = [], []
+        self._ep.close()
+        os.close(self._wake_r); os.close(self._wake_w)
+
+    # ------------ API ------------
+
+    def attach(self, path: Path, cap: int) -> LogPipe:
+        self.start()
+        p = LogPipe(path, cap)
+        with self._lock:
+            self._new.append(p)
+            self.relayed_total += 1
+        os.write(self._wake_w, b"\0")
+        return p
+
+    def finish(self, p: LogPipe) -> bool:
+        """Chờ relay chép hết (EOF) rồi trả về True nếu stream đã bị cắt ở cap."""
+        if not p.done.wait(self.drain_s):
+            with self._lock:
+                self._abandon.append(p)
+            os.write(self._wake_w, b"\0")
+            p.done.wait()
+        return p.truncated
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "open": len(self._by_fd) + len(self._new),
+                "relayed_total": self.relayed_total,
+                "dropped_bytes": self.dropped_bytes,
+                "abandoned": self.abandoned,
+            }
+
+    # ------------ loop ------------
+
+    def _drop(self, p: LogPipe):
+        if p.rfd in self._by_fd:
+            self._ep.unregister(p.rfd)
+            del self._by_fd[p.rfd]
+        os.close(p.rfd)
+        p.file.close()
+        with self._lock:
+            self.dropped_bytes += p.dropped
+        p.done.set()
+
+    def _pump(self, p: LogPipe):
+        try:
+            data = os.read(p.rfd, CHUNK)
+        except BlockingIOError:
+            return
+        if not data:
+            self._drop(p)
+            return
+        room = p.cap - p.written
+        if room > 0:
+            p.file.write(data[:room])
+            p.written += min(room, len(data))
+        p.dropped += max(0, len(data) - max(room, 0))
+
+    def _loop(self):
+        while True:
+            with self._lock:
+                if self._stop:
+                    return
+                new, self._new = self._new, []
+                abandon, self._abandon = self._abandon, []
+                self.abandoned += len(abandon)
+            for p in new:
+                self._by_fd[p.rfd] = p
+                self._ep.register(p.rfd, select.EPOLLIN)
+            for p in abandon:
+                if not p.done.is_set():
+                    self._drop(p)
+            for fd, _ in self._ep.poll():
+                if fd == self._wake_r:
+                    try:
+                        while os.read(self._wake_r, 4096):
+                            pass
+                    except BlockingIOError:
+                        pass
+                    continue
+                p = self._by_fd.get(fd)
+                if p is not None:
+                    self._pump(p)
@@ -1,50 +1,109 @@
 # src/sandbox/executor/ns_chroot.py
 from __future__ import annotations
-import os, sys, shlex, signal, subprocess
+import os, select, sys, shlex, signal, subprocess, time
 from pathlib import Path
+from typing import Callable
 
-from .base import ExecSpec, Executor
-from .cgroups import ensure_v2, create_leaf, set_limits, attach, teardown
-from ..settings import load_settings  # cần có seccomp_enabled, seccomp_policy
+from .base import ExecContext, ExecSpec, Executor
+from .diskwatch import DiskWatch
+from .logrelay import LogRelay
+from .cgroups import (USE_CGROUP, LeafPool, create_leaf, set_limits, attach, open_procs_fd, teardown,
+                      open_memory_peak, read_memory_peak, read_usage, kill_leaf, wait_unpopulated)
+from .nspool import NsPool
+from .rootfs import OverlayRootfs
+from .supervisor import Supervisor
+from ..settings import LiveSettings, Settings  # cần có seccomp_enabled, seccomp_policy
+from ..runners.zygote import ZygotePool
+from ..seccomp.bpf_cache import BpfCache
 
 class NsChrootExecutor(Executor):
     """
     Hai chế độ:
       - HOST mode (mặc định): chạy trên host, áp cgroup + (nếu bật) seccomp bằng chính .venv của service.
-      - CHROOT mode: chỉ khi rootfs sẵn sàng; vẫn dùng seccomp trên host (không cần pyseccomp trong rootfs).
+      - CHROOT mode: chỉ khi rootfs sẵn sàng. Có overlay (OverlayRootfs): image read-only dùng chung + upper
+        tmpfs riêng mỗi job, launcher dựng namespace ngay trong preexec, seccomp nạp từ blob BPF như HOST mode.
+        Không có overlay: cách cũ, unshare + bash mount trên rootfs dùng chung.
+        Có ns_pool (NsPool): cả 2 cách setns vào net/ipc/uts dựng sẵn, chỉ unshare user + mnt + pid.
+
+    Instance được share cho mọi job => không giữ state theo job trên self,
+    mọi thứ của job nằm trong ExecContext trả về từ prepare().
     """
 
-    def __init__(self, rootfs: Path, *, enable_loopback: bool=False, noexec_work: bool=False, bind_full_etc: bool=False):
+    def __init__(self, rootfs: Path, *, enable_loopback: bool=False, noexec_work: bool=False, bind_full_etc: bool=False,
+                 leaf_pool: LeafPool | None = None, cgroup_launcher: str = "preexec",
+                 zygote_pool: ZygotePool | None = None, bpf_cache: BpfCache | None = None,
+                 supervisor: Supervisor | None = None, settings: LiveSettings | None = None,
+                 overlay: OverlayRootfs | None = None, ns_pool: NsPool | None = None,
+                 log_relay: LogRelay | None = None, disk_watch: DiskWatch | None = None):
         self.rootfs = rootfs
         self.enable_loopback = enable_loopback
         self.noexec_work = noexec_work
         self.bind_full_etc = bind_full_etc
-
-        self.leaf: Path | None = None
-        self._rlimit_mem_bytes: int | None = None
-        self._rlimit_nproc: int | None = None
+        self.leaf_pool = leaf_pool
+        # "preexec": child tự vào leaf trước exec; "attach": cách cũ, parent ghi pid sau fork
+        self.cgroup_launcher = cgroup_launcher
+        # opt-in: job Python ở HOST mode chạy bằng fork từ zygote thay vì python3 mới
+        self.zygote_pool = zygote_pool
+        self.bpf_cache = bpf_cache
+        # có supervisor: start() giao process cho vòng lặp epoll chung thay vì chặn 1 thread mỗi job
+        self.supervisor = supervisor
+        # snapshot dùng chung của service; không có (script/benchmark) thì tự load 1 lần
+        self.settings = settings or LiveSettings()
+        self.overlay = overlay
+        # CHROOT mode: user/net/ipc/uts dựng sẵn, job setns vào; pool rỗng -> unshare on-demand như cũ
+        self.ns_pool = ns_pool
+        # stream có cap đi qua pipe + relay (cắt đúng cap, job không bị kill); không có thì cắt sau khi chạy
+        self.log_relay = log_relay
+        # /work là bind mount của workdir trên host -> quota ghi (work_max_bytes) đo bằng thread nền, vượt thì kill
+        self.disk_watch = disk_watch
 
         # Luôn dùng interpreter của service (.venv)
         self._python = sys.executable
 
     # ------------ lifecycle ------------
 
-    def prepare(self, job_id: str, workdir: Path, limits: dict):
-        ensure_v2()
-        self.leaf = create_leaf(job_id)
-        set_limits(self.leaf, limits)
+    def prepare(self, job_id: str, workdir: Path, limits: dict, profile: str = "default",
+                seccomp: bool = True, group: str | None = None, settings: Settings | None = None) -> ExecContext:
+        """
+        seccomp=False: bỏ filter của code user (vd bước compile: gcc/javac cần nhiều syscall hơn).
+        group: priority class -> leaf nằm trong sbx/class-<group> (cpu.weight của class).
+        settings: snapshot của job (orchestrator); None = snapshot hiện tại của service.
+        """
+        t0 = time.monotonic()
+        ctx = ExecContext(job_id=job_id, workdir=workdir, limits=limits, profile=profile,
+                          settings=settings or self.settings.current)
+        if self.leaf_pool is not None:
+            # leaf đã set_limits sẵn, setup cgroup ra khỏi đường chạy của job
+            ctx.leaf = self.leaf_pool.acquire(profile, limits, group)
+            ctx.pooled = True
+        else:
+            # create_leaf tự gọi ensure_v2() (bỏ qua khi USE_CGROUP=0)
+            ctx.leaf = create_leaf(job_id, group)
+            try:
+                set_limits(ctx.leaf, limits)
+            except Exception:
+                # không để leaf mồ côi khi prepare lỗi giữa chừng
+                teardown(ctx.leaf)
+                raise
 
         # KHÔNG bật RLIMIT_AS lúc debug để tránh fork lỗi sớm
         mem = (limits.get("memory") or {}).get("max")
         nproc = (limits.get("pids") or {}).get("max")
-        self._rlimit_mem_bytes = None  # int(mem) if mem and str(mem).isdigit() else None
-        # self._rlimit_nproc = int(nproc) if (nproc and str(nproc).isdigit()) else None
-        self._rlimit_nproc=None
+        ctx.rlimit_mem_bytes = None  # int(mem) if mem and str(mem).isdigit() else None
+        # ctx.rlimit_nproc = int(nproc) if (nproc and str(nproc).isdigit()) else None
+        ctx.rlimit_nproc = None
         workdir.mkdir(parents=True, exist_ok=True)
 
-        # Chuẩn bị secwrap nếu bật
-        s = load_settings()
-        if getattr(s, "seccomp_enabled", False):
+        # Chuẩn bị seccomp nếu bật
+        s = ctx.settings
+        ctx.seccomp = seccomp and bool(getattr(s, "seccomp_enabled", False))
+        if ctx.seccomp and self.bpf_cache is not None and (self.overlay is not None or not self.rootfs_ready()):
+            # HOST mode / overlay launcher: dùng blob BPF đã compile sẵn, child nạp trong preexec (sau khi dựng
+            # namespace, ngay trước exec) -> không chép file/parse YAML
+            ctx.seccomp_bpf, _ = self.bpf_cache.ensure(s.seccomp_policy)
+            ctx.seccomp_loader = self.bpf_cache.loader(s.seccomp_policy)
+        elif ctx.seccomp:
+            # CHROOT mode kiểu cũ (filter không thể nạp trước unshare/mount): vẫn đi qua secwrap như cũ
             # chép _secwrap.py + seccomp_helper.py + policy vào workdir
             import sandbox.seccomp.secwrap as _secwrap
             import sandbox.seccomp.seccomp_helper as _helper
@@ -53,10 +112,25 @@ class NsChrootExecutor(Executor):
             policy_host = Path(getattr(s, "seccomp_policy"))
             (workdir / "seccomp.yaml").write_text(policy_host.read_text(encoding="utf-8"), encoding="utf-8")
 
+        if self.disk_watch is not None and getattr(s, "work_max_bytes", 0) > 0:
+            ctx.disk_watch = self.disk_watch.watch(workdir, s.work_max_bytes,
+                                                   lambda used: self._disk_exceeded(ctx, used))
+
+        ctx.timings["prepare"] = time.monotonic() - t0
+        return ctx
+
+    def _disk_exceeded(self, ctx: ExecContext, used: int):
+        ctx.disk_exceeded = used
+        self._kill_tree(ctx)
+
     @staticmethod
-    def _preexec_set_rlimits(mem_bytes: int | None, nproc: int | None):
+    def _preexec_set_rlimits(mem_bytes: int | None, nproc: int | None, cgroup_fd: int | None = None,
+                             seccomp_loader=None, launcher=None):
         def _fn():
             import resource, os
+            # vào cgroup leaf đầu tiên, trước mọi thứ khác và trước exec code user
+            if cgroup_fd is not None:
+                os.write(cgroup_fd, b"0")
             # >>> TẠM THỜI COMMENT 3 DÒNG DƯỚI <<<
             # if mem_bytes:
             #     headroom = 16 * 1024 * 1024
@@ -67,26 +141,34 @@ class NsChrootExecutor(Executor):
             #     resource.setrlimit(resource.RLIMIT_NPROC, (nproc, nproc))
             resource.setrlimit(resource.RLIMIT_STACK, (8 * 1024 * 1024, 8 * 1024 * 1024))
             os.setsid()
+            # overlay rootfs: unshare + fork + mount + pivot_root (process trung gian không quay lại đây)
+            if launcher is not None:
+                launcher()
+            # seccomp sau cùng, ngay trước exec
+            if seccomp_loader is not None:
+                seccomp_loader()
 
         return _fn
 
-    def _rootfs_ready(self) -> bool:
+    def rootfs_ready(self) -> bool:
+        if self.overlay is not None:
+            return self.overlay.ready()
         return (self.rootfs / "bin/bash").exists()
 
     # ---------- command builders ----------
 
-    def _host_argv(self, spec: ExecSpec) -> list[str]:
-        s = load_settings()
-        if getattr(s, "seccomp_enabled", False):
+    def _host_argv(self, ctx: ExecContext, spec: ExecSpec) -> list[str]:
+        if ctx.seccomp and ctx.seccomp_loader is None:
             return [self._python, str(spec.workdir / "_secwrap.py"),
                     "--config", str(spec.workdir / "seccomp.yaml"), "--", *spec.cmd]
         # Không seccomp: chạy trực tiếp command, không qua bash
         return list(spec.cmd)
 
-    def _chroot_argv(self, spec: ExecSpec) -> list[str]:
+    def _chroot_argv(self, spec: ExecSpec, pooled: bool = False) -> list[str]:
         """
         Vẫn mount/chroot để cô lập FS, nhưng seccomp được APPLY TRƯỚC ở host (vì dùng .venv).
         Cách này: chạy unshare+mount+chroot bằng bash, còn code user chạy qua _secwrap.py (host .venv).
+        pooled: preexec đã setns vào net/ipc/uts của NsPool -> chỉ unshare user + mnt + pid.
         """
         mnt_work = str(self.rootfs / "work")
         mnt_proc = str(self.rootfs / "proc")
@@ -94,8 +176,15 @@ class NsChrootExecutor(Executor):
         # Lệnh bên trong chroot chạy: python (từ host .venv) đã không dùng trong chroot.
         # Ta sẽ chroot chỉ để cô lập FS, nhưng chuỗi chạy cuối cùng vẫn là: cd /work && <user cmd>
         # => Ở đây ta pass nguyên "cd /work && <cmd>" làm payload cho chroot bash.
-        inner = " ".join(map(shlex.quote, spec.cmd))
+        inner = " ".join(map(shlex.quote, OverlayRootfs.argv(spec.workdir, list(spec.cmd))))
         remount_flags = "noexec,nosuid,nodev" if self.noexec_work else "defaults"
+        exec_mount = exec_umount = ""
+        if spec.exec_dir is not None and self.noexec_work and spec.exec_dir.is_dir():
+            # vd build/ của C: binary chạy được nhưng job không ghi thêm file chạy được vào đó
+            mnt_exec = f"{mnt_work}/{spec.exec_dir.relative_to(spec.workdir)}"
+            exec_mount = (f"mount --bind '{mnt_exec}' '{mnt_exec}';"
+                          f"mount -o remount,bind,ro,nosuid,nodev,exec '{mnt_exec}';")
+            exec_umount = f"umount '{mnt_exec}' || true;"
 
         shell = (
             "set -e;"
@@ -103,61 +192,322 @@ class NsChrootExecutor(Executor):
             f"mount --bind '{spec.workdir}' '{mnt_work}';"
             f"mount -t proc proc '{mnt_proc}';"
             f"mount -o remount,bind,{remount_flags} '{mnt_work}';"
+            f"{exec_mount}"
             f"chroot '{self.rootfs}' /bin/bash --noprofile --norc -c 'cd /work && {inner}';"
             "rc=$?;"
             f"umount '{mnt_proc}' || true;"
+            f"{exec_umount}"
             f"umount '{mnt_work}' || true;"
             "exit $rc"
         )
+        ns_flags = ["--mount", "--pid", "--fork", "--user", "--map-root-user"] if pooled else [
+            "--mount", "--uts", "--ipc", "--pid", "--fork", "--net",
+            "--user", "--map-root-user"]
         return [
-            "unshare", "--mount", "--uts", "--ipc", "--pid", "--net",
-            "--user", "--map-root-user",
+            "unshare", *ns_flags,
             "env", "-i", "HOME=/root", "PATH=/usr/sbin:/usr/bin:/bin", "DEBUGINFOD_URLS=",
             "bash", "--noprofile", "--norc", "-c", shell
         ]
 
     # ---------- run ----------
 
-    def run(self, job_id: str, spec: ExecSpec) -> int:
-        # Mặc định: host mode (ổn định nhất). Nếu rootfs đủ mới dùng chroot argv.
-        argv = self._host_argv(spec) if not self._rootfs_ready() else self._chroot_argv(spec)
+    def run(self, ctx: ExecContext, spec: ExecSpec) -> int:
+        if ctx.cancelled or ctx.disk_exceeded is not None:
+            return -signal.SIGKILL
+        if self._use_zygote(ctx, spec):
+            return self._run_zygote(ctx, spec)
 
-        # Nếu bật seccomp, ensure argv là _secwrap.py -- ... để chặn ngay từ đầu
-        s = load_settings()
-        if getattr(s, "seccomp_enabled", False) and argv and "_secwrap.py" not in " ".join(argv):
+        p, peak_fd, t0 = self._spawn(ctx, spec)
+        try:
+            done = self._wait(p, spec.timeout_s)
+            if done is None:
+                self._kill_tree(ctx)
+                try:
+                    p.wait(timeout=2)
+                except Exception:
+                    pass
+        finally:
+            self._take_peak(ctx, peak_fd)
+        return self._reap(ctx, spec, done, t0)
+
+    def start(self, ctx: ExecContext, spec: ExecSpec, on_done: Callable[[int | None, BaseException | None], None]) -> bool:
+        """
+        Như run() nhưng không chặn: spawn rồi giao process cho Supervisor (pidfd + deadline timer).
+        on_done(rc, None) / on_done(None, lỗi) chạy trên thread hoàn tất của supervisor.
+        False = không chạy được kiểu này (không có supervisor/pidfd, zygote, đã cancel) -> gọi run().
+        """
+        if (self.supervisor is None or not self.supervisor.available or ctx.cancelled
+                or ctx.disk_exceeded is not None or self._use_zygote(ctx, spec)):
+            return False
+        p, peak_fd, t0 = self._spawn(ctx, spec)
+
+        def exited(rc: int, ru, timed_out: bool):
+            p.returncode = rc  # supervisor đã reap bằng wait4
+            try:
+                self._take_peak(ctx, peak_fd)
+                res = self._reap(ctx, spec, None if timed_out else (rc, ru), t0)
+            except BaseException as e:
+                on_done(None, e)
+                return
+            on_done(res, None)
+
+        try:
+            self.supervisor.watch(p.pid, spec.timeout_s, exited, on_timeout=lambda: self._kill_tree(ctx))
+        except OSError:
+            # không mở được pidfd (hết fd...): không để process mồ côi
+            self._kill_tree(ctx)
+            p.wait()
+            self._take_peak(ctx, peak_fd)
+            raise
+        return True
+
+    def _use_zygote(self, ctx: ExecContext, spec: ExecSpec) -> bool:
+        # zygote chạy bằng interpreter của job (không có binding seccomp của .venv service) -> chỉ nạp được blob BPF
+        return (self.zygote_pool is not None and spec.py_entry is not None and not self.rootfs_ready()
+                and (not ctx.seccomp or ctx.seccomp_bpf is not None))
+
+    def _spawn(self, ctx: ExecContext, spec: ExecSpec) -> tuple[subprocess.Popen, int | None, float]:
+        # Mặc định: host mode (ổn định nhất). Nếu rootfs đủ mới dùng chroot (overlay launcher hoặc argv cũ).
+        launcher = ns = None
+        env = spec.env or {}
+        if not self.rootfs_ready():
+            argv = self._host_argv(ctx, spec)
+        else:
+            ns = self.ns_pool.acquire() if self.ns_pool is not None else None
+            if self.overlay is not None:
+                argv = self.overlay.argv(spec.workdir, list(spec.cmd))
+                env = self.overlay.env(env)
+                launcher = self.overlay.launcher(spec.workdir, ns, spec.exec_dir)
+            else:
+                argv = self._chroot_argv(spec, pooled=ns is not None)
+                launcher = ns.enter if ns is not None else None
+
+        # Nếu bật seccomp (không có blob BPF), ensure argv là _secwrap.py -- ... để chặn ngay từ đầu
+        if (ctx.seccomp and ctx.seccomp_loader is None
+                and argv and "_secwrap.py" not in " ".join(argv)):
             argv = [self._python, str(spec.workdir / "_secwrap.py"), "--config", str(spec.workdir / "seccomp.yaml"), "--"] + argv
 
-        p = subprocess.Popen(
-            argv,
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-            text=True,
-            cwd=str(spec.workdir),
-            env=spec.env or {},
-            preexec_fn=self._preexec_set_rlimits(self._rlimit_mem_bytes, self._rlimit_nproc),
-        )
+        # stdout/stderr của child ghi thẳng vào file log (stream có cap: qua relay), service không giữ output trong RAM
+        cg_fd = open_procs_fd(ctx.leaf) if self.cgroup_launcher == "preexec" else None
+        peak_fd = open_memory_peak(ctx.leaf)
+        out_fd, err_fd = self._open_logs(ctx, spec)
+        t_spawn = time.monotonic()
+        try:
+            with open(spec.stdin_path or os.devnull, "rb") as fin:
+                p = subprocess.Popen(
+                    argv,
+                    stdin=fin,
+                    stdout=out_fd,
+                    stderr=err_fd,
+                    cwd=str(spec.workdir),
+                    env=env,
+                    preexec_fn=self._preexec_set_rlimits(ctx.rlimit_mem_bytes, ctx.rlimit_nproc, cg_fd,
+                                                         ctx.seccomp_loader, launcher),
+                )
+        except BaseException:
+            if peak_fd is not None:
+                os.close(peak_fd)
+            raise
+        finally:
+            # child đã có bản dup; đóng đầu ghi của service -> relay thấy EOF khi job thoát
+            os.close(out_fd); os.close(err_fd)
+            if cg_fd is not None:
+                os.close(cg_fd)
+            if ns is not None:
+                self.ns_pool.release(ns)  # đã setns xong (hoặc spawn lỗi): đóng fd ở thread nền
+        ctx.pid = p.pid
 
-        # gắn vào cgroup leaf NGAY sau khi fork
-        attach(self.leaf, p.pid)
+        if self.cgroup_launcher != "preexec":
+            # cách cũ: gắn vào cgroup leaf sau khi fork (có khoảng hở nhỏ)
+            attach(ctx.leaf, p.pid)
+        t0 = time.monotonic()
+        ctx.timings["spawn"] = t0 - t_spawn
+        ctx.timings["startup"] = ctx.timings["spawn"]  # đường thường: chỉ đo được tới lúc Popen trả về
+        return p, peak_fd, t0
 
+    def _reap(self, ctx: ExecContext, spec: ExecSpec, done, t0: float) -> int:
+        """done = (exit code, rusage) hoặc None nếu hết giờ (process đã bị kill)."""
+        ctx.timings["run"] = time.monotonic() - t0
+        ctx.pid = None
+        if done is None:
+            wait_unpopulated(ctx.leaf)  # con cháu thoát hết -> CPU/RAM trả lại ngay, leaf rmdir được
+            self._end_run(ctx, spec)
+            with open(self._log_paths(spec)[1], "a") as f:
+                f.write("TIMEOUT\n")
+            return 124
+
+        rc, ru = done
+        if ctx.peak_memory_kb is None and ru is not None:
+            # không có memory.peak: ru_maxrss (gồm cả RSS kế thừa lúc fork, chỉ là cận trên)
+            ctx.peak_memory_kb = ru.ru_maxrss
+        ctx.cpu_s = ru.ru_utime + ru.ru_stime if ru is not None else None
+        self._end_run(ctx, spec)
+        return rc
+
+    @staticmethod
+    def _take_peak(ctx: ExecContext, peak_fd: int | None):
+        ctx.peak_memory_kb = None
+        if peak_fd is not None:
+            peak = read_memory_peak(peak_fd)
+            os.close(peak_fd)
+            if peak is not None:
+                ctx.peak_memory_kb = peak // 1024
+
+    @staticmethod
+    def _wait(p: subprocess.Popen, timeout_s: float):
+        """
+        Chờ child tối đa timeout_s, reap bằng wait4 để lấy rusage (peak RSS, CPU time).
+        Trả về (exit code, rusage) hoặc None nếu hết giờ (child chưa bị reap).
+        """
+        deadline = time.monotonic() + timeout_s
+        try:
+            pidfd = os.pidfd_open(p.pid)  # Linux >= 5.3: đọc được khi child thoát, không cần poll
+        except (AttributeError, OSError):
+            pidfd = None
         try:
-            out, err = p.communicate(timeout=spec.timeout_s)
-        except subprocess.TimeoutExpired:
-            os.killpg(p.pid, signal.SIGKILL)
+            while True:
+                pid, status, ru = os.wait4(p.pid, os.WNOHANG)
+                if pid:
+                    p.returncode = os.waitstatus_to_exitcode(status)
+                    return p.returncode, ru
+                left = deadline - time.monotonic()
+                if left <= 0:
+                    return None
+                if pidfd is not None:
+                    select.select([pidfd], [], [], left)
+                else:
+                    time.sleep(min(0.01, left))
+        finally:
+            if pidfd is not None:
+                os.close(pidfd)
+
+    # ---------- log files ----------
+
+    @staticmethod
+    def _log_paths(spec: ExecSpec) -> tuple[Path, Path]:
+        return (spec.stdout_path or spec.workdir / "stdout.log",
+                spec.stderr_path or spec.workdir / "stderr.log")
+
+    def _open_logs(self, ctx: ExecContext, spec: ExecSpec) -> tuple[int, int]:
+        """fd stdout/stderr cho child: file log, hoặc đầu ghi pipe của relay nếu stream có cap."""
+        ctx.log_pipes = []
+        fds = []
+        for path, cap in zip(self._log_paths(spec), (spec.stdout_max_bytes, spec.stderr_max_bytes)):
+            if cap and self.log_relay is not None:
+                pipe = self.log_relay.attach(path, cap)
+                ctx.log_pipes.append(pipe)
+                fds.append(pipe.wfd)
+            else:
+                fds.append(os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC | os.O_CLOEXEC, 0o644))
+        return fds[0], fds[1]
+
+    def _end_run(self, ctx: ExecContext, spec: ExecSpec):
+        """Process đã thoát: chốt log rồi đo workdir lần cuối (mốc quota cho lần run() sau)."""
+        self._cap_logs(ctx, spec)
+        if ctx.disk_watch is not None:
+            self.disk_watch.check(ctx.disk_watch, rebase=True)
+
+    def _cap_logs(self, ctx: ExecContext, spec: ExecSpec):
+        t0 = time.monotonic()
+        relayed = {}
+        for pipe in ctx.log_pipes:
+            relayed[pipe.path] = self.log_relay.finish(pipe)
+        ctx.log_pipes = []
+        for path, cap in zip(self._log_paths(spec), (spec.stdout_max_bytes, spec.stderr_max_bytes)):
+            if not cap:
+                continue
+            if path in relayed:
+                # relay đã dừng ghi ở cap, phần sau bị đọc bỏ
+                if relayed[path]:
+                    with open(path, "ab") as f:
+                        f.write(f"\n[output truncated at {cap} bytes]\n".encode())
+                    ctx.output_truncated = True
+                continue
             try:
-                out, err = p.communicate(timeout=2)
-            except Exception:
-                out, err = "", "TIMEOUT\n"
-            (spec.workdir / "stdout.log").write_text(out or "")
-            (spec.workdir / "stderr.log").write_text(
-                (err or "") + ("TIMEOUT\n" if "TIMEOUT" not in (err or "") else ""))
+                size = path.stat().st_size
+            except FileNotFoundError:
+                continue
+            if size > cap:
+                with open(path, "r+b") as f:
+                    f.truncate(cap)
+                    f.seek(cap)
+                    f.write(f"\n[output truncated at {cap} bytes]\n".encode())
+                ctx.output_truncated = True
+        ctx.timings["logs"] = time.monotonic() - t0
+
+    def _run_zygote(self, ctx: ExecContext, spec: ExecSpec) -> int:
+        # child của zygote mở lại đúng fd log/pipe của service qua /proc (giữ mở tới khi job xong)
+        out_fd, err_fd = self._open_logs(ctx, spec)
+        fd_dir = f"/proc/{os.getpid()}/fd"
+        req = {
+            "entry": str(spec.py_entry),
+            "cwd": str(spec.workdir),
+            "env": spec.env or {},
+            "cgroup_procs": str(ctx.leaf / "cgroup.procs") if (USE_CGROUP and ctx.leaf) else None,
+            "stdin": str(spec.stdin_path) if spec.stdin_path else None,
+            "stdout": f"{fd_dir}/{out_fd}",
+            "stderr": f"{fd_dir}/{err_fd}",
+            "seccomp_bpf": str(ctx.seccomp_bpf) if ctx.seccomp_bpf else None,
+        }
+        peak_fd = open_memory_peak(ctx.leaf)
+        t0 = time.monotonic()
+        try:
+            status, timed_out, startup, usage = self.zygote_pool.run(
+                req, spec.timeout_s, on_pid=lambda pid: setattr(ctx, "pid", pid),
+                kill=lambda _pid: self._kill_tree(ctx))
+        finally:
+            ctx.pid = None
+            os.close(out_fd); os.close(err_fd)
+            self._take_peak(ctx, peak_fd)
+        if timed_out:
+            wait_unpopulated(ctx.leaf)
+        ctx.timings["run"] = time.monotonic() - t0
+        if not timed_out:
+            if ctx.peak_memory_kb is None:
+                ctx.peak_memory_kb = usage.get("maxrss")
+            ctx.cpu_s = usage.get("cpu")
+        if startup is not None:
+            ctx.timings["startup"] = startup  # request -> ngay trước khi chạy code user
+        self._end_run(ctx, spec)
+        if timed_out:
+            with open(self._log_paths(spec)[1], "a") as f:
+                f.write("TIMEOUT\n")
             return 124
+        return os.waitstatus_to_exitcode(status)
+
+    def kill(self, ctx: ExecContext):
+        """Huỷ job (API cancel): lần run() đang chạy trả về ngay, run() sau không spawn nữa."""
+        ctx.cancelled = True
+        self._kill_tree(ctx)
+
+    @staticmethod
+    def _kill_tree(ctx: ExecContext):
+        # cgroup.kill: cả leaf, kể cả process đã tự setsid ra khỏi group; không có cgroup thì killpg
+        if kill_leaf(ctx.leaf):
+            return
+        pid = ctx.pid
+        if pid is None:
+            return
+        try:
+            os.killpg(pid, signal.SIGKILL)
+        except (ProcessLookupError, PermissionError):
+            try:
+                os.kill(pid, signal.SIGKILL)
+            except ProcessLookupError:
+                pass
 
-        (spec.workdir / "stdout.log").write_text(out or "")
-        (spec.workdir / "stderr.log").write_text(err or "")
-        return p.returncode
+    def cleanup(self, ctx: ExecContext):
+        if ctx.disk_watch is not None:
+            self.disk_watch.unwatch(ctx.disk_watch)
+            ctx.disk_watch = None
+        if ctx.leaf:
+            t0 = time.monotonic()
+            # đọc accounting trước khi leaf biến mất
+            ctx.usage = read_usage(ctx.leaf)
+            if ctx.pooled and self.leaf_pool is not None:
+                self.leaf_pool.release(ctx.leaf)  # teardown + bù leaf mới ở thread nền
+            else:
+                teardown(ctx.leaf)
+            ctx.leaf = None
+            ctx.timings["cleanup"] = time.monotonic() - t0
 
-    def cleanup(self, job_id: str):
-        if self.leaf:
-            teardown(self.leaf)
-            self.leaf = None
@@ -0,0 +1,262 @@
+# src/sandbox/executor/nspool.py
+"""
+Pool namespace dựng sẵn cho CHROOT mode: mỗi bộ = net (loopback đã bật nếu enable_loopback) + ipc + uts
+(hostname đã set).
+
+- net/ipc/uts là namespace theo thread: thread nền unshare, mở /proc/thread-self/ns/* rồi setns về ns
+  của service -> không fork, fd giữ namespace sống. Job setns() vào bộ đã dựng (lúc còn là root của
+  host, trước khi unshare user ns) thay vì unshare.
+- user/mnt/pid vẫn unshare theo job (rẻ): user và mnt không unshare được trong process nhiều thread,
+  PID ns chưa có init thì không mở được qua pid_for_children.
+- Bộ thuộc user ns của host: job không có CAP_NET_ADMIN trên net ns (không đổi được interface/route).
+  Chỉ dùng cho 1 job (job vẫn ghi được /proc/sys, giữ được socket/IPC object -> không "rửa" lại được):
+  dùng xong đóng fd ở thread nền (kernel dọn net ns khi process cuối trong đó thoát), job sau lấy bộ mới.
+- Health check: lúc dựng (ns khác của service, net ns chỉ có lo), lúc lấy (fd còn trỏ đúng ns), định kỳ
+  (bộ nằm quá max_idle_s thì bỏ, dựng lại). Dựng lỗi liên tiếp (vd service không phải root) -> tạm ngưng,
+  acquire() trả None -> launcher unshare on-demand như cũ.
+"""
+from __future__ import annotations
+import os, threading, time
+from collections import deque
+
+from .rootfs import CLONE_NEWIPC, CLONE_NEWNET, CLONE_NEWUTS, _check, _libc, _loopback_up, setns, unshare
+
+_KINDS = (("net", CLONE_NEWNET), ("ipc", CLONE_NEWIPC), ("uts", CLONE_NEWUTS))
+_FAIL_LIMIT = 3  # dựng lỗi liên tiếp bấy nhiêu lần -> ngưng tới lần health check sau
+
+
+class NsSet:
+    """1 bộ namespace đã dựng: fd tới từng ns (+ inode để kiểm tra), chỉ dùng cho 1 job."""
+    __slots__ = ("fds", "inodes", "created")
+
+    def __init__(self, fds: dict[str, int], inodes: dict[str, int]):
+        self.fds = fds
+        self.inodes = inodes
+        self.created = time.monotonic()
+
+    def alive(self) -> bool:
+        try:
+            return all(os.fstat(fd).st_ino == self.inodes[k] for k, fd in self.fds.items())
+        except OSError:
+            return False
+
+    def enter(self):
+        """Chạy trong preexec, trước khi unshare user ns (setns cần CAP_SYS_ADMIN ở user ns của host)."""
+        for kind, flag in _KINDS:
+            setns(self.fds[kind], flag)
+
+    def close(self):
+        for fd in self.fds.values():
+            try:
+                os.close(fd)
+            except OSError:
+                pass
+        self.fds = {}
+
+
+class NsPool:
+    """
+    Giống LeafPool: acquire() lấy bộ rảnh (hết/không khoẻ -> None, caller unshare on-demand),
+    release() đẩy việc đóng bộ đã dùng + dựng bù sang thread nền.
+    """
+
+    def __init__(self, size: int = 8, low_watermark: int = 2, *, hostname: str = "sandbox",
+                 enable_loopback: bool = False, max_idle_s: float = 300.0, check_s: float = 30.0):
+        self.size = max(0, int(size))
+        self.low_watermark = max(0, min(int(low_watermark), self.size))
+        self.hostname = hostname
+        self.enable_loopback = enable_loopback
+        self.max_idle_s = float(max_idle_s)
+        self.check_s = max(1.0, float(check_s))
+        self._idle: deque[NsSet] = deque()
+        self._lock = threading.Lock()
+        self._cv = threading.Condition(self._lock)
+        self._tasks: deque = deque()  # ("retire", NsSet) | ("refill", None), tối đa 1 "refill" đang chờ
+        self._host: dict[str, int] = {}
+        self._home: dict[str, int] = {}  # fd ns của service, thread nền setns về sau mỗi lần dựng
+        self._stop = False
+        self._thread: threading.Thread | None = None
+        self._fails = 0
+        self.healthy = True
+        self.hits = 0
+        self.misses = 0
+        self.created = 0
+        self.retired = 0
+        self.expired = 0
+        self.errors = 0
+        self.create_s = 0.0
+
+    # ------------ lifecycle ------------
+
+    def start(self):
+        if self._thread:
+            return
+        self._home = {k: os.open(f"/proc/self/ns/{k}", os.O_RDONLY | os.O_CLOEXEC) for k, _ in _KINDS}
+        self._host = {k: os.fstat(fd).st_ino for k, fd in self._home.items()}
+        with self._lock:
+            self._tasks.append(("refill", None))
+        self._thread = threading.Thread(target=self._loop, name="sbx-ns-pool", daemon=True)
+        self._thread.start()
+
+    def close(self):
+        with self._lock:
+            self._stop = True
+            sets = list(self._idle) + [arg for kind, arg in self._tasks if kind == "retire"]
+            self._idle.clear()
+            self._tasks.clear()
+            self._cv.notify()
+        if self._thread:
+            self._thread.join(timeout=5)
+            self._thread = None
+        for ns in sets:
+            ns.close()
+        for fd in self._home.values():
+            os.close(fd)
+        self._home = {}
+
+    # ------------ API ------------
+
+    def acquire(self) -> NsSet | None:
+        with self._lock:
+            while self._idle:
+                ns = self._idle.popleft()
+                if ns.alive():
+                    self.hits += 1
+                    if len(self._idle) < self.low_watermark:
+                        self._want_refill()
+                    return ns
+                self.errors += 1
+                self._tasks.append(("retire", ns))
+            self.misses += 1
+            if self._thread is not None:
+                self._want_refill()
+            self._cv.notify()
+            return None
+
+    def release(self, ns: NsSet):
+        """Job đã setns xong (Popen trả về): service không cần fd nữa, namespace sống theo process của job."""
+        with self._lock:
+            self._tasks.append(("retire", ns))
+            self._cv.notify()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "idle": len(self._idle),
+                "size": self.size,
+                "healthy": self.healthy,
+                "pending_tasks": len(self._tasks),
+                "hits": self.hits,
+                "misses": self.misses,
+                "created": self.created,
+                "retired": self.retired,
+                "expired": self.expired,
+                "errors": self.errors,
+                "create_ms_avg": self.create_s / self.created * 1e3 if self.created else None,
+            }
+
+    # ------------ nền ------------
+
+    def _create(self) -> NsSet:
+        """Chạy trên thread nền: chỉ thread này đổi namespace, xong luôn setns về ns của service."""
+        t0 = time.monotonic()
+        unshare(CLONE_NEWNET | CLONE_NEWIPC | CLONE_NEWUTS)
+        fds: dict[str, int] = {}
+        try:
+            hostname = self.hostname.encode()
+            _check(_libc.sethostname(hostname, len(hostname)), "sethostname")
+            if self.enable_loopback:
+                _loopback_up()
+            for kind, _ in _KINDS:
+                fds[kind] = os.open(f"/proc/thread-self/ns/{kind}", os.O_RDONLY | os.O_CLOEXEC)
+            inodes = {k: os.fstat(fd).st_ino for k, fd in fds.items()}
+            shared = [k for k, ino in inodes.items() if ino == self._host.get(k)]
+            if shared:
+                raise OSError(f"namespace not isolated: {shared}")
+            with open("/proc/thread-self/net/dev") as f:
+                ifaces = [line.split(":")[0].strip() for line in f.readlines()[2:]]
+            if ifaces != ["lo"]:
+                raise OSError(f"unexpected interfaces in new net ns: {ifaces}")
+        except BaseException:
+            for fd in fds.values():
+                os.close(fd)
+            raise
+        finally:
+            for kind, flag in _KINDS:
+                setns(self._home[kind], flag)
+        self.create_s += time.monotonic() - t0
+        return NsSet(fds, inodes)
+
+    def _want_refill(self):
+        """Gọi khi giữ lock: xếp 1 lượt dựng nếu chưa có lượt nào đang chờ."""
+        if self.healthy and not self._stop and ("refill", None) not in self._tasks:
+            self._tasks.append(("refill", None))
+            self._cv.notify()
+
+    def _refill(self):
+        """Mỗi lượt dựng 1 bộ, còn thiếu thì xếp lượt sau cuối hàng -> đóng bộ đã dùng không phải chờ cả đợt."""
+        with self._lock:
+            if self._stop or not self.healthy or len(self._idle) >= self.size:
+                return
+        try:
+            ns = self._create()
+        except Exception as e:
+            with self._lock:
+                self.errors += 1
+                self._fails += 1
+                if self._fails >= _FAIL_LIMIT:
+                    self.healthy = False
+                self._want_refill()
+            print(f"[WARN] ns pool: create failed: {e}")
+            return
+        with self._lock:
+            if not self._stop:
+                self._fails = 0
+                self._idle.append(ns)
+                self.created += 1
+                if len(self._idle) < self.size:
+                    self._want_refill()
+                return
+        ns.close()
+
+    def _check(self):
+        """Health check định kỳ: bỏ bộ hỏng/nằm quá lâu, thử dựng lại nếu đang tạm ngưng."""
+        now = time.monotonic()
+        with self._lock:
+            keep, drop = deque(), []
+            for ns in self._idle:
+                stale = self.max_idle_s > 0 and now - ns.created > self.max_idle_s
+                (drop if stale or not ns.alive() else keep).append(ns)
+            self._idle = keep
+            self.expired += len(drop)
+            self.retired += len(drop)
+            self._fails = 0
+            self.healthy = True
+            self._want_refill()
+        for ns in drop:
+            ns.close()
+
+    def _loop(self):
+        next_check = time.monotonic() + self.check_s
+        while True:
+            with self._lock:
+                while not self._tasks and not self._stop and time.monotonic() < next_check:
+                    self._cv.wait(next_check - time.monotonic())
+                if self._stop:
+                    return
+                # hàng đợi bận liên tục vẫn không bỏ lỡ health check định kỳ
+                due = time.monotonic() >= next_check
+                kind, arg = ("check", None) if due else self._tasks.popleft()
+            try:
+                if kind == "retire":
+                    arg.close()
+                    with self._lock:
+                        self.retired += 1
+                elif kind == "refill":
+                    self._refill()
+                else:
+                    self._check()
+            except Exception as e:
+                print(f"[WARN] ns pool task {kind}: {e}")
+            if due:
+                next_check = time.monotonic() + self.check_s
@@ -0,0 +1,235 @@
+# src/sandbox/executor/rootfs.py
+"""
+Rootfs cho CHROOT mode: image gốc read-only dùng chung + overlay riêng cho từng job.
+
+- lowerdir = image gốc (settings.rootfs), không job nào ghi được -> mọi job đọc chung 1 bản trong page cache.
+- upperdir nằm trên tmpfs size=<upper_size> của riêng job: ghi vào "/" của job bị giới hạn, tính vào
+  memory của leaf cgroup, mất khi job xong.
+- Launcher chạy trong preexec của Popen (không bash/unshare/mount binary):
+    unshare(user|mnt|uts|ipc|net|pid) (có NsPool: setns net|ipc|uts dựng sẵn + unshare user|mnt|pid) -> fork (con = pid 1 của PID ns) -> tmpfs + overlay + bind /work + proc
+    + /dev/{null,zero,full,random,urandom} bind từ host -> pivot_root -> 1 lần umount2(MNT_DETACH) bỏ cây
+    mount của host -> exec lệnh của job.
+- Mọi mount nằm trong mount namespace riêng của job: process cuối thoát là kernel gỡ hết (kể cả khi
+  service chết), service không phải umount hay dọn thư mục gì. Vì vậy mọi job mount tmpfs ở cùng 1 đường dẫn.
+"""
+from __future__ import annotations
+import ctypes, fcntl, os, platform, signal, socket, struct
+from pathlib import Path
+from typing import TYPE_CHECKING, Callable
+
+if TYPE_CHECKING:
+    from .nspool import NsSet
+
+CLONE_NEWNS = 0x00020000
+CLONE_NEWUTS = 0x04000000
+CLONE_NEWIPC = 0x08000000
+CLONE_NEWUSER = 0x10000000
+CLONE_NEWPID = 0x20000000
+CLONE_NEWNET = 0x40000000
+
+MS_RDONLY, MS_NOSUID, MS_NODEV, MS_NOEXEC = 1, 2, 4, 8
+MS_REMOUNT = 32
+MS_NOATIME, MS_NODIRATIME, MS_RELATIME = 1024, 2048, 1 << 21
+MS_BIND = 4096
+MS_REC = 16384
+MS_PRIVATE = 1 << 18
+MNT_DETACH = 2
+
+_SYS_PIVOT_ROOT = {"x86_64": 155, "aarch64": 41}.get(platform.machine())
+
+# cờ của mount gốc (statvfs.f_flag) bị khoá trong user namespace -> remount phải giữ lại
+_ST_KEEP = {os.ST_RDONLY: MS_RDONLY, os.ST_NOSUID: MS_NOSUID, os.ST_NODEV: MS_NODEV, os.ST_NOEXEC: MS_NOEXEC,
+            os.ST_NOATIME: MS_NOATIME, os.ST_NODIRATIME: MS_NODIRATIME, os.ST_RELATIME: MS_RELATIME}
+
+# mount tạo trong user namespace luôn bị nodev -> node trong image không mở được, bind node của host vào
+_DEV_NODES = ("null", "zero", "full", "random", "urandom")
+
+_libc = ctypes.CDLL(None, use_errno=True)
+
+
+def _check(rc: int, what: str):
+    if rc != 0:
+        e = ctypes.get_errno()
+        raise OSError(e, f"{what}: {os.strerror(e)}")
+
+
+def _b(x) -> bytes | None:
+    return None if x is None else os.fsencode(x)
+
+
+def mount(source, target, fstype=None, flags: int = 0, data: str | None = None):
+    _check(_libc.mount(_b(source), _b(target), _b(fstype), ctypes.c_ulong(flags), _b(data)), f"mount {target}")
+
+
+def umount2(target, flags: int = 0):
+    _check(_libc.umount2(_b(target), flags), f"umount {target}")
+
+
+def unshare(flags: int):
+    _check(_libc.unshare(flags), "unshare")
+
+
+def setns(fd: int, nstype: int):
+    _check(_libc.setns(fd, nstype), "setns")
+
+
+def pivot_root(new_root, put_old):
+    if _SYS_PIVOT_ROOT is None:
+        raise OSError(f"pivot_root: unsupported arch {platform.machine()}")
+    _check(_libc.syscall(_SYS_PIVOT_ROOT, _b(new_root), _b(put_old)), "pivot_root")
+
+
+def _write(path: str, text: str):
+    fd = os.open(path, os.O_WRONLY)
+    try:
+        os.write(fd, text.encode())
+    finally:
+        os.close(fd)
+
+
+def _loopback_up():
+    SIOCGIFFLAGS, SIOCSIFFLAGS, IFF_UP = 0x8913, 0x8914, 0x1
+    with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as s:
+        ifr = fcntl.ioctl(s, SIOCGIFFLAGS, struct.pack("16sh22x", b"lo", 0))
+        flags = struct.unpack("16sh22x", ifr)[1]
+        fcntl.ioctl(s, SIOCSIFFLAGS, struct.pack("16sh22x", b"lo", flags | IFF_UP))
+
+
+def _relay(pid: int):
+    """Process trung gian (con trực tiếp của service): chờ pid 1 của job rồi thoát với đúng status đó."""
+    try:
+        # đóng pipe báo lỗi exec của subprocess -> Popen trả về ngay khi job exec xong, không chờ tới lúc job thoát
+        os.closerange(3, os.sysconf("SC_OPEN_MAX"))
+        while True:
+            try:
+                _, status = os.waitpid(pid, 0)
+                break
+            except InterruptedError:
+                continue
+        if os.WIFSIGNALED(status):
+            sig = os.WTERMSIG(status)
+            signal.signal(sig, signal.SIG_DFL)
+            os.kill(os.getpid(), sig)
+        os._exit(os.waitstatus_to_exitcode(status) & 0xFF)
+    finally:
+        os._exit(255)
+
+
+def resolve_in(root: Path, path: str) -> Path | None:
+    """
+    Đường dẫn tuyệt đối như job thấy sau khi chroot vào `root` -> file tương ứng trên host.
+    Symlink (kể cả tuyệt đối, vd /etc/alternatives/javac) theo trong `root`; None = không có trong rootfs.
+    """
+    parts = [x for x in path.split("/") if x not in ("", ".")]
+    cur: list[str] = []
+    hops = 0
+    while parts:
+        name = parts.pop(0)
+        if name == "..":
+            cur = cur[:-1]
+            continue
+        host = Path(root, *cur, name)
+        if host.is_symlink():
+            hops += 1
+            if hops > 40:
+                return None
+            target = os.readlink(host)
+            if target.startswith("/"):
+                cur = []
+            parts = [x for x in target.split("/") if x not in ("", ".")] + parts
+            continue
+        if not os.path.lexists(host):
+            return None
+        cur.append(name)
+    return Path(root, *cur)
+
+
+class OverlayRootfs:
+    def __init__(self, base: Path, scratch: Path, upper_size: str = "64m", *,
+                 noexec_work: bool = True, enable_loopback: bool = False, hostname: str = "sandbox"):
+        self.base = Path(base)
+        self.scratch = Path(scratch)  # mountpoint tmpfs của job (trong mount ns riêng), rỗng trên host
+        self.upper_size = str(upper_size)
+        self.noexec_work = noexec_work
+        self.enable_loopback = enable_loopback
+        self.hostname = hostname
+
+    def ready(self) -> bool:
+        return (self.base / "bin").is_dir() or (self.base / "usr/bin").is_dir()
+
+    def start(self):
+        self.scratch.mkdir(parents=True, exist_ok=True)
+
+    @staticmethod
+    def argv(workdir: Path, cmd: list[str]) -> list[str]:
+        """Đường dẫn host trong workdir -> /work (workdir được bind vào /work của job)."""
+        prefix = str(workdir).rstrip("/")
+        return ["/work" + a[len(prefix):] if a == prefix or a.startswith(prefix + "/") else a for a in cmd]
+
+    @staticmethod
+    def env(env: dict) -> dict:
+        return {"HOME": "/root", "PATH": "/usr/local/bin:/usr/sbin:/usr/bin:/sbin:/bin", **(env or {})}
+
+    def launcher(self, workdir: Path, ns: NsSet | None = None, exec_dir: Path | None = None) -> Callable[[], None]:
+        """
+        Hàm chạy trong preexec_fn (sau setsid, trước seccomp); mọi giá trị tính sẵn ở process service.
+        ns: bộ net/ipc/uts dựng sẵn của NsPool (hostname, lo đã xong) -> setns, chỉ unshare user + mnt + pid.
+        exec_dir: thư mục trong workdir (vd build/ chứa binary C) bind lại read-only, không noexec.
+        """
+        uid, gid = os.getuid(), os.getgid()
+        base, tmp = str(self.base), str(self.scratch)
+        upper, ovl_work, root = f"{tmp}/upper", f"{tmp}/work", f"{tmp}/root"
+        data = f"lowerdir={base},upperdir={upper},workdir={ovl_work}"
+        tmpfs_opts = f"size={self.upper_size},mode=0755"
+        st = os.statvfs(workdir)
+        work_flags = MS_REMOUNT | MS_BIND | MS_NOSUID | MS_NODEV | (MS_NOEXEC if self.noexec_work else 0)
+        work_flags |= sum(ms for stf, ms in _ST_KEEP.items() if st.f_flag & stf)
+        work_src = str(workdir)
+        exec_at = exec_flags = None
+        if exec_dir is not None and self.noexec_work and exec_dir.is_dir():
+            exec_at = f"{root}/work/{exec_dir.relative_to(workdir)}"
+            exec_flags = MS_REMOUNT | MS_BIND | MS_RDONLY | MS_NOSUID | MS_NODEV
+            exec_flags |= sum(ms for stf, ms in _ST_KEEP.items() if os.statvfs(exec_dir).f_flag & stf)
+        hostname, loopback = self.hostname.encode(), self.enable_loopback
+
+        def _fn():
+            if ns is not None:
+                ns.enter()  # còn là root của host: setns trước, unshare user ns sau
+                unshare(CLONE_NEWUSER | CLONE_NEWNS | CLONE_NEWPID)
+            else:
+                unshare(CLONE_NEWUSER | CLONE_NEWNS | CLONE_NEWUTS | CLONE_NEWIPC | CLONE_NEWNET | CLONE_NEWPID)
+            _write("/proc/self/setgroups", "deny")
+            _write("/proc/self/uid_map", f"0 {uid} 1")
+            _write("/proc/self/gid_map", f"0 {gid} 1")
+            pid = os.fork()
+            if pid:
+                _relay(pid)  # không bao giờ return
+            # từ đây: pid 1 của PID namespace mới, root trong user namespace mới
+            mount(None, "/", None, MS_REC | MS_PRIVATE)
+            mount("tmpfs", tmp, "tmpfs", MS_NOSUID | MS_NODEV, tmpfs_opts)
+            for d in (upper, ovl_work, root):
+                os.mkdir(d)
+            mount("overlay", root, "overlay", 0, data)
+            for d in ("work", "proc", "dev"):
+                os.makedirs(f"{root}/{d}", exist_ok=True)
+            for name in _DEV_NODES:
+                node = f"{root}/dev/{name}"
+                if not os.path.lexists(node):
+                    os.close(os.open(node, os.O_CREAT | os.O_WRONLY, 0o666))
+                mount(f"/dev/{name}", node, None, MS_BIND)
+            mount(work_src, f"{root}/work", None, MS_BIND | MS_REC)
+            mount(None, f"{root}/work", None, work_flags)
+            if exec_at is not None:
+                mount(exec_at, exec_at, None, MS_BIND)
+                mount(None, exec_at, None, exec_flags)
+            mount("proc", f"{root}/proc", "proc", MS_NOSUID | MS_NODEV | MS_NOEXEC)
+            os.chdir(root)
+            pivot_root(".", ".")
+            umount2(".", MNT_DETACH)  # teardown duy nhất: cả cây mount của host rời khỏi job
+            os.chdir("/work")
+            if ns is None:
+                _check(_libc.sethostname(hostname, len(hostname)), "sethostname")
+                if loopback:
+                    _loopback_up()
+
+        return _fn
@@ -0,0 +1,174 @@
+# src/sandbox/executor/supervisor.py
+"""
+Giám sát process của job bằng 1 vòng lặp epoll thay vì 1 thread chặn cho mỗi job.
+
+- Chờ exit: pidfd (Linux >= 5.3) đọc được khi process thoát -> wait4(WNOHANG) lấy status + rusage.
+- Deadline: heap (deadline, seq); hết giờ gọi on_timeout() (kill cả leaf) rồi tiếp tục chờ exit.
+- stdout/stderr của child ghi thẳng vào file log hoặc qua LogRelay (stream có cap) -> không có pipe nào phải đọc ở đây.
+- on_exit (cắt log, teardown leaf, ghi DB...) chạy trên pool thread nhỏ, vòng lặp không bao giờ bị chặn.
+"""
+from __future__ import annotations
+import heapq, itertools, os, select, threading, time, traceback
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Optional
+
+
+def pidfd_supported() -> bool:
+    try:
+        fd = os.pidfd_open(os.getpid())
+    except (AttributeError, OSError):
+        return False
+    os.close(fd)
+    return True
+
+
+class _Watch:
+    __slots__ = ("seq", "pid", "pidfd", "deadline", "on_exit", "on_timeout", "timed_out", "done")
+
+    def __init__(self, seq, pid, pidfd, deadline, on_exit, on_timeout):
+        self.seq = seq
+        self.pid = pid
+        self.pidfd = pidfd
+        self.deadline = deadline
+        self.on_exit = on_exit
+        self.on_timeout = on_timeout
+        self.timed_out = False
+        self.done = False
+
+
+class Supervisor:
+    def __init__(self, completion_threads: int = 4):
+        self.available = pidfd_supported()
+        self.completion_threads = max(1, int(completion_threads))
+        self._seq = itertools.count()
+        self._lock = threading.Lock()
+        self._new: list[_Watch] = []
+        self._by_fd: dict[int, _Watch] = {}
+        self._timers: list = []  # (deadline, seq, watch)
+        self._ep: Optional[select.epoll] = None
+        self._wake_r = self._wake_w = -1
+        self._pool: Optional[ThreadPoolExecutor] = None
+        self._thread: Optional[threading.Thread] = None
+        self._stop = False
+        self.watched_total = 0
+        self.timeouts = 0
+
+    # ------------ lifecycle ------------
+
+    def start(self):
+        if self._thread or not self.available:
+            return
+        self._ep = select.epoll()
+        self._wake_r, self._wake_w = os.pipe2(os.O_NONBLOCK | os.O_CLOEXEC)
+        self._ep.register(self._wake_r, select.EPOLLIN)
+        self._pool = ThreadPoolExecutor(self.completion_threads, thread_name_prefix="sbx-complete")
+        self._thread = threading.Thread(target=self._loop, name="sbx-supervisor", daemon=True)
+        self._thread.start()
+
+    def close(self):
+        """Dừng vòng lặp; process còn chạy bị kill (on_timeout), callback của chúng không chạy nữa."""
+        if not self._thread:
+            return
+        with self._lock:
+            self._stop = True
+        os.write(self._wake_w, b"\0")
+        self._thread.join(timeout=5)
+        self._thread = None
+        left = list(self._by_fd.values()) + self._new
+        for w in left:
+            try:
+                w.on_timeout()
+            except Exception:
+                pass
+            os.close(w.pidfd)
+        self._pool.shutdown(wait=True)
+        self._ep.close()
+        os.close(self._wake_r); os.close(self._wake_w)
+
+    # ------------ API ------------
+
+    def watch(self, pid: int, timeout_s: float, on_exit: Callable[[int, object, bool], None],
+              on_timeout: Callable[[], None]):
+        """
+        on_exit(exit_code, rusage, timed_out) gọi đúng 1 lần trên thread hoàn tất.
+        on_timeout() gọi trên thread supervisor lúc hết giờ, phải nhanh (vd ghi cgroup.kill).
+        """
+        self.start()
+        pidfd = os.pidfd_open(pid)
+        w = _Watch(next(self._seq), pid, pidfd, time.monotonic() + timeout_s, on_exit, on_timeout)
+        with self._lock:
+            self._new.append(w)
+            self.watched_total += 1
+        os.write(self._wake_w, b"\0")
+
+    def stats(self) -> dict:
+        with self._lock:
+            watching = len(self._by_fd) + len(self._new)
+        return {
+            "available": self.available,
+            "watching": watching,
+            "watched_total": self.watched_total,
+            "timeouts": self.timeouts,
+            "completion_backlog": self._pool._work_queue.qsize() if self._pool else 0,
+        }
+
+    # ------------ loop ------------
+
+    def _loop(self):
+        while True:
+            with self._lock:
+                if self._stop:
+                    return
+                new, self._new = self._new, []
+            for w in new:
+                self._by_fd[w.pidfd] = w
+                self._ep.register(w.pidfd, select.EPOLLIN)
+                heapq.heappush(self._timers, (w.deadline, w.seq, w))
+
+            while self._timers and self._timers[0][2].done:
+                heapq.heappop(self._timers)
+            timeout = max(0.0, self._timers[0][0] - time.monotonic()) if self._timers else -1
+            for fd, _ in self._ep.poll(timeout):
+                if fd == self._wake_r:
+                    try:
+                        while os.read(self._wake_r, 4096):
+                            pass
+                    except BlockingIOError:
+                        pass
+                    continue
+                w = self._by_fd.get(fd)
+                if w is not None:
+                    self._reap(w)
+
+            now = time.monotonic()
+            while self._timers and self._timers[0][0] <= now:
+                _, _, w = heapq.heappop(self._timers)
+                if w.done or w.timed_out:
+                    continue
+                w.timed_out = True
+                self.timeouts += 1
+                try:
+                    w.on_timeout()  # exit sẽ tới qua pidfd như bình thường
+                except Exception:
+                    traceback.print_exc()
+
+    def _reap(self, w: _Watch):
+        try:
+            pid, status, ru = os.wait4(w.pid, os.WNOHANG)
+            rc = os.waitstatus_to_exitcode(status) if pid else None
+        except ChildProcessError:
+            pid, rc, ru = w.pid, -1, None  # đã bị reap ở chỗ khác, không biết exit code
+        if not pid:
+            return
+        w.done = True
+        self._ep.unregister(w.pidfd)
+        del self._by_fd[w.pidfd]
+        os.close(w.pidfd)
+        self._pool.submit(self._call, w, rc, ru)
+
+    @staticmethod
+    def _call(w: _Watch, rc: int, ru):
+        try:
+            w.on_exit(rc, ru, w.timed_out)
+        except Exception:
+            traceback.print_exc()
@@ -1,6 +1,32 @@
+import functools, os, subprocess
 from pathlib import Path
-from typing import List
+from typing import List, Optional
+
+@functools.lru_cache(maxsize=None)
+def tool_version(*argv: str) -> str:
+    """realpath + dòng đầu của `<tool> --version` (compiler/interpreter đổi -> key cache đổi)."""
+    exe = os.path.realpath(argv[0])
+    try:
+        r = subprocess.run(argv, capture_output=True, text=True, timeout=10)
+        out = (r.stdout or r.stderr).strip().splitlines()
+        return f"{exe}: {out[0] if out else r.returncode}"
+    except (OSError, subprocess.TimeoutExpired):
+        return f"{exe}: missing"
 
 class Runner:
+    lang = ""
+    default_entry = ""
+    supports_zygote = False  # entry chạy được bằng runpy trong zygote Python
+    build_dir = "build"      # output compile nằm ở <workdir>/build
+    exec_build = False       # command() exec file trong build/ (binary native) -> build/ được exec khi chạy
+
     def command(self, entry: Path) -> List[str]:
         raise NotImplementedError
+
+    def compile_command(self, entry: Path) -> Optional[List[str]]:
+        """None = ngôn ngữ thông dịch, không có bước compile."""
+        return None
+
+    def toolchain_id(self) -> str:
+        """Định danh interpreter/compiler + flags, dùng làm 1 phần key cache."""
+        return ""
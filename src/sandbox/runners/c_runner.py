@@ -0,0 +1,24 @@
+from pathlib import Path
+from typing import List
+from .base import Runner, tool_version
+
+class CRunner(Runner):
+    lang = "c"
+    default_entry = "main.c"
+    exec_build = True
+
+    def __init__(self, cc: str = "/usr/bin/gcc", flags: List[str] = ("-O2", "-std=c17", "-pipe")):
+        self.cc = cc
+        self.flags = list(flags)
+
+    def _binary(self, entry: Path) -> Path:
+        return entry.parent / self.build_dir / "main"
+
+    def compile_command(self, entry: Path) -> List[str]:
+        return [self.cc, *self.flags, "-o", str(self._binary(entry)), str(entry), "-lm"]
+
+    def command(self, entry: Path):
+        return [str(self._binary(entry))]
+
+    def toolchain_id(self) -> str:
+        return f"{tool_version(self.cc, '--version')} {' '.join(self.flags)}"
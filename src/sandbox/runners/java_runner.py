@@ -0,0 +1,115 @@
+import hashlib, os, subprocess, tempfile, threading
+from pathlib import Path
+from typing import Callable, List, Optional
+from .base import Runner, tool_version
+from ..executor.rootfs import resolve_in
+
+class JavaRunner(Runner):
+    """
+    javac vào <workdir>/build, chạy class cùng tên file entry (Main.java -> Main).
+    cds_archive: class-data archive (CDS) của JDK, dump 1 lần cho mỗi JDK/rootfs rồi mọi job dùng chung
+    -> JVM map sẵn class hệ thống thay vì parse lại mỗi lần khởi động.
+    rootfs (CHROOT mode): java/javac là bản trong rootfs; cds_dir là đường dẫn job thấy, tức nằm trong rootfs
+    -> archive dump bằng JDK của rootfs, key theo JDK đó.
+    """
+    lang = "java"
+    default_entry = "Main.java"
+
+    def __init__(self, javac: str = "/usr/bin/javac", java: str = "/usr/bin/java",
+                 flags: List[str] = ("-encoding", "UTF-8"), cds_dir: Optional[Path] = None,
+                 rootfs: Optional[Path] = None):
+        self.javac = javac
+        self.java = java
+        self.flags = list(flags)
+        self.cds_dir = Path(cds_dir) if cds_dir else None
+        self.rootfs = Path(rootfs) if rootfs else None
+        self._cds_key: Optional[str] = None
+        self._cds_lock = threading.Lock()
+
+    def compile_command(self, entry: Path) -> List[str]:
+        return [self.javac, *self.flags, "-d", str(entry.parent / self.build_dir), str(entry)]
+
+    def command(self, entry: Path):
+        cds = self.cds_archive()
+        share = ["-Xshare:auto", f"-XX:SharedArchiveFile={cds}"] if cds and self._on_host(cds).exists() else []
+        return [self.java, *share, "-XX:+UseSerialGC", "-XX:TieredStopAtLevel=1",
+                "-cp", str(entry.parent / self.build_dir), entry.stem]
+
+    def toolchain_id(self) -> str:
+        return f"{tool_version(self.javac, '-version')} {tool_version(self.java, '-version')} {' '.join(self.flags)}"
+
+    def _on_host(self, path: Path) -> Path:
+        """Đường dẫn job thấy -> file trên host."""
+        return Path(self.rootfs, *path.parts[1:]) if self.rootfs is not None else path
+
+    def _jdk_id(self) -> Optional[str]:
+        if self.rootfs is None:
+            return tool_version(self.java, "-version")
+        # không chạy được java của rootfs từ host -> định danh JDK bằng file release + lib/modules của nó
+        java = resolve_in(self.rootfs, self.java)
+        if java is None:
+            return None
+        home = java.parent.parent
+        ident = [str(java.relative_to(self.rootfs))]
+        for f in (home / "release", home / "lib" / "modules", java):
+            try:
+                st = f.stat()
+            except OSError:
+                continue
+            ident.append(f"{f.name}:{st.st_size}:{st.st_mtime_ns}")
+        try:
+            ident.append((home / "release").read_text(errors="replace"))
+        except OSError:
+            pass
+        return "\n".join(ident)
+
+    def cds_archive(self) -> Optional[Path]:
+        """Đường dẫn archive như job thấy; None = tắt hoặc không có java."""
+        if self.cds_dir is None:
+            return None
+        if self._cds_key is None:
+            ident = self._jdk_id()
+            if ident is None:
+                return None
+            self._cds_key = hashlib.sha256(ident.encode()).hexdigest()[:16]
+        return self.cds_dir / f"jdk-{self._cds_key}.jsa"
+
+    def ensure_cds(self, dump: Optional[Callable[[List[str], Path], bool]] = None) -> Optional[Path]:
+        """
+        Dump archive nếu chưa có (chạy lúc service khởi động, ngoài đường chạy của job).
+        dump(argv, workdir): CHROOT mode, chạy argv bằng JDK trong rootfs với workdir là /work -> True nếu rc 0.
+        """
+        out = self.cds_archive()
+        if out is None:
+            return None
+        host_out = self._on_host(out)
+        if host_out.exists():
+            return out
+        if self.rootfs is None and not os.path.exists(self.java):
+            return out
+        if self.rootfs is not None and dump is None:
+            return out
+        with self._cds_lock:
+            if host_out.exists():
+                return out
+            if self.rootfs is None:
+                host_out.parent.mkdir(parents=True, exist_ok=True)
+                tmp = host_out.with_suffix(f".tmp{os.getpid()}")
+                r = subprocess.run([self.java, "-Xshare:dump", "-XX:+UseSerialGC", f"-XX:SharedArchiveFile={tmp}"],
+                                   capture_output=True, timeout=120)
+                if r.returncode == 0 and tmp.exists():
+                    os.replace(tmp, host_out)
+                else:
+                    tmp.unlink(missing_ok=True)
+                return out
+            # workdir tạm nằm cạnh archive (cùng filesystem) -> rename vào chỗ là xong
+            try:
+                host_out.parent.mkdir(parents=True, exist_ok=True)
+                with tempfile.TemporaryDirectory(dir=host_out.parent, prefix=".dump-") as wd:
+                    argv = [self.java, "-Xshare:dump", "-XX:+UseSerialGC", "-XX:SharedArchiveFile=/work/jdk.jsa"]
+                    if dump(argv, Path(wd)) and (Path(wd) / "jdk.jsa").exists():
+                        os.replace(Path(wd) / "jdk.jsa", host_out)
+            except OSError as e:
+                # rootfs read-only -> chạy không CDS
+                print(f"[WARN] java CDS dump failed in {self.rootfs}: {e}")
+        return out
@@ -1,6 +1,14 @@
 from pathlib import Path
-from .base import Runner
+from .base import Runner, tool_version
 
 class PythonRunner(Runner):
+    lang = "python"
+    default_entry = "main.py"
+    supports_zygote = True
+    python = "/usr/bin/python3"
+
     def command(self, entry: Path):
-        return ["/usr/bin/python3", str(entry)]
+        return [self.python, str(entry)]
+
+    def toolchain_id(self) -> str:
+        return tool_version(self.python, "--version")
@@ -0,0 +1,251 @@
+# src/sandbox/runners/zygote.py
+"""
+Zygote cho PythonRunner: process python đã khởi động sẵn (cùng interpreter với PythonRunner.python,
+đã import sẵn runpy/yaml...), mỗi job chỉ fork ra 1 child -> child vào cgroup leaf, nạp blob seccomp rồi runpy entry.
+
+Giao thức (JSON từng dòng, qua stdin/stdout của zygote):
+  zygote -> {"ready": true}                               (1 lần khi khởi động)
+  host   -> {"entry", "cwd", "env", "cgroup_procs", "stdin", "stdout", "stderr", "seccomp_bpf"}
+  zygote -> {"pid": <pid>}                                 (ngay sau fork)
+  child  -> {"started": <pid>}                             (ngay trước khi chạy code user)
+  zygote -> {"pid": <pid>, "status": <wait status>, "maxrss": <KB>, "cpu": <s>}   (khi child kết thúc)
+"""
+from __future__ import annotations
+import json, os, queue, select, signal, subprocess, sys, threading, time
+from pathlib import Path
+from typing import Optional
+
+from .python_runner import PythonRunner
+
+
+# ================= phía zygote (chạy trong process riêng) =================
+
+def _child(req: dict, wfd: int):
+    code = 1
+    entry = req["entry"]
+    try:
+        if req.get("cgroup_procs"):
+            with open(req["cgroup_procs"], "w") as f:
+                f.write("0")
+        os.setsid()
+        import resource
+        resource.setrlimit(resource.RLIMIT_STACK, (8 * 1024 * 1024, 8 * 1024 * 1024))
+        os.chdir(req["cwd"])
+
+        fd_in = os.open(req.get("stdin") or os.devnull, os.O_RDONLY)
+        fd_out = os.open(req["stdout"], os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+        fd_err = os.open(req["stderr"], os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+        for src, dst in ((fd_in, 0), (fd_out, 1), (fd_err, 2)):
+            os.dup2(src, dst); os.close(src)
+
+        os.environ.clear()
+        os.environ.update(req.get("env") or {})
+
+        if req.get("seccomp_bpf"):
+            from sandbox.seccomp.bpf_cache import make_loader
+            with open(req["seccomp_bpf"], "rb") as f:
+                make_loader(f.read())()
+
+        sys.argv = [entry]
+        sys.path[0] = os.path.dirname(entry)
+        os.write(wfd, (json.dumps({"started": os.getpid()}) + "\n").encode())
+        os.close(wfd)
+
+        import runpy
+        runpy.run_path(entry, run_name="__main__")
+        code = 0
+    except SystemExit as e:
+        if e.code is None:
+            code = 0
+        elif isinstance(e.code, int):
+            code = e.code
+        else:
+            print(e.code, file=sys.stderr)
+            code = 1
+    except BaseException as e:
+        # bỏ các frame của zygote/runpy, traceback giống khi chạy `python3 main.py`
+        import traceback
+        tb = e.__traceback__
+        while tb is not None and tb.tb_frame.f_code.co_filename != entry:
+            tb = tb.tb_next
+        traceback.print_exception(type(e), e, tb or e.__traceback__)
+        code = 1
+    finally:
+        try:
+            sys.stdout.flush(); sys.stderr.flush()
+        except Exception:
+            pass
+        os._exit(code & 0xFF)
+
+
+def serve():
+    # tách fd giao thức ra khỏi 0/1 để child dup2 log vào 0/1/2 thoải mái
+    rfd, wfd = os.dup(0), os.dup(1)
+    devnull = os.open(os.devnull, os.O_RDWR)
+    os.dup2(devnull, 0); os.dup2(devnull, 1)
+    rf = os.fdopen(rfd, "r")
+
+    # import trước những gì job nào cũng cần
+    import runpy, pkgutil, resource, traceback  # noqa: F401  (runpy.run_path import pkgutil lúc chạy)
+    try:
+        import yaml  # noqa: F401
+        import sandbox.seccomp.bpf_cache  # noqa: F401
+    except Exception:
+        pass
+
+    def send(obj: dict):
+        os.write(wfd, (json.dumps(obj) + "\n").encode())
+
+    send({"ready": True})
+    for line in rf:
+        req = json.loads(line)
+        pid = os.fork()
+        if pid == 0:
+            rf.close()
+            _child(req, wfd)
+        send({"pid": pid})
+        _, status, ru = os.wait4(pid, 0)
+        send({"pid": pid, "status": status, "maxrss": ru.ru_maxrss, "cpu": ru.ru_utime + ru.ru_stime})
+
+
+# ================= phía service =================
+
+class Zygote:
+    def __init__(self, python: str):
+        src = str(Path(__file__).resolve().parents[2])  # .../src, để -m sandbox... import được
+        env = dict(os.environ)
+        env["PYTHONPATH"] = src + (os.pathsep + env["PYTHONPATH"] if env.get("PYTHONPATH") else "")
+        self.proc = subprocess.Popen(
+            [python, "-m", "sandbox.runners.zygote"],
+            stdin=subprocess.PIPE, stdout=subprocess.PIPE, env=env,
+        )
+        self.jobs = 0
+        self._buf = b""
+        self._ready = False
+
+    def alive(self) -> bool:
+        return self.proc.poll() is None
+
+    def _readline(self, timeout: float | None) -> Optional[dict]:
+        deadline = None if timeout is None else time.monotonic() + timeout
+        fd = self.proc.stdout.fileno()
+        while b"\n" not in self._buf:
+            left = None if deadline is None else max(0.0, deadline - time.monotonic())
+            r, _, _ = select.select([fd], [], [], left)
+            if not r:
+                return None
+            chunk = os.read(fd, 4096)
+            if not chunk:
+                raise RuntimeError("zygote exited")
+            self._buf += chunk
+        line, self._buf = self._buf.split(b"\n", 1)
+        return json.loads(line)
+
+    def wait_ready(self, timeout: float = 10.0):
+        if self._ready:
+            return
+        msg = self._readline(timeout)
+        if not msg or not msg.get("ready"):
+            raise RuntimeError("zygote did not start")
+        self._ready = True
+
+    def run(self, req: dict, timeout_s: float, on_pid=None, kill=None) -> tuple[int, bool, Optional[float], dict]:
+        """
+        Trả về (wait status, timed_out, startup_s, {"maxrss", "cpu"}).
+        kill(pid): cách giết child khi hết giờ (vd cgroup.kill cả leaf), mặc định killpg.
+        """
+        self.wait_ready()
+        self.jobs += 1
+        t0 = time.monotonic()
+        self.proc.stdin.write((json.dumps(req) + "\n").encode()); self.proc.stdin.flush()
+
+        # "started" của child có thể tới trước "pid" của zygote -> xử lý theo bất kỳ thứ tự nào
+        pid: Optional[int] = None
+        startup = None
+        timed_out = False
+        deadline = t0 + timeout_s
+        while True:
+            msg = self._readline(max(0.0, deadline - time.monotonic()))
+            if msg is None:
+                if pid is None:
+                    raise RuntimeError("zygote did not fork")
+                if timed_out:
+                    raise RuntimeError("zygote child did not exit after SIGKILL")
+                # hết giờ: child đã setsid -> pgid == pid
+                timed_out = True
+                if kill is not None:
+                    kill(pid)
+                else:
+                    try:
+                        os.killpg(pid, signal.SIGKILL)
+                    except ProcessLookupError:
+                        pass
+                deadline = time.monotonic() + 5.0
+                continue
+            if "status" in msg:
+                return msg["status"], timed_out, startup, {"maxrss": msg.get("maxrss"), "cpu": msg.get("cpu")}
+            if "started" in msg:
+                startup = time.monotonic() - t0
+            new_pid = msg.get("pid", msg.get("started"))
+            if pid is None and new_pid:
+                pid = new_pid
+                if on_pid:
+                    on_pid(pid)
+
+    def close(self):
+        try:
+            self.proc.kill()
+            self.proc.wait(timeout=2)
+        except Exception:
+            pass
+
+
+class ZygotePool:
+    """Pool zygote cố định; mỗi zygote phục vụ 1 job/lần, thay mới sau recycle_after job."""
+
+    def __init__(self, size: int = 2, recycle_after: int = 200, python: str = PythonRunner.python):
+        self.size = max(1, int(size))
+        self.recycle_after = max(1, int(recycle_after))
+        self.python = python
+        self._idle: "queue.Queue[Zygote]" = queue.Queue()
+        self._lock = threading.Lock()
+        self._started = False
+        self.recycled = 0
+
+    def start(self):
+        with self._lock:
+            if self._started:
+                return
+            for _ in range(self.size):
+                self._idle.put(Zygote(self.python))
+            self._started = True
+
+    def close(self):
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                return
+
+    def run(self, req: dict, timeout_s: float, on_pid=None, kill=None) -> tuple[int, bool, Optional[float], dict]:
+        self.start()
+        z = self._idle.get()
+        if not z.alive():
+            z.close(); z = Zygote(self.python)
+        try:
+            return z.run(req, timeout_s, on_pid, kill)
+        except Exception:
+            z.close(); z = Zygote(self.python)
+            raise
+        finally:
+            if z.jobs >= self.recycle_after:
+                z.close(); z = Zygote(self.python)
+                self.recycled += 1
+            self._idle.put(z)
+
+    def stats(self) -> dict:
+        return {"size": self.size, "idle": self._idle.qsize(), "recycled": self.recycled}
+
+
+if __name__ == "__main__":
+    serve()
@@ -0,0 +1,157 @@
+# src/sandbox/seccomp/bpf_cache.py
+"""
+Cache BPF đã compile cho policy seccomp.
+
+- Compile 1 lần (libseccomp qua seccomp_helper) -> <cache_dir>/<sha256(policy + arch)>.bpf
+- Child chỉ cần prctl(PR_SET_SECCOMP) với blob đó (ctypes, không cần pyseccomp/YAML).
+- Policy đổi nội dung -> hash đổi -> tự compile lại.
+
+CLI:
+    python -m sandbox.seccomp.bpf_cache compile --policy conf/seccomp.min.yaml
+    python -m sandbox.seccomp.bpf_cache verify  --policy conf/seccomp.min.yaml
+"""
+from __future__ import annotations
+import argparse, ctypes, hashlib, os, platform, sys, threading
+from pathlib import Path
+from typing import Callable
+
+# filter được nạp trong preexec (trước exec) -> phải cho phép execve để chạy được chương trình user
+EXEC_SYSCALLS = ("execve",)
+
+_PR_SET_NO_NEW_PRIVS = 38
+_PR_SET_SECCOMP = 22
+_SECCOMP_MODE_FILTER = 2
+
+
+class _SockFilter(ctypes.Structure):
+    _fields_ = [("code", ctypes.c_ushort), ("jt", ctypes.c_ubyte), ("jf", ctypes.c_ubyte), ("k", ctypes.c_uint32)]
+
+
+class _SockFprog(ctypes.Structure):
+    _fields_ = [("len", ctypes.c_ushort), ("filter", ctypes.POINTER(_SockFilter))]
+
+
+def policy_digest(policy: Path) -> str:
+    h = hashlib.sha256()
+    h.update(Path(policy).read_bytes())
+    h.update(b"\0" + platform.machine().encode())
+    h.update(b"\0" + ",".join(EXEC_SYSCALLS).encode())
+    return h.hexdigest()
+
+
+def compile_policy(policy: Path, out: Path):
+    from .seccomp_helper import build_filter_from_config
+    filt = build_filter_from_config(str(policy), extra_allow=EXEC_SYSCALLS)
+    out.parent.mkdir(parents=True, exist_ok=True)
+    tmp = out.with_suffix(f".tmp{os.getpid()}.{threading.get_ident()}")
+    with open(tmp, "wb") as f:
+        filt.export_bpf(f)
+    os.replace(tmp, out)  # atomic: job khác không bao giờ thấy file dở
+
+
+def make_loader(blob: bytes) -> Callable[[], None]:
+    """
+    Dựng sẵn sock_fprog ở parent; hàm trả về chỉ gọi 2 prctl -> an toàn để gọi trong preexec_fn.
+    """
+    if not blob or len(blob) % ctypes.sizeof(_SockFilter):
+        raise ValueError(f"invalid BPF blob ({len(blob)} bytes)")
+    n = len(blob) // ctypes.sizeof(_SockFilter)
+    insns = (_SockFilter * n).from_buffer_copy(blob)
+    prog = _SockFprog(n, ctypes.cast(insns, ctypes.POINTER(_SockFilter)))
+    libc = ctypes.CDLL(None, use_errno=True)
+    prctl = libc.prctl
+    prog_ref = ctypes.byref(prog)
+
+    def _load():
+        if prctl(_PR_SET_NO_NEW_PRIVS, 1, 0, 0, 0) != 0:
+            raise OSError(ctypes.get_errno(), "prctl(PR_SET_NO_NEW_PRIVS) failed")
+        if prctl(_PR_SET_SECCOMP, _SECCOMP_MODE_FILTER, prog_ref, 0, 0) != 0:
+            raise OSError(ctypes.get_errno(), "prctl(PR_SET_SECCOMP) failed")
+
+    _load._keep = (insns, prog)  # giữ buffer sống cùng hàm
+    return _load
+
+
+class BpfCache:
+    def __init__(self, cache_dir: Path):
+        self.cache_dir = Path(cache_dir)
+        self._lock = threading.Lock()
+        self._memo: dict[str, tuple[tuple[int, int], Path, bytes]] = {}  # policy -> ((mtime_ns, size), blob path, blob)
+        self._loaders: dict[Path, Callable[[], None]] = {}
+        self.compiles = 0
+
+    def path_for(self, policy: Path) -> Path:
+        return self.cache_dir / f"{policy_digest(policy)}.bpf"
+
+    def ensure(self, policy: Path) -> tuple[Path, bytes]:
+        """
+        Trả về (đường dẫn blob, nội dung blob) cho policy hiện tại.
+        Chỉ stat() policy ở đường nóng; hash/compile lại khi file đổi hoặc cache thiếu.
+        """
+        policy = Path(policy).resolve()
+        st = policy.stat()
+        key = (st.st_mtime_ns, st.st_size)
+        with self._lock:
+            memo = self._memo.get(str(policy))
+            if memo and memo[0] == key and memo[1].exists():
+                return memo[1], memo[2]
+            out = self.path_for(policy)
+            if not out.exists():
+                compile_policy(policy, out)
+                self.compiles += 1
+            blob = out.read_bytes()
+            self._memo[str(policy)] = (key, out, blob)
+            return out, blob
+
+    def loader(self, policy: Path) -> Callable[[], None]:
+        out, blob = self.ensure(policy)
+        with self._lock:
+            fn = self._loaders.get(out)
+            if fn is None:
+                fn = self._loaders[out] = make_loader(blob)
+            return fn
+
+
+def verify(policy: Path, cache_dir: Path) -> tuple[bool, str]:
+    """Kiểm tra blob trong cache khớp policy hiện tại và kernel nạp được (thử trong process con)."""
+    out = BpfCache(cache_dir).path_for(Path(policy).resolve())
+    if not out.exists():
+        return False, f"missing {out}"
+    blob = out.read_bytes()
+    try:
+        load = make_loader(blob)
+    except ValueError as e:
+        return False, str(e)
+    pid = os.fork()
+    if pid == 0:
+        try:
+            load()
+            os._exit(0)
+        except BaseException:
+            os._exit(1)
+    _, status = os.waitpid(pid, 0)
+    if os.waitstatus_to_exitcode(status) != 0:
+        return False, f"kernel rejected {out}"
+    return True, f"ok {out} ({len(blob) // ctypes.sizeof(_SockFilter)} insns)"
+
+
+def main(argv=None):
+    from ..settings import load_settings
+    s = load_settings()
+    ap = argparse.ArgumentParser(prog="python -m sandbox.seccomp.bpf_cache")
+    ap.add_argument("cmd", choices=["compile", "verify"])
+    ap.add_argument("--policy", type=Path, default=s.seccomp_policy)
+    ap.add_argument("--cache-dir", type=Path, default=s.seccomp_cache_dir)
+    args = ap.parse_args(argv)
+
+    if args.cmd == "compile":
+        out, blob = BpfCache(args.cache_dir).ensure(args.policy)
+        print(f"compiled {args.policy} -> {out} ({len(blob)} bytes)")
+        return 0
+    ok, msg = verify(args.policy, args.cache_dir)
+    print(msg)
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
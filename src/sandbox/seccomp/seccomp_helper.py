@@ -53,12 +53,23 @@ def _load_config(cfg_path: str):
         raise RuntimeError("YAML not available. Install PyYAML or use JSON policy.")
     return yaml.safe_load(p.read_text())
 
-def create_seccomp_from_config(cfg_path: str) -> bool:
+def _names(items) -> list[str]:
+    # policy viết kiểu "- read; - write; - close" trên 1 dòng -> YAML ra 1 chuỗi, tách lại theo ";"
+    out: list[str] = []
+    for x in items or []:
+        for part in str(x).split(";"):
+            name = part.strip().lstrip("-").strip()
+            if name:
+                out.append(name)
+    return list(dict.fromkeys(out))
+
+def build_filter_from_config(cfg_path: str, extra_allow=()):
+    """Dựng SyscallFilter từ file policy (chưa load). extra_allow: syscall cho phép thêm."""
     cfg = _load_config(cfg_path)
     default_action = cfg.get("default_action", "ERRNO")
     errno_val = int(cfg.get("errno", 1))
-    allow = [x.strip().rstrip(";") for x in (cfg.get("allow") or [])]
-    block = [x.strip().rstrip(";") for x in (cfg.get("block") or [])]
+    allow = _names(list(cfg.get("allow") or []) + list(extra_allow))
+    block = _names(cfg.get("block"))
 
     filt = sc.SyscallFilter(_action_from_string(default_action, errno_val))
 
@@ -77,8 +88,10 @@ def create_seccomp_from_config(cfg_path: str) -> bool:
             filt.add_rule(block_action, name)
         except Exception as e:
             print(f"[seccomp] WARN block {name}: {e}", file=sys.stderr)
+    return filt
 
-    filt.load()
+def create_seccomp_from_config(cfg_path: str) -> bool:
+    build_filter_from_config(cfg_path).load()
     return True
 
 def create_seccomp(default_errno: int = 1, extra_allow=None, extra_block=None) -> bool:
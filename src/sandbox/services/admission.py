@@ -0,0 +1,202 @@
+# src/sandbox/services/admission.py
+"""
+Admission control cho scheduler: không chạy nhiều job hơn máy chịu được.
+
+- Mỗi job "giữ chỗ" memory.max + cpu.max (số core) của profile trong ngân sách host.
+- PSI (cpu.pressure / memory.pressure) của subtree sbx: đang nghẽn thì hoãn job mới,
+  memory "full" quá ngưỡng thì từ chối luôn ở API (429) thay vì để mọi job cùng chậm.
+- Ước lượng thời gian chờ = số job phía trước / số slot chạy song song * thời gian chạy trung bình (EWMA).
+"""
+from __future__ import annotations
+import math, os, threading, time
+from pathlib import Path
+from typing import Optional
+
+from ..executor.cgroups import USE_CGROUP, get_sbx_base
+
+
+class Saturated(Exception):
+    """Hệ thống đang quá tải -> API trả 429 + Retry-After."""
+
+    def __init__(self, message: str, retry_after_s: float = 5.0):
+        super().__init__(message)
+        self.retry_after_s = retry_after_s
+
+
+def job_cost(limits: dict, default_mem: int = 256 << 20) -> tuple[int, float]:
+    """(bytes, cores) mà 1 job của profile này có thể dùng tối đa."""
+    mem = (limits.get("memory") or {}).get("max")
+    mem = int(mem) if str(mem).isdigit() else default_mem
+    cores = 1.0
+    cpu = str((limits.get("cpu") or {}).get("max") or "")
+    quota, _, period = cpu.partition(" ")
+    if quota.isdigit() and period.isdigit() and int(period):
+        cores = int(quota) / int(period)
+    return mem, cores
+
+
+def read_psi(path: Path) -> Optional[dict]:
+    """{"some": avg10, "full": avg10} (%) hoặc None nếu không có PSI."""
+    try:
+        text = path.read_text()
+    except OSError:
+        return None
+    out = {}
+    for line in text.splitlines():
+        kind, *fields = line.split()
+        for f in fields:
+            if f.startswith("avg10="):
+                out[kind] = float(f[6:])
+    return out
+
+
+def psi_files() -> dict[str, Path]:
+    """PSI của subtree sbx; chạy không cgroup (USE_CGROUP=0) thì dùng PSI toàn máy."""
+    if USE_CGROUP:
+        try:
+            base = get_sbx_base()
+            return {"cpu": base / "cpu.pressure", "memory": base / "memory.pressure"}
+        except Exception:
+            pass
+    return {"cpu": Path("/proc/pressure/cpu"), "memory": Path("/proc/pressure/memory")}
+
+
+def _host_memory() -> int:
+    try:
+        with open("/proc/meminfo") as f:
+            for line in f:
+                if line.startswith("MemTotal:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return 4 << 30
+
+
+class AdmissionController:
+    PSI_TTL_S = 1.0  # avg10 chỉ đổi mỗi 2s, không cần đọc file mỗi lần hỏi
+
+    def __init__(self, *, memory_budget: int = 0, cpu_budget: float = 0, psi: Optional[dict[str, Path]] = None,
+                 cpu_some_max: float = 0, memory_some_max: float = 0, memory_full_reject: float = 0,
+                 max_wait_s: float = 0):
+        self.memory_budget = int(memory_budget) or int(_host_memory() * 0.8)
+        self.cpu_budget = float(cpu_budget) or float(os.cpu_count() or 1)
+        self.psi = psi or {}
+        self.cpu_some_max = cpu_some_max            # 0 = không xét
+        self.memory_some_max = memory_some_max
+        self.memory_full_reject = memory_full_reject
+        self.max_wait_s = max_wait_s                # 0 = không từ chối theo thời gian chờ
+        self._cv = threading.Condition()
+        self._mem = 0
+        self._cpu = 0.0
+        self._running = 0
+        self._delayed = 0
+        self._waiting: dict[int, int] = {}  # rank -> số worker đang chờ trong acquire()
+        self._closed = False
+        self._psi: tuple[float, dict] = (0.0, {})
+        self._avg_run_s = 1.0  # EWMA thời gian chạy 1 job
+        self.delays = 0
+        self.rejects = 0
+
+    # ------------ PSI ------------
+
+    def pressure(self) -> dict:
+        now = time.monotonic()
+        ts, cached = self._psi
+        if now - ts < self.PSI_TTL_S:
+            return cached
+        out = {}
+        for res, path in self.psi.items():
+            v = read_psi(path)
+            if v is not None:
+                out[res] = v
+        self._psi = (now, out)
+        return out
+
+    def _pressured(self) -> Optional[str]:
+        p = self.pressure()
+        cpu = p.get("cpu", {}).get("some", 0.0)
+        mem = p.get("memory", {}).get("some", 0.0)
+        if self.cpu_some_max and cpu > self.cpu_some_max:
+            return f"cpu pressure {cpu:.1f}%"
+        if self.memory_some_max and mem > self.memory_some_max:
+            return f"memory pressure {mem:.1f}%"
+        return None
+
+    # ------------ capacity ------------
+
+    def _fits(self, mem: int, cpu: float) -> bool:
+        if self._running == 0:
+            return True  # job to hơn cả ngân sách vẫn phải chạy được khi máy rảnh
+        return self._mem + mem <= self.memory_budget and self._cpu + cpu <= self.cpu_budget + 1e-9
+
+    def slots(self, mem: int, cpu: float) -> int:
+        """Số job cùng profile chạy song song được trong ngân sách."""
+        return max(1, min(self.memory_budget // max(1, mem), math.floor(self.cpu_budget / max(cpu, 1e-3))))
+
+    def acquire(self, mem: int, cpu: float, rank: int = 0) -> bool:
+        """
+        Chặn (hoãn job) tới khi đủ chỗ và hết nghẽn; False nếu controller đã đóng.
+        rank: priority class (0 = cao nhất) -> còn job rank nhỏ hơn đang chờ thì nhường.
+        """
+        with self._cv:
+            waited = False
+            self._waiting[rank] = self._waiting.get(rank, 0) + 1
+            while not self._closed:
+                if (self._fits(mem, cpu) and (self._running == 0 or self._pressured() is None)
+                        and not any(n for r, n in self._waiting.items() if r < rank)):
+                    break
+                if not waited:
+                    waited = True
+                    self.delays += 1
+                    self._delayed += 1
+                self._cv.wait(timeout=self.PSI_TTL_S)  # PSI không báo đổi -> tự kiểm tra lại định kỳ
+            self._waiting[rank] -= 1
+            if waited:
+                self._delayed -= 1
+                self._cv.notify_all()  # job rank thấp hơn đang nhường có thể đi tiếp
+            if self._closed:
+                return False
+            self._mem += mem; self._cpu += cpu; self._running += 1
+            return True
+
+    def release(self, mem: int, cpu: float, run_s: Optional[float] = None):
+        with self._cv:
+            self._mem -= mem; self._cpu -= cpu; self._running -= 1
+            if run_s is not None:
+                self._avg_run_s = 0.8 * self._avg_run_s + 0.2 * run_s
+            self._cv.notify_all()
+
+    def close(self):
+        with self._cv:
+            self._closed = True
+            self._cv.notify_all()
+
+    # ------------ API side ------------
+
+    def estimate_wait(self, ahead: int, mem: int, cpu: float, workers: int) -> float:
+        """ahead = job đang chạy + đang chờ trước job mới; mỗi "đợt" chạy được `slots` job."""
+        slots = min(max(1, workers), self.slots(mem, cpu))
+        return round((ahead // slots) * self._avg_run_s, 3)
+
+    def check(self, ahead: int, mem: int, cpu: float, workers: int) -> float:
+        """Gọi lúc enqueue: trả về thời gian chờ ước lượng hoặc raise Saturated (-> 429)."""
+        wait = self.estimate_wait(ahead, mem, cpu, workers)
+        full = self.pressure().get("memory", {}).get("full", 0.0)
+        if self.memory_full_reject and full > self.memory_full_reject:
+            self.rejects += 1
+            raise Saturated(f"memory pressure {full:.1f}% (full)", retry_after_s=max(5.0, wait))
+        if self.max_wait_s and wait > self.max_wait_s:
+            self.rejects += 1
+            raise Saturated(f"estimated wait {wait:.0f}s exceeds {self.max_wait_s:.0f}s",
+                            retry_after_s=wait - self.max_wait_s + self._avg_run_s)
+        return wait
+
+    def stats(self) -> dict:
+        with self._cv:
+            return {
+                "memory_committed": self._mem, "memory_budget": self.memory_budget,
+                "cpu_committed": round(self._cpu, 3), "cpu_budget": self.cpu_budget,
+                "running": self._running, "delayed": self._delayed,
+                "delays": self.delays, "rejects": self.rejects,
+                "avg_run_s": round(self._avg_run_s, 3), "pressure": self.pressure(),
+            }
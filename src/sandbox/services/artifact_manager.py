@@ -0,0 +1,350 @@
+# src/sandbox/services/artifact_manager.py
+"""
+Vòng đời artifact trong jobs_dir, toàn bộ ở 1 thread nền (không nằm trên đường request):
+
+- job xong + settle_s (client có thể còn đang đọc log): bỏ bản chép seccomp (_secwrap.py, seccomp_helper.py,
+  seccomp.yaml), nén stdout/stderr.log -> .log.gz (ArtifactStore đọc cả 2 dạng), thư mục vượt job_max_bytes
+  thì bỏ file job tự ghi (lớn nhất trước; giữ source, log, testcase).
+- retention theo status (giây sau khi xong, 0 = giữ) + max_total_bytes cho cả jobs_dir (bỏ job xong sớm nhất).
+- xoá: rename vào jobs_dir/.trash (1 syscall, làm dưới lock cùng hold() -> job chạy lại không thấy thư mục
+  dở dang) rồi rmtree theo lô batch_size.
+- khởi động: quét jobs_dir dần theo lô (xen với việc khác), status lấy từ JobStore; thư mục không có job
+  -> "ORPHAN" (retention mặc định). Log cũ chưa nén được nén luôn ở bước này.
+Dung lượng tính theo block thật trên đĩa (st_blocks), chỉ tính job đã xong; job đang chạy: log bị cap
+bởi LogRelay của executor, file job tự ghi vào /work (bind mount của thư mục job, mọi mode) bị DiskWatch
+của executor giới hạn theo work_max_bytes (vượt -> kill), ghi vào "/" (CHROOT overlay) bị chặn bởi upper tmpfs.
+"""
+from __future__ import annotations
+import heapq, os, shutil, threading, time
+from collections import deque
+from datetime import timezone
+from pathlib import Path
+
+from .artifact_store import LOG_STREAMS, ArtifactStore
+from .job_store import ACTIVE, JobStore
+from ..executor.diskwatch import du
+
+SECCOMP_COPIES = ("_secwrap.py", "seccomp_helper.py", "seccomp.yaml")
+# không bao giờ bị bỏ khi cắt theo job_max_bytes (ngoài source của job)
+_KEEP = {f"{s}.log" for s in LOG_STREAMS} | {f"{s}.log.gz" for s in LOG_STREAMS} | {"compile.log", "cases.json"}
+_KEEP_SUFFIX = (".in", ".ans")
+TRASH = ".trash"
+
+
+class _Entry:
+    __slots__ = ("bytes", "finished", "status")
+
+    def __init__(self, nbytes: int, finished: float, status: str):
+        self.bytes = nbytes
+        self.finished = finished
+        self.status = status
+
+
+class ArtifactManager:
+    def __init__(self, art: ArtifactStore, store: JobStore, *, retention: dict[str, float] | None = None,
+                 max_total_bytes: int = 0, job_max_bytes: int = 0, compress: bool = True,
+                 compress_level: int = 6, settle_s: float = 60.0, batch_size: int = 500, interval_s: float = 30.0):
+        self.art = art
+        self.store = store
+        self.jobs_dir = Path(art.jobs_dir)
+        self.trash_dir = self.jobs_dir / TRASH
+        # status -> giây sau khi xong; "DEFAULT" cho status không khai báo (và thư mục ORPHAN)
+        self.retention = {str(k).upper(): float(v) for k, v in (retention or {}).items()}
+        self.max_total_bytes = max(0, int(max_total_bytes))
+        self.job_max_bytes = max(0, int(job_max_bytes))
+        self.compress = compress
+        self.compress_level = int(compress_level)
+        self.settle_s = max(1.0, float(settle_s))  # result cache chép log ngay sau khi job xong
+        self.batch_size = max(1, int(batch_size))
+        self.interval_s = max(0.1, float(interval_s))
+        self._lock = threading.Lock()
+        self._cv = threading.Condition(self._lock)
+        self._entries: dict[str, _Entry] = {}   # job đã xong đang giữ trên đĩa
+        self._by_expiry: list = []              # heap (hết hạn lúc, job_id), bỏ lười khi entry đã đổi
+        self._by_age: list = []                 # heap (xong lúc, job_id) cho max_total_bytes
+        self._settle: deque = deque()           # (đến hạn, job_id, status, entry); hạn tăng dần
+        self._held: set[str] = set()            # job đang chạy (lại): không nén/xoá
+        self._busy: str | None = None           # job đang được settle (hold() chờ xong)
+        self._trash: deque[Path] = deque()
+        self._bytes = 0
+        self._stop = False
+        self._thread: threading.Thread | None = None
+        self.scan_done = False
+        self.reclaimed_bytes = 0
+        self.deleted = {"retention": 0, "quota": 0}
+        self.compressed = 0
+        self.trimmed_files = 0
+        self.errors = 0
+
+    # ------------ lifecycle ------------
+
+    def start(self):
+        if self._thread:
+            return
+        self._thread = threading.Thread(target=self._loop, name="sbx-artifacts", daemon=True)
+        self._thread.start()
+
+    def close(self):
+        with self._lock:
+            self._stop = True
+            self._cv.notify()
+        if self._thread:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+    # ------------ API (gọi từ orchestrator / scheduler) ------------
+
+    def hold(self, job_id: str):
+        """Job sắp chạy (kể cả chạy lại): bỏ khỏi danh sách GC cho tới job_done()."""
+        with self._lock:
+            while self._busy == job_id:
+                self._cv.wait()
+            self._held.add(job_id)
+            e = self._entries.pop(job_id, None)
+            if e is not None:
+                self._bytes -= e.bytes
+        for stream in LOG_STREAMS:  # log nén của lần chạy trước, lần này ghi log mới
+            self.art._gz(self.art.log_path(job_id, stream)).unlink(missing_ok=True)
+
+    def job_done(self, job_id: str, status: str, entry: str | None = None):
+        with self._lock:
+            self._held.discard(job_id)
+            self._settle.append((time.monotonic() + self.settle_s, job_id, status, entry))
+            self._cv.notify()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "jobs": len(self._entries),
+                "bytes": self._bytes,
+                "max_total_bytes": self.max_total_bytes,
+                "settle_backlog": len(self._settle),
+                "trash_backlog": len(self._trash),
+                "scan_done": self.scan_done,
+                "reclaimed_bytes": self.reclaimed_bytes,
+                "deleted": dict(self.deleted),
+                "compressed_logs": self.compressed,
+                "trimmed_files": self.trimmed_files,
+                "errors": self.errors,
+            }
+
+    # ------------ settle: dọn + nén + quota 1 job ------------
+
+    def _retention_s(self, status: str) -> float:
+        return self.retention.get(status.upper(), self.retention.get("DEFAULT", 0.0))
+
+    def _settle_job(self, job_id: str, status: str, finished: float, entry: str | None):
+        with self._lock:
+            if job_id in self._held or self._stop:
+                return
+            self._busy = job_id
+        try:
+            d = self.jobs_dir / job_id
+            if not d.is_dir():
+                return
+            wd = self.art.job_workdir(job_id)
+            for name in SECCOMP_COPIES:
+                (wd / name).unlink(missing_ok=True)
+            saved = 0
+            if self.compress:
+                for stream in LOG_STREAMS:
+                    raw, packed = self.art.compress_log(job_id, stream, self.compress_level)
+                    if raw:
+                        saved += max(0, raw - packed)
+                        with self._lock:
+                            self.compressed += 1
+            size = du(d)
+            if self.job_max_bytes and size > self.job_max_bytes:
+                size, trimmed = self._trim(d, size, entry)
+                saved += trimmed
+            with self._lock:
+                self.reclaimed_bytes += saved
+                self._track(job_id, _Entry(size, finished, status))
+        finally:
+            with self._lock:
+                self._busy = None
+                self._cv.notify_all()
+
+    def _trim(self, d: Path, size: int, entry: str | None) -> tuple[int, int]:
+        """Bỏ file lớn nhất trước (trừ source, log, testcase) tới khi <= job_max_bytes."""
+        files = []
+        for root, _, names in os.walk(d):
+            for n in names:
+                if n in _KEEP or n == entry or n.endswith(_KEEP_SUFFIX):
+                    continue
+                p = os.path.join(root, n)
+                try:
+                    files.append((os.lstat(p).st_blocks * 512, p))
+                except OSError:
+                    pass
+        freed = 0
+        for nbytes, p in sorted(files, reverse=True):
+            if size - freed <= self.job_max_bytes:
+                break
+            try:
+                os.unlink(p)
+            except OSError:
+                continue
+            freed += nbytes
+            with self._lock:
+                self.trimmed_files += 1
+        return size - freed, freed
+
+    def _track(self, job_id: str, e: _Entry):
+        """Gọi khi giữ lock."""
+        old = self._entries.get(job_id)
+        if old is not None:
+            self._bytes -= old.bytes
+        self._entries[job_id] = e
+        self._bytes += e.bytes
+        keep_s = self._retention_s(e.status)
+        if keep_s > 0:
+            heapq.heappush(self._by_expiry, (e.finished + keep_s, job_id))
+        heapq.heappush(self._by_age, (e.finished, job_id))
+
+    # ------------ xoá ------------
+
+    def _retire(self, job_id: str, finished: float, reason: str) -> bool:
+        """Gọi khi giữ lock: rename vào .trash; False nếu entry đã đổi (heap cũ) hoặc job đang chạy lại."""
+        e = self._entries.get(job_id)
+        if e is None or e.finished != finished or job_id in self._held:
+            return False
+        del self._entries[job_id]
+        self._bytes -= e.bytes
+        dst = self.trash_dir / f"{job_id}.{time.monotonic_ns()}"
+        try:
+            os.rename(self.jobs_dir / job_id, dst)
+        except FileNotFoundError:
+            return False
+        except OSError:
+            self.errors += 1
+            return False
+        self._trash.append(dst)
+        self.deleted[reason] += 1
+        self.reclaimed_bytes += e.bytes
+        return True
+
+    def _expire(self) -> bool:
+        """Retention rồi quota tổng; tối đa batch_size thư mục mỗi lượt."""
+        now = time.time()
+        n = 0
+        with self._lock:
+            while self._by_expiry and self._by_expiry[0][0] <= now and n < self.batch_size:
+                expires, job_id = heapq.heappop(self._by_expiry)
+                e = self._entries.get(job_id)
+                if e is not None and e.finished + self._retention_s(e.status) == expires:
+                    n += self._retire(job_id, e.finished, "retention")
+            while (self.max_total_bytes and self._bytes > self.max_total_bytes and self._by_age
+                   and n < self.batch_size):
+                finished, job_id = heapq.heappop(self._by_age)
+                n += self._retire(job_id, finished, "quota")
+            # heap chỉ còn toàn entry cũ -> dựng lại cho gọn
+            if len(self._by_age) > 2 * len(self._entries) + 1024:
+                self._by_age = [(e.finished, k) for k, e in self._entries.items()]
+                heapq.heapify(self._by_age)
+        return n > 0
+
+    def _empty_trash(self) -> bool:
+        with self._lock:
+            batch = [self._trash.popleft() for _ in range(min(self.batch_size, len(self._trash)))]
+        for p in batch:
+            shutil.rmtree(p, ignore_errors=True)
+        return bool(batch)
+
+    # ------------ quét lúc khởi động ------------
+
+    def _scan(self):
+        """Generator: mỗi next() nhận 1 lô thư mục job có sẵn trên đĩa (xen kẽ với settle/xoá)."""
+        if self.trash_dir.is_dir():
+            with self._lock:
+                self._trash.extend(p for p in self.trash_dir.iterdir())
+        self.trash_dir.mkdir(parents=True, exist_ok=True)
+        try:
+            it = os.scandir(self.jobs_dir)
+        except FileNotFoundError:
+            return
+        with it:
+            batch = []
+            for e in it:
+                if e.name.startswith(".") or not e.is_dir(follow_symlinks=False):
+                    continue
+                batch.append(e)
+                if len(batch) >= self.batch_size:
+                    self._adopt(batch)
+                    batch = []
+                    yield
+            if batch:
+                self._adopt(batch)
+
+    def _adopt(self, batch: list[os.DirEntry]):
+        jobs = {j.id: j for j in self.store.get_many([e.name for e in batch])}
+        for e in batch:
+            with self._lock:
+                if e.name in self._entries or e.name in self._held:
+                    continue
+            job = jobs.get(e.name)
+            if job is not None and job.status in ACTIVE:
+                continue  # đang chờ/chạy: job_done() sẽ báo sau
+            if job is not None and job.finished_at is not None:
+                finished = job.finished_at.replace(tzinfo=timezone.utc).timestamp()
+            else:
+                try:
+                    finished = e.stat(follow_symlinks=False).st_mtime
+                except OSError:
+                    continue
+            status = job.status.value if job is not None else "ORPHAN"
+            self._settle_job(e.name, status, finished, job.entry if job is not None else None)
+
+    # ------------ vòng lặp ------------
+
+    def _settle_due(self) -> bool:
+        now = time.monotonic()
+        batch = []
+        with self._lock:
+            while self._settle and self._settle[0][0] <= now and len(batch) < self.batch_size:
+                batch.append(self._settle.popleft())
+        for _, job_id, status, entry in batch:
+            try:
+                self._settle_job(job_id, status, time.time(), entry)
+            except Exception as e:
+                with self._lock:
+                    self.errors += 1
+                print(f"[WARN] artifacts: settle {job_id} failed: {e}")
+        return bool(batch)
+
+    def _loop(self):
+        scan = self._scan()
+        while True:
+            with self._lock:
+                if self._stop:
+                    return
+            busy = False
+            if scan is not None:
+                try:
+                    next(scan)
+                    busy = True
+                except StopIteration:
+                    scan = None
+                    with self._lock:
+                        self.scan_done = True
+                except Exception as e:
+                    scan = None
+                    with self._lock:
+                        self.errors += 1
+                    print(f"[WARN] artifacts: scan of {self.jobs_dir} failed: {e}")
+            try:
+                busy |= self._settle_due()
+                busy |= self._expire()
+                busy |= self._empty_trash()
+            except Exception as e:
+                with self._lock:
+                    self.errors += 1
+                print(f"[WARN] artifacts: {e}")
+            if busy:
+                continue
+            with self._lock:
+                wait = self.interval_s
+                if self._settle:
+                    wait = min(wait, max(0.0, self._settle[0][0] - time.monotonic()))
+                if not self._stop:
+                    self._cv.wait(wait)
@@ -1,5 +1,20 @@
+import gzip, json, os, shutil, struct
 from pathlib import Path
 
+LOG_STREAMS = ("stdout", "stderr")
+COMPRESS_MIN_BYTES = 4096  # log nhỏ hơn 1 block: nén không bớt được gì trên đĩa
+
+def utf8_safe_len(data: bytes) -> int:
+    """Độ dài prefix không kết thúc giữa chừng 1 ký tự UTF-8 (để offset tiếp theo không cắt đôi ký tự)."""
+    n = len(data)
+    for back in range(1, min(4, n) + 1):
+        b = data[n - back]
+        if b & 0xC0 == 0x80:        # byte tiếp nối, lùi tiếp
+            continue
+        need = 1 if b < 0x80 else 2 if b >> 5 == 0b110 else 3 if b >> 4 == 0b1110 else 4 if b >> 3 == 0b11110 else 1
+        return n if back >= need else n - back
+    return n
+
 class ArtifactStore:
     def __init__(self, jobs_dir: Path):
         self.jobs_dir = jobs_dir
@@ -11,8 +26,118 @@ class ArtifactStore:
         wd = self.job_workdir(job_id); wd.mkdir(parents=True, exist_ok=True)
         (wd / entry).write_text(code, encoding="utf-8")
 
+    def cases_dir(self, job_id: str) -> Path:
+        return self.jobs_dir / job_id / "cases"
+
+    def write_cases(self, job_id: str, cases: list[dict]):
+        """cases: [{"stdin", "expected", "time_limit_s"}] -> cases/<i>.in, <i>.ans, cases.json"""
+        d = self.cases_dir(job_id); d.mkdir(parents=True, exist_ok=True)
+        meta = []
+        for i, c in enumerate(cases):
+            (d / f"{i}.in").write_text(c.get("stdin") or "", encoding="utf-8")
+            if c.get("expected") is not None:
+                (d / f"{i}.ans").write_text(c["expected"], encoding="utf-8")
+            meta.append({"time_limit_s": c.get("time_limit_s"), "has_expected": c.get("expected") is not None})
+        (d / "cases.json").write_text(json.dumps(meta), encoding="utf-8")
+
+    def read_cases(self, job_id: str) -> list[dict]:
+        return json.loads((self.cases_dir(job_id) / "cases.json").read_text(encoding="utf-8"))
+
+    def case_path(self, job_id: str, idx: int, suffix: str) -> Path:
+        """suffix: in | ans | out | err"""
+        return self.cases_dir(job_id) / f"{idx}.{suffix}"
+
+    def log_path(self, job_id: str, stream: str) -> Path:
+        if stream not in LOG_STREAMS:
+            raise ValueError(f"unknown log stream {stream!r}")
+        return self.job_workdir(job_id) / f"{stream}.log"
+
+    @staticmethod
+    def _gz(path: Path) -> Path:
+        return path.with_name(path.name + ".gz")
+
+    def log_file(self, job_id: str, stream: str) -> Path | None:
+        """File log đang có: <stream>.log, hoặc <stream>.log.gz sau khi ArtifactManager nén; None = không có."""
+        path = self.log_path(job_id, stream)
+        for p in (path, self._gz(path)):
+            if p.exists():
+                return p
+        return None
+
+    def log_size(self, job_id: str, stream: str) -> int:
+        """Kích thước log chưa nén (bản .gz: lấy ISIZE ở 4 byte cuối, không giải nén)."""
+        path = self.log_path(job_id, stream)
+        try:
+            return path.stat().st_size
+        except FileNotFoundError:
+            pass
+        try:
+            with open(self._gz(path), "rb") as f:
+                f.seek(-4, os.SEEK_END)
+                return struct.unpack("<I", f.read(4))[0]
+        except (FileNotFoundError, OSError, struct.error):
+            return 0
+
+    def read_log_bytes(self, job_id: str, stream: str, offset: int = 0, limit: int = 1 << 16) -> bytes:
+        """Đọc tối đa `limit` byte từ `offset` (không đọc cả file); log đã nén thì giải nén tới offset."""
+        path = self.log_path(job_id, stream)
+        # bản thường trước: lúc nén, .gz được rename vào chỗ rồi mới xoá bản thường -> luôn có ít nhất 1 bản
+        for p, opener in ((path, open), (self._gz(path), gzip.open)):
+            try:
+                with opener(p, "rb") as f:
+                    f.seek(max(0, offset))
+                    return f.read(max(0, limit))
+            except FileNotFoundError:
+                continue
+        return b""
+
+    def compress_log(self, job_id: str, stream: str, level: int = 6) -> tuple[int, int]:
+        """<stream>.log -> <stream>.log.gz (file tạm + rename, xoá bản gốc sau cùng). Trả về (byte gốc, byte nén)."""
+        src = self.log_path(job_id, stream)
+        try:
+            size = src.stat().st_size
+        except FileNotFoundError:
+            return 0, 0
+        if size < COMPRESS_MIN_BYTES:
+            return 0, 0
+        dst = self._gz(src)
+        tmp = dst.with_name(dst.name + ".tmp")
+        try:
+            with open(src, "rb") as fi, open(tmp, "wb") as raw, \
+                    gzip.GzipFile(filename="", mode="wb", fileobj=raw, compresslevel=level, mtime=0) as fo:
+                shutil.copyfileobj(fi, fo, 1 << 20)
+            os.replace(tmp, dst)
+        except BaseException:
+            tmp.unlink(missing_ok=True)
+            raise
+        src.unlink()
+        return size, dst.stat().st_size
+
+    def read_log_range(self, job_id: str, stream: str, offset: int = 0, limit: int = 1 << 16) -> dict:
+        """Đọc 1 đoạn log; next_offset không cắt đôi ký tự UTF-8 (trừ khi đã tới cuối file)."""
+        size = self.log_size(job_id, stream)
+        offset = min(max(0, offset), size)
+        data = self.read_log_bytes(job_id, stream, offset, limit)
+        n = len(data) if offset + len(data) >= size else utf8_safe_len(data)
+        return {
+            "data": data[:n].decode("utf-8", errors="replace"),
+            "offset": offset,
+            "next_offset": offset + n,
+            "size": size,
+            "eof": offset + n >= size,
+        }
+
     def read_logs(self, job_id: str) -> dict:
-        wd = self.job_workdir(job_id)
-        out = (wd/"stdout.log").read_text() if (wd/"stdout.log").exists() else ""
-        err = (wd/"stderr.log").read_text() if (wd/"stderr.log").exists() else ""
-        return {"stdout": out, "stderr": err}
+        return {stream: self._read_text(job_id, stream) for stream in LOG_STREAMS}
+
+    def _read_text(self, job_id: str, stream: str) -> str:
+        path = self.log_path(job_id, stream)
+        try:
+            return path.read_text()
+        except FileNotFoundError:
+            pass
+        try:
+            with gzip.open(self._gz(path), "rt") as f:
+                return f.read()
+        except FileNotFoundError:
+            return ""
@@ -0,0 +1,84 @@
+# src/sandbox/services/compile_cache.py
+"""
+Cache output compile (binary C, .class Java) theo nội dung.
+
+Key = sha256(lang + compiler/flags/version + toàn bộ source trong workdir).
+Layout: <cache_dir>/<key[:2]>/<key>/  (bản sao thư mục build/)
+"""
+from __future__ import annotations
+import hashlib, os, shutil, threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Iterable
+
+from .result_cache import hash_tree
+
+
+def compile_key(lang: str, toolchain: str, workdir: Path, skip: Iterable[str] = ()) -> str:
+    h = hashlib.sha256()
+    h.update(lang.encode() + b"\0" + toolchain.encode() + b"\0")
+    hash_tree(h, workdir, skip)
+    return h.hexdigest()
+
+
+class CompileCache:
+    def __init__(self, cache_dir: Path, max_entries: int = 2000):
+        self.cache_dir = Path(cache_dir)
+        self.max_entries = max(1, int(max_entries))
+        self._lock = threading.Lock()
+        self._lru: "OrderedDict[str, None]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        for d in sorted(self.cache_dir.glob("*/*"), key=lambda p: p.stat().st_mtime):
+            if d.is_dir() and not d.name.startswith("."):
+                self._lru[d.name] = None
+
+    def _entry(self, key: str) -> Path:
+        return self.cache_dir / key[:2] / key
+
+    def get(self, key: str, build_dir: Path) -> bool:
+        """Hit: chép artifact vào build_dir."""
+        with self._lock:
+            known = key in self._lru
+            if known:
+                self._lru.move_to_end(key)
+        d = self._entry(key)
+        if known:
+            try:
+                shutil.rmtree(build_dir, ignore_errors=True)
+                shutil.copytree(d, build_dir)
+                os.utime(d)
+                with self._lock:
+                    self.hits += 1
+                return True
+            except OSError:
+                with self._lock:
+                    self._lru.pop(key, None)
+                shutil.rmtree(d, ignore_errors=True)
+        with self._lock:
+            self.misses += 1
+        return False
+
+    def put(self, key: str, build_dir: Path):
+        d = self._entry(key)
+        tmp = d.with_name(f".{key}.tmp{os.getpid()}.{threading.get_ident()}")
+        try:
+            d.parent.mkdir(parents=True, exist_ok=True)
+            shutil.copytree(build_dir, tmp)
+            os.rename(tmp, d)
+        except OSError:
+            shutil.rmtree(tmp, ignore_errors=True)  # job khác vừa ghi cùng key / build lỗi
+            return
+        with self._lock:
+            self._lru[key] = None
+            old = []
+            while len(self._lru) > self.max_entries:
+                old.append(self._lru.popitem(last=False)[0])
+        for k in old:
+            shutil.rmtree(self._entry(k), ignore_errors=True)
+
+    def stats(self) -> dict:
+        with self._lock:
+            total = self.hits + self.misses
+            return {"entries": len(self._lru), "hits": self.hits, "misses": self.misses,
+                    "hit_rate": round(self.hits / total, 4) if total else None}
@@ -0,0 +1,41 @@
+# src/sandbox/services/events.py
+from __future__ import annotations
+import threading
+from collections import OrderedDict
+from typing import Optional, Tuple
+
+TERMINAL = {"FINISHED", "FAILED", "TIMEOUT", "KILLED", "OOM", "PIDS_LIMIT"}
+
+
+class JobEvents:
+    """
+    Trạng thái mới nhất + số thứ tự thay đổi của từng job, giữ trong RAM.
+    Stream/long-poll chỉ so seq thay vì query SQLite liên tục.
+    """
+
+    def __init__(self, max_jobs: int = 10000):
+        self.max_jobs = max_jobs
+        self._lock = threading.Lock()
+        self._cv = threading.Condition(self._lock)
+        self._jobs: "OrderedDict[str, Tuple[int, str]]" = OrderedDict()  # job_id -> (seq, status)
+
+    def publish(self, job_id: str, status: str):
+        status = getattr(status, "value", status)
+        with self._lock:
+            seq = self._jobs.get(job_id, (0, ""))[0] + 1
+            self._jobs[job_id] = (seq, status)
+            self._jobs.move_to_end(job_id)
+            while len(self._jobs) > self.max_jobs:
+                self._jobs.popitem(last=False)
+            self._cv.notify_all()
+
+    def get(self, job_id: str) -> Tuple[int, Optional[str]]:
+        with self._lock:
+            seq, status = self._jobs.get(job_id, (0, None))
+            return seq, status
+
+    def wait(self, job_id: str, seq: int, timeout: float) -> Tuple[int, Optional[str]]:
+        """Chặn tới khi seq của job > seq đã biết (hoặc hết timeout)."""
+        with self._lock:
+            self._cv.wait_for(lambda: self._jobs.get(job_id, (0, None))[0] > seq, timeout=timeout)
+            return self._jobs.get(job_id, (0, None))
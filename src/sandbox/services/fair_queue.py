@@ -0,0 +1,75 @@
+# src/sandbox/services/fair_queue.py
+"""
+Hàng đợi job theo priority class + fair share giữa các tenant.
+
+- Class ưu tiên tuyệt đối theo thứ tự khai báo: còn job interactive thì không lấy job batch
+  (chỉ chiếm trước vị trí hàng đợi, job đang chạy không bị dừng).
+- Trong 1 class: start-time fair queueing. Mỗi job của tenant nhận "virtual start"
+  = max(vtime của class, finish của job trước cùng tenant), finish = start + 1/weight.
+  Lấy job có virtual start nhỏ nhất -> tenant nộp 5000 bài không chặn tenant nộp 1 bài,
+  tenant weight 2 được lấy gấp đôi khi cả hai cùng còn job.
+"""
+from __future__ import annotations
+import heapq, itertools, threading
+from typing import Dict, Iterable, Optional
+
+
+class _Class:
+    __slots__ = ("heap", "vtime", "finish")
+
+    def __init__(self):
+        self.heap: list = []                 # (vstart, seq, job_id, tenant)
+        self.vtime = 0.0
+        self.finish: Dict[str, float] = {}   # tenant -> virtual finish của job cuối
+
+
+class FairQueue:
+    def __init__(self, classes: Iterable[str], tenant_weights: Optional[Dict[str, float]] = None):
+        self.order = list(classes)
+        self.tenant_weights = dict(tenant_weights or {})
+        self._classes = {c: _Class() for c in self.order}
+        self._seq = itertools.count()
+        self._cv = threading.Condition()
+        self._size = 0
+        self._closed = False
+
+    def _weight(self, tenant: str) -> float:
+        return max(self.tenant_weights.get(tenant, 1.0), 1e-6)
+
+    def put(self, job_id: str, cls: str, tenant: str):
+        with self._cv:
+            c = self._classes[cls]
+            start = max(c.vtime, c.finish.get(tenant, 0.0))
+            c.finish[tenant] = start + 1.0 / self._weight(tenant)
+            heapq.heappush(c.heap, (start, next(self._seq), job_id, tenant))
+            self._size += 1
+            self._cv.notify()
+
+    def get(self) -> Optional[tuple[str, str, str]]:
+        """(job_id, class, tenant); chặn tới khi có job, None sau close()."""
+        with self._cv:
+            while not self._size and not self._closed:
+                self._cv.wait()
+            if self._closed:
+                return None
+            for name in self.order:
+                c = self._classes[name]
+                if c.heap:
+                    start, _, job_id, tenant = heapq.heappop(c.heap)
+                    c.vtime = start
+                    if not c.heap:
+                        c.finish.clear()  # class rỗng -> bắt đầu lại, tenant cũ không bị "nợ"
+                    self._size -= 1
+                    return job_id, name, tenant
+
+    def close(self):
+        with self._cv:
+            self._closed = True
+            self._cv.notify_all()
+
+    def qsize(self) -> int:
+        return self._size
+
+    def depth(self) -> Dict[str, int]:
+        with self._cv:
+            return {name: len(c.heap) for name, c in self._classes.items()}
@@ -1,14 +1,25 @@
+import base64, threading, time, traceback
+from sqlalchemy import JSON, Column, Index, event, func, inspect, text, tuple_, update
 from sqlalchemy.orm import sessionmaker
-from sqlmodel import SQLModel, Field, create_engine, Session
+from sqlalchemy.orm.instrumentation import manager_of_class
+from sqlmodel import SQLModel, Field, create_engine, Session, delete, select
 from enum import Enum
 from datetime import datetime
-from typing import Optional
+from typing import Dict, Iterable, List, Optional
 
 class JobStatus(str, Enum):
     QUEUED="QUEUED"; RUNNING="RUNNING"
     FINISHED="FINISHED"; FAILED="FAILED"; TIMEOUT="TIMEOUT"; KILLED="KILLED"
+    OOM="OOM"; PIDS_LIMIT="PIDS_LIMIT"  # FAILED do chạm memory.max / pids.max (suy ra từ cgroup)
+
+ACTIVE = (JobStatus.QUEUED, JobStatus.RUNNING)
 
 class Job(SQLModel, table=True):
+    # list_jobs: lọc status + phân trang keyset theo (created_at, id) -> không phải sort
+    __table_args__ = (
+        Index("ix_job_created_at_id", "created_at", "id"),
+        Index("ix_job_status_created_at_id", "status", "created_at", "id"),
+    )
     id: str = Field(primary_key=True)
     status: JobStatus
     created_at: datetime
@@ -18,26 +29,329 @@ class Job(SQLModel, table=True):
     reason: Optional[str] = None
     lang: str = "python"
     entry: str = "main.py"
+    output_truncated: Optional[bool] = False  # log bị cắt ở stdout/stderr_max_bytes
+    startup_ms: Optional[float] = None  # thời gian tới lúc code user bắt đầu (zygote) / Popen trả về
+    case_count: Optional[int] = None  # job nhiều testcase (None = job thường)
+    cases_passed: Optional[int] = None
+    stop_on_failure: Optional[bool] = False
+    use_cache: Optional[bool] = True   # cho phép lấy/ghi result cache (khi bật trong config)
+    cache_hit: Optional[bool] = None   # True: kết quả lấy từ cache, không chạy
+    compile_ms: Optional[float] = None          # C/Java: thời gian bước compile (kể cả lấy từ cache)
+    compile_cache_hit: Optional[bool] = None    # True: dùng lại binary/.class đã compile
+    # cgroup accounting cuối của job (None khi chạy không có cgroup)
+    peak_memory_bytes: Optional[int] = None
+    cpu_user_ms: Optional[float] = None
+    cpu_system_ms: Optional[float] = None
+    cpu_throttled_ms: Optional[float] = None
+    oom_kills: Optional[int] = None
+    pids_peak: Optional[int] = None
+    priority: Optional[str] = None  # priority class (interactive | batch...), None = class mặc định
+    tenant: Optional[str] = None    # chủ job, dùng cho fair share trong hàng đợi
+    settings_version: Optional[str] = None     # Settings.version của snapshot job đã chạy với
+    settings_generation: Optional[int] = None  # số lần swap settings của process lúc đó (1 = chưa reload)
+    timings_ms: Optional[dict] = Field(default=None, sa_column=Column(JSON))  # phase -> ms (submit, prepare, run...)
+
+class CaseVerdict(str, Enum):
+    OK="OK"; WA="WA"; RE="RE"; TLE="TLE"; MLE="MLE"
+
+class CaseResult(SQLModel, table=True):
+    job_id: str = Field(primary_key=True)
+    idx: int = Field(primary_key=True)
+    verdict: CaseVerdict
+    exit_code: Optional[int] = None
+    time_ms: Optional[float] = None       # wall time
+    cpu_ms: Optional[float] = None        # user+sys
+    peak_memory_kb: Optional[int] = None  # memory.peak của leaf (hoặc ru_maxrss)
+
+def _copy(job: Job) -> Job:
+    """
+    Cache giữ bản sao riêng: caller sửa Job của mình không làm đổi cache trước khi update().
+    Job(**data) validate + phát event SQLAlchemy cho từng cột (~150us); bản sao transient chỉ cần dict cột (~7us).
+    """
+    data = job.model_dump()
+    obj = manager_of_class(Job).new_instance()
+    obj.__dict__.update(data)
+    object.__setattr__(obj, "__pydantic_fields_set__", set(data))
+    return obj
+
+def encode_cursor(job: Job) -> str:
+    return base64.urlsafe_b64encode(f"{job.created_at.isoformat()}|{job.id}".encode()).decode().rstrip("=")
+
+def decode_cursor(cursor: str) -> tuple[datetime, str]:
+    """ValueError nếu cursor không hợp lệ."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        at, job_id = raw.split("|", 1)
+        return datetime.fromisoformat(at), job_id
+    except Exception as e:
+        raise ValueError(f"invalid cursor: {cursor!r}") from e
 
 class JobStore:
-    def __init__(self, url="sqlite:///./sandbox.db"):
+    """
+    SQLite (WAL) + cache trong RAM cho job QUEUED/RUNNING.
+
+    - get() của job đang hoạt động không chạm DB; cache chỉ đúng khi 1 process service ghi DB này.
+    - update() (chuyển trạng thái) được gom: thread nền ghi mọi job đổi trong coalesce_ms
+      bằng 1 transaction, nhiều lần update cùng job chỉ ghi bản cuối. coalesce_ms=0 -> ghi ngay.
+    - add / add_many / case results vẫn ghi đồng bộ (API trả job_id thì job phải có trong DB).
+    """
+
+    def __init__(self, url="sqlite:///./sandbox.db", *, wal: bool = True, synchronous: str = "NORMAL",
+                 busy_timeout_ms: int = 5000, cache_size_kb: int = 16384, coalesce_ms: float = 0,
+                 active_cache: bool = True, active_cache_max: int = 100_000):
         self.engine = create_engine(url, connect_args={"check_same_thread": False})
+        if self.engine.dialect.name == "sqlite" and wal:
+            pragmas = [
+                "journal_mode=WAL",             # reader không chặn writer và ngược lại
+                f"synchronous={synchronous}",   # NORMAL + WAL: không fsync mỗi commit, vẫn không hỏng DB
+                f"busy_timeout={int(busy_timeout_ms)}",
+                f"cache_size=-{int(cache_size_kb)}",
+                "temp_store=MEMORY",
+            ]
+
+            @event.listens_for(self.engine, "connect")
+            def _pragmas(dbapi_conn, _record):
+                cur = dbapi_conn.cursor()
+                for p in pragmas:
+                    cur.execute(f"PRAGMA {p}")
+                cur.close()
+
         SQLModel.metadata.create_all(self.engine)
+        self._add_missing_columns()
         # tạo Session factory với expire_on_commit=False
         self.SessionLocal = sessionmaker(bind=self.engine, class_=Session, expire_on_commit=False)
 
+        self.coalesce_s = max(0.0, coalesce_ms / 1000)
+        self.active_cache = active_cache
+        self.active_cache_max = active_cache_max
+        self._cv = threading.Condition()
+        self._active: Dict[str, Job] = {}    # job QUEUED/RUNNING mới nhất (đã hoặc sắp ghi)
+        self._dirty: Dict[str, Job] = {}     # chờ flush, bản cuối thắng
+        self._flushing: Dict[str, Job] = {}  # đang ghi, vẫn đọc được cho tới khi commit xong
+        self._writes = 0  # +1 mỗi lần ghi qua _remember -> get() biết row vừa đọc từ DB có thể đã cũ
+        self._flush_lock = threading.Lock()
+        self._closed = False
+        self.updates = 0
+        self.commits = 0
+        self.rows_written = 0
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.flush_errors = 0
+        self._flusher = None
+        if self.coalesce_s:
+            self._flusher = threading.Thread(target=self._flush_loop, name="sbx-store-flush", daemon=True)
+            self._flusher.start()
+
+    def _add_missing_columns(self):
+        # create_all không ALTER bảng có sẵn -> tự thêm cột mới (nullable) cho DB cũ
+        have = {c["name"] for c in inspect(self.engine).get_columns(Job.__tablename__)}
+        with self.engine.begin() as conn:
+            for col in Job.__table__.columns:
+                if col.name not in have:
+                    ddl = col.type.compile(dialect=self.engine.dialect)
+                    conn.execute(text(f'ALTER TABLE {Job.__tablename__} ADD COLUMN "{col.name}" {ddl}'))
+            # ... và cũng không tạo index mới cho bảng có sẵn
+            for idx in Job.__table__.indexes:
+                idx.create(conn, checkfirst=True)
+
+    def close(self):
+        """Ghi nốt các update đang gom rồi dừng thread flush."""
+        with self._cv:
+            self._closed = True
+            self._cv.notify_all()
+        if self._flusher is not None:
+            self._flusher.join(timeout=5)
+            self._flusher = None
+        self.flush()
+
+    # ------------ active cache ------------
+
+    def _remember(self, job: Job):
+        """Gọi khi đã giữ self._cv."""
+        self._writes += 1
+        if not self.active_cache:
+            return
+        if job.status in ACTIVE:
+            if job.id in self._active or len(self._active) < self.active_cache_max:
+                self._active[job.id] = job
+        else:
+            self._active.pop(job.id, None)
+
+    def _cached(self, job_id: str) -> Optional[Job]:
+        # không cần lock: dict.get là atomic, bản trong _dirty/_flushing chỉ bị bỏ sau khi đã nằm trong DB
+        return self._dirty.get(job_id) or self._flushing.get(job_id) or self._active.get(job_id)
+
+    # ------------ write ------------
     def add(self, job: Job):
+        copy = _copy(job) if self.active_cache else None
         with self.SessionLocal() as s:
             s.add(job)
             s.commit()
+        self.commits += 1
+        if copy is not None:
+            with self._cv:
+                self._remember(copy)
 
-    def get(self, job_id: str) -> Optional[Job]:
+    def add_many(self, jobs: Iterable[Job]):
+        # 1 transaction cho cả batch
+        jobs = list(jobs)
+        copies = [_copy(j) for j in jobs] if self.active_cache else []
         with self.SessionLocal() as s:
-            return s.get(Job, job_id)
+            s.add_all(jobs)
+            s.commit()
+        self.commits += 1
+        with self._cv:
+            for c in copies:
+                self._remember(c)
 
     def update(self, job: Job) -> Job:
+        """Ghi trạng thái mới của job (đã có trong DB); với coalesce_ms > 0 thì ghi trễ tối đa coalesce_ms."""
+        copy = _copy(job)
+        self.updates += 1
+        if not self.coalesce_s:
+            with self.SessionLocal() as s:
+                s.execute(update(Job), [copy.model_dump()])
+                s.commit()
+            self.commits += 1
+            self.rows_written += 1
+            with self._cv:
+                self._remember(copy)
+            return job
+        with self._cv:
+            self._dirty[job.id] = copy
+            self._remember(copy)
+            self._cv.notify()
+        return job
+
+    def flush(self):
+        """Ghi mọi update đang gom trong 1 transaction (gọi trước khi query cần dữ liệu mới nhất)."""
+        with self._flush_lock:
+            with self._cv:
+                if not self._dirty:
+                    return
+                self._flushing, self._dirty = self._dirty, {}
+                batch = list(self._flushing.values())
+            try:
+                with self.SessionLocal() as s:
+                    # ORM bulk UPDATE theo primary key: 1 executemany, không SELECT trước như merge()
+                    s.execute(update(Job), [j.model_dump() for j in batch])
+                    s.commit()
+            except Exception:
+                with self._cv:
+                    self.flush_errors += 1
+                    for j in batch:
+                        self._dirty.setdefault(j.id, j)  # update mới hơn (nếu có) thắng
+                    self._flushing = {}
+                raise
+            with self._cv:
+                self._flushing = {}
+                self.commits += 1
+                self.rows_written += len(batch)
+
+    def _flush_loop(self):
+        while True:
+            with self._cv:
+                while not self._dirty and not self._closed:
+                    self._cv.wait()
+                if self._closed:
+                    return
+            time.sleep(self.coalesce_s)  # gom thêm các update tới trong cửa sổ này
+            try:
+                self.flush()
+            except Exception:
+                traceback.print_exc()
+                time.sleep(min(1.0, self.coalesce_s * 10))
+
+    # ------------ read ------------
+
+    def get(self, job_id: str) -> Optional[Job]:
+        j = self._cached(job_id)
+        if j is not None:
+            self.cache_hits += 1
+            return _copy(j)
+        self.cache_misses += 1
+        writes = self._writes
         with self.SessionLocal() as s:
-            # gắn (attach) đối tượng trở lại session hiện tại
-            db_job = s.merge(job)
+            job = s.get(Job, job_id)
+        if job is not None and job.status in ACTIVE and self.active_cache:
+            with self._cv:
+                # vd job QUEUED còn lại từ lần chạy service trước; có ghi chen vào trong lúc đọc DB
+                # (vd update() kết thúc job + flush xong) thì row có thể đã cũ -> không cache, lần sau đọc lại
+                if self._writes == writes and self._cached(job_id) is None:
+                    self._remember(_copy(job))
+        return job
+
+    def get_many(self, job_ids: List[str]) -> List[Job]:
+        if not job_ids:
+            return []
+        out, rest = [], []
+        for x in job_ids:
+            j = self._cached(x)
+            if j is not None:
+                out.append(_copy(j))
+            else:
+                rest.append(x)
+        self.cache_hits += len(out)
+        self.cache_misses += len(rest)
+        if rest:
+            with self.SessionLocal() as s:
+                out += s.exec(select(Job).where(Job.id.in_(rest))).all()
+        return out
+
+    def list_jobs(self, *, statuses: Optional[List[JobStatus]] = None, lang: Optional[str] = None,
+                  tenant: Optional[str] = None, priority: Optional[str] = None,
+                  created_after: Optional[datetime] = None, created_before: Optional[datetime] = None,
+                  cursor: Optional[str] = None, limit: int = 50) -> tuple[List[Job], Optional[str]]:
+        """
+        Job mới nhất trước, phân trang keyset theo (created_at, id): trang sau không chậm dần như OFFSET
+        và không lặp/mất job khi có job mới chen vào. Trả về (jobs, next_cursor | None).
+        Không chờ flush: job vừa đổi trạng thái lọt/không lọt bộ lọc status trễ tối đa coalesce_ms,
+        nhưng job trả về luôn mang trạng thái mới nhất.
+        """
+        q = select(Job)
+        if statuses:
+            q = q.where(Job.status.in_(statuses))
+        if lang:
+            q = q.where(Job.lang == lang)
+        if tenant:
+            q = q.where(Job.tenant == tenant)
+        if priority:
+            q = q.where(Job.priority == priority)
+        if created_after:
+            q = q.where(Job.created_at >= created_after)
+        if created_before:
+            q = q.where(Job.created_at < created_before)
+        if cursor:
+            q = q.where(tuple_(Job.created_at, Job.id) < tuple_(*decode_cursor(cursor)))
+        q = q.order_by(Job.created_at.desc(), Job.id.desc()).limit(limit + 1)
+        with self.SessionLocal() as s:
+            rows = list(s.exec(q).all())
+        more = len(rows) > limit
+        rows = [(_copy(p) if (p := self._dirty.get(j.id) or self._flushing.get(j.id)) is not None else j)
+                for j in rows[:limit]]
+        return rows, (encode_cursor(rows[-1]) if more else None)
+
+    def set_case_results(self, job_id: str, results: Iterable[CaseResult]):
+        """Thay toàn bộ kết quả testcase của job (chạy lại job -> bỏ kết quả lần trước trong cùng transaction)."""
+        with self.SessionLocal() as s:
+            s.exec(delete(CaseResult).where(CaseResult.job_id == job_id))
+            s.add_all(list(results))
             s.commit()
-            return db_job
\ No newline at end of file
+
+    def get_case_results(self, job_id: str) -> List[CaseResult]:
+        with self.SessionLocal() as s:
+            q = select(CaseResult).where(CaseResult.job_id == job_id).order_by(CaseResult.idx)
+            return list(s.exec(q).all())
+
+    def count_by_status(self) -> dict:
+        with self.SessionLocal() as s:
+            rows = s.exec(select(Job.status, func.count()).group_by(Job.status)).all()
+            return {getattr(st, "value", st): n for st, n in rows}
+
+    def stats(self) -> dict:
+        with self._cv:
+            return {
+                "updates": self.updates, "commits": self.commits, "rows_written": self.rows_written,
+                "pending": len(self._dirty) + len(self._flushing), "flush_errors": self.flush_errors,
+                "active_cached": len(self._active), "cache_hits": self.cache_hits, "cache_misses": self.cache_misses,
+            }
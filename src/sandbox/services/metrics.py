@@ -0,0 +1,124 @@
+# src/sandbox/services/metrics.py
+"""
+Metrics trong RAM + xuất text format Prometheus (không cần prometheus_client).
+observe() chỉ là 1 bisect + cộng dưới lock -> gọi được trên đường nóng của mọi job.
+"""
+from __future__ import annotations
+import bisect, threading
+from typing import Dict, Iterable, Tuple
+
+# giây: 0.5ms .. 60s
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+Labels = Tuple[Tuple[str, str], ...]
+
+
+def _fmt_labels(labels: Labels, extra: str = "") -> str:
+    parts = [f'{k}="{v}"' for k, v in labels]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+class Histogram:
+    def __init__(self, name: str, help: str, buckets: Iterable[float] = DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.buckets = tuple(sorted(buckets))
+        self._lock = threading.Lock()
+        self._series: Dict[Labels, list] = {}  # labels -> [counts per bucket..., +Inf], sum
+
+    def observe(self, value: float, **labels: str):
+        key = tuple(sorted(labels.items()))
+        i = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            s = self._series.get(key)
+            if s is None:
+                s = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0]
+            s[0][i] += 1
+            s[1] += value
+
+    def quantile(self, q: float, counts: list, total: int) -> float | None:
+        """Ước lượng quantile từ bucket (nội suy tuyến tính như histogram_quantile của Prometheus)."""
+        if not total:
+            return None
+        rank = q * total
+        acc, lo = 0, 0.0
+        for hi, c in zip(self.buckets, counts):
+            if c and acc + c >= rank:
+                return lo + (hi - lo) * (rank - acc) / c
+            acc += c
+            lo = hi
+        return self.buckets[-1]  # rơi vào +Inf
+
+    def summary(self, **labels: str) -> dict:
+        """count / mean / p50 / p99 của 1 series (giây) cho /scheduler."""
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            s = self._series.get(key)
+            counts, total_s = (list(s[0]), s[1]) if s else ([], 0.0)
+        n = sum(counts)
+        out = {"count": n, "mean": round(total_s / n, 6) if n else None}
+        for name, q in (("p50", 0.5), ("p99", 0.99)):
+            v = self.quantile(q, counts, n)
+            out[name] = round(v, 6) if v is not None else None
+        return out
+
+    def render(self) -> list[str]:
+        out = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            series = [(k, list(v[0]), v[1]) for k, v in self._series.items()]
+        for labels, counts, total in sorted(series):
+            acc = 0
+            for le, c in zip((*self.buckets, "+Inf"), counts):
+                acc += c
+                le_label = 'le="%s"' % le
+                out.append(f"{self.name}_bucket{_fmt_labels(labels, le_label)} {acc}")
+            out.append(f"{self.name}_sum{_fmt_labels(labels)} {total:.6f}")
+            out.append(f"{self.name}_count{_fmt_labels(labels)} {acc}")
+        return out
+
+
+class Counter:
+    def __init__(self, name: str, help: str):
+        self.name = name
+        self.help = help
+        self._lock = threading.Lock()
+        self._values: Dict[Labels, float] = {}
+
+    def inc(self, value: float = 1, **labels: str):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + value
+
+    def render(self) -> list[str]:
+        out = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            items = sorted(self._values.items())
+        out += [f"{self.name}{_fmt_labels(k)} {v:g}" for k, v in items]
+        return out
+
+
+def render_gauge(name: str, help: str, values: Dict[Labels, float] | float, kind: str = "gauge") -> list[str]:
+    """Giá trị lấy lúc scrape (queue depth, số job theo status...); kind="counter" cho bộ đếm có sẵn ở nơi khác."""
+    out = [f"# HELP {name} {help}", f"# TYPE {name} {kind}"]
+    if not isinstance(values, dict):
+        values = {(): values}
+    out += [f"{name}{_fmt_labels(k)} {v:g}" for k, v in sorted(values.items())]
+    return out
+
+
+class Metrics:
+    def __init__(self):
+        self.phase_seconds = Histogram("sbx_job_phase_seconds", "Latency of each job phase (submit, prepare, spawn, run...)")
+        self.jobs_finished = Counter("sbx_jobs_finished_total", "Jobs that reached a terminal status")
+        self.class_queue_wait = Histogram("sbx_class_queue_wait_seconds", "Queue wait per priority class (incl. admission delay)")
+        self.class_run = Histogram("sbx_class_run_seconds", "Worker run time per priority class")
+
+    def observe_phases(self, spans_s: Dict[str, float]):
+        for phase, secs in spans_s.items():
+            self.phase_seconds.observe(secs, phase=phase)
+
+    def render(self) -> list[str]:
+        return (self.phase_seconds.render() + self.class_queue_wait.render() + self.class_run.render()
+                + self.jobs_finished.render())
@@ -1,51 +1,645 @@
-import uuid
+import dataclasses, hashlib, json, os, shutil, sys, threading, time, uuid
+from contextlib import contextmanager
 from datetime import datetime
 from pathlib import Path
-from .job_store import Job, JobStatus, JobStore
+from typing import Callable
+from .job_store import CaseResult, CaseVerdict, Job, JobStatus, JobStore
 from .artifact_store import ArtifactStore
-from ..executor.base import ExecSpec
+from .artifact_manager import ArtifactManager
+from .events import JobEvents
+from .metrics import Metrics
+from .result_cache import ResultCache, file_digest, result_key
+from .compile_cache import CompileCache, compile_key
+from ..executor.base import ExecContext, ExecSpec
 # from ..executor.cgroups import assert_controllers_on
+from ..executor.cgroups import USE_CGROUP, LeafPool, ensure_class_group, read_oom_kills
+from ..executor.diskwatch import DiskWatch
 from ..executor.ns_chroot import NsChrootExecutor
-from ..settings import load_settings
+from ..executor.logrelay import LogRelay
+from ..executor.nspool import NsPool
+from ..executor.rootfs import OverlayRootfs, resolve_in
+from ..executor.supervisor import Supervisor
+from ..settings import LiveSettings, Settings
+from ..runners.base import Runner
+from ..runners.c_runner import CRunner
+from ..runners.java_runner import JavaRunner
 from ..runners.python_runner import PythonRunner
+from ..runners.zygote import ZygotePool
+from ..seccomp.bpf_cache import BpfCache
+
+# file service tự sinh trong workdir, không thuộc nội dung bài nộp
+CACHE_SKIP = ("stdout.log", "stderr.log", "compile.log", "build", "_secwrap.py", "seccomp_helper.py", "seccomp.yaml")
+
+@contextmanager
+def _span(spans: dict, name: str):
+    t0 = time.monotonic()
+    try:
+        yield
+    finally:
+        spans[name] = spans.get(name, 0.0) + time.monotonic() - t0
+
+@dataclasses.dataclass
+class _RunState:
+    """Job đã prepare xong, chờ chạy / đang chạy (giữa _begin và _complete)."""
+    job: Job
+    s: Settings  # snapshot settings của job, giữ nguyên dù có reload giữa chừng
+    spans: dict
+    t_run: float
+    workdir: Path
+    spec: ExecSpec
+    ctx: ExecContext
+    cache_key: str | None = None
+    fingerprint: str | None = None
+
+def _same_output(out: Path, ans: Path) -> bool:
+    """So sánh kiểu judge: bỏ khoảng trắng cuối mỗi dòng và dòng trống ở cuối."""
+    def norm(p: Path) -> list[str]:
+        try:
+            lines = p.read_text(encoding="utf-8", errors="replace").splitlines()
+        except FileNotFoundError:
+            lines = []
+        lines = [x.rstrip() for x in lines]
+        while lines and not lines[-1]:
+            lines.pop()
+        return lines
+    return norm(out) == norm(ans)
 
 class Orchestrator:
-    def __init__(self, store: JobStore):
-        self.s = load_settings()
+    def __init__(self, store: JobStore, settings: LiveSettings | None = None):
+        self.settings = settings or LiveSettings()
         self.store = store
+        self.events = JobEvents()
+        self.metrics = Metrics()
         self.art = ArtifactStore(self.s.jobs_dir)
+        self.artifacts = (ArtifactManager(self.art, store, retention=self.s.artifacts_retention,
+                                          max_total_bytes=self.s.artifacts_max_total_bytes,
+                                          job_max_bytes=self.s.artifacts_job_max_bytes,
+                                          compress=self.s.artifacts_compress_logs, settle_s=self.s.artifacts_settle_s,
+                                          batch_size=self.s.artifacts_batch_size,
+                                          interval_s=self.s.artifacts_interval_s)
+                          if self.s.artifacts_enabled else None)
+        self.leaf_pool = self._make_leaf_pool() if self.s.cgroup_pool_enabled else None
+        self.bpf_cache = BpfCache(self.s.seccomp_cache_dir) if self.s.seccomp_enabled else None
+        self.runners: dict[str, Runner] = {
+            "python": PythonRunner(),
+            "c": CRunner(self.s.c_compiler, self.s.c_flags),
+            "java": JavaRunner(self.s.javac, self.s.java, cds_dir=self.s.java_cds_dir if str(self.s.java_cds_dir) else None),
+        }
+        # zygote dùng đúng interpreter của PythonRunner -> bật/tắt pool không đổi kết quả/version
+        self.zygote_pool = (ZygotePool(self.s.zygote_pool_size, self.s.zygote_recycle_after,
+                                       python=self.runners["python"].python)
+                            if self.s.zygote_enabled else None)
+        self.result_cache = (ResultCache(self.s.result_cache_dir, self.s.result_cache_max_bytes,
+                                         self.s.result_cache_max_entries)
+                             if self.s.result_cache_enabled else None)
+        self.compile_cache = (CompileCache(self.s.compile_cache_dir, self.s.compile_cache_max_entries)
+                              if self.s.compile_cache_enabled else None)
+        # job_id -> ctx đang chạy (compile hoặc run) để cancel() giết đúng leaf
+        self._active: dict[str, ExecContext] = {}
+        self._cancelled: set[str] = set()
+        self._in_flight: set[str] = set()  # job đang nằm trong run()/run_async() của process này
+        self._active_lock = threading.Lock()
+        self.supervisor = (Supervisor(self.s.supervisor_completion_threads)
+                           if self.s.supervisor_enabled else None)
+        self.overlay = (OverlayRootfs(self.s.rootfs, self.s.rootfs_scratch_dir, self.s.rootfs_upper_size,
+                                      noexec_work=self.s.noexec_work, enable_loopback=self.s.enable_loopback)
+                        if self.s.rootfs_overlay else None)
+        self.ns_pool = (NsPool(self.s.ns_pool_size, self.s.ns_pool_low_watermark,
+                               enable_loopback=self.s.enable_loopback, max_idle_s=self.s.ns_pool_max_idle_s)
+                        if self.s.ns_pool_enabled else None)
+        self.log_relay = LogRelay()
+        self.disk_watch = DiskWatch()
         self.exec = NsChrootExecutor(
             self.s.rootfs,
             enable_loopback=self.s.enable_loopback,
             noexec_work=self.s.noexec_work,
             bind_full_etc=self.s.bind_full_etc,
+            leaf_pool=self.leaf_pool,
+            cgroup_launcher=self.s.cgroup_launcher,
+            zygote_pool=self.zygote_pool,
+            bpf_cache=self.bpf_cache,
+            supervisor=self.supervisor,
+            settings=self.settings,
+            overlay=self.overlay,
+            ns_pool=self.ns_pool,
+            log_relay=self.log_relay,
+            disk_watch=self.disk_watch,
         )
+        # CHROOT mode: java của job là bản trong rootfs -> CDS archive dump/key theo JDK đó
+        self.runners["java"].rootfs = self.s.rootfs if self.exec.rootfs_ready() else None
+
+    @property
+    def s(self) -> Settings:
+        """Snapshot hiện tại; code theo job lấy 1 lần (_RunState.s) thay vì đọc lại property này."""
+        return self.settings.current
+
+    def _make_leaf_pool(self) -> LeafPool:
+        pool = LeafPool(self.s.cgroup_pool_size, self.s.cgroup_pool_low_watermark)
+        profiles = self.s.cgroup_pool_profiles or {"default": self.s.cgroup_pool_size}
+        for cls, weight in self.s.priority_classes.items():
+            pool.add_group(cls, weight)
+            for name, size in profiles.items():
+                pool.register(name, self.s.profile_limits(name), size, group=cls)
+        return pool
+
+    def priority_class(self, name: str | None) -> str:
+        return name if name in self.s.priority_classes else self.s.priority_default
+
+    def start(self):
+        if self.bpf_cache is not None:
+            # compile policy 1 lần lúc khởi động (hoặc lấy từ cache trên đĩa)
+            self.bpf_cache.ensure(self.s.seccomp_policy)
+        if self.leaf_pool is not None:
+            self.leaf_pool.start()  # tạo luôn sbx/class-<name> + cpu.weight
+        elif USE_CGROUP:
+            for cls, weight in self.s.priority_classes.items():
+                ensure_class_group(cls, weight)
+        if self.zygote_pool is not None:
+            self.zygote_pool.start()
+        if self.supervisor is not None:
+            self.supervisor.start()
+        self.log_relay.start()
+        if self.overlay is not None and self.overlay.ready():
+            self.overlay.start()
+        if self.ns_pool is not None and self.exec.rootfs_ready():
+            self.ns_pool.start()  # HOST mode không dùng namespace -> không dựng
+        if self.artifacts is not None:
+            self.artifacts.start()
+        java = self.runners["java"]
+        if java.cds_dir is not None:
+            # dump CDS mất vài giây -> thread nền, job Java đầu tiên chưa có archive thì chạy không CDS
+            threading.Thread(target=java.ensure_cds, args=(self._dump_cds,), name="sbx-java-cds", daemon=True).start()
+
+    def close(self):
+        if self.supervisor is not None:
+            self.supervisor.close()
+        self.log_relay.close()
+        self.disk_watch.close()
+        if self.leaf_pool is not None:
+            self.leaf_pool.close()
+        if self.zygote_pool is not None:
+            self.zygote_pool.close()
+        if self.ns_pool is not None:
+            self.ns_pool.close()
+        if self.artifacts is not None:
+            self.artifacts.close()
+
+    def cancel(self, job_id: str, *, if_running: bool = False) -> bool:
+        """
+        Huỷ job đang chạy: giết cả leaf hiện tại (cgroup.kill), các bước sau không chạy nữa -> KILLED.
+        if_running=True: chỉ huỷ khi job đang chạy trong process này, False = không làm gì.
+        """
+        with self._active_lock:
+            if if_running and job_id not in self._in_flight:
+                return False
+            self._cancelled.add(job_id)
+            ctx = self._active.get(job_id)
+        if ctx is not None:
+            self.exec.kill(ctx)
+        return True
+
+    def clear_cancel(self, job_id: str):
+        with self._active_lock:
+            self._cancelled.discard(job_id)
+
+    def _enter(self, job_id: str):
+        with self._active_lock:
+            self._in_flight.add(job_id)
+
+    def _leave(self, job_id: str):
+        with self._active_lock:
+            self._in_flight.discard(job_id)
+            self._cancelled.discard(job_id)
+
+    def _is_cancelled(self, job_id: str) -> bool:
+        with self._active_lock:
+            return job_id in self._cancelled
 
-    def submit_python(self, code: str, entry: str="main.py") -> str:
+    def _track(self, job_id: str, ctx):
+        with self._active_lock:
+            self._active[job_id] = ctx
+            if job_id in self._cancelled:
+                ctx.cancelled = True  # cancel tới trước khi spawn -> run() trả về ngay
+
+    def _untrack(self, job_id: str):
+        with self._active_lock:
+            self._active.pop(job_id, None)
+
+    @staticmethod
+    def _mark_killed(job: Job):
+        job.status = JobStatus.KILLED
+        job.reason = "cancelled"
+        job.finished_at = datetime.utcnow()
+
+    def submit(self, code: str, entry: str = "main.py", lang: str = "python", use_cache: bool = True,
+               priority: str | None = None, tenant: str | None = None) -> str:
+        t0 = time.monotonic()
         job_id = uuid.uuid4().hex[:12]
         self.art.write_code(job_id, entry, code)
+        t_write = time.monotonic() - t0
         self.store.add(Job(
             id=job_id, status=JobStatus.QUEUED, created_at=datetime.utcnow(),
-            lang="python", entry=entry
+            lang=lang, entry=entry, use_cache=use_cache,
+            priority=self.priority_class(priority), tenant=tenant,
+            timings_ms={"submit_write": round(t_write * 1000, 3)},
         ))
+        self.metrics.observe_phases({"submit_write": t_write, "submit": time.monotonic() - t0})
         return job_id
 
-    def run(self, job_id: str):
-        # assert_controllers_on()
-        job = self.store.get(job_id); assert job, "job not found"
-        job.status = JobStatus.RUNNING; job.started_at = datetime.utcnow(); self.store.update(job)
+    def submit_python(self, code: str, entry: str="main.py", use_cache: bool = True) -> str:
+        return self.submit(code, entry, "python", use_cache)
+
+    def submit_cases(self, code: str, entry: str, cases: list[dict], stop_on_failure: bool = False,
+                     lang: str = "python", priority: str | None = None, tenant: str | None = None) -> str:
+        """1 job chạy entry với nhiều testcase: cases = [{"stdin", "expected", "time_limit_s"}]."""
+        t0 = time.monotonic()
+        job_id = uuid.uuid4().hex[:12]
+        self.art.write_code(job_id, entry, code)
+        self.art.write_cases(job_id, cases)
+        self.store.add(Job(
+            id=job_id, status=JobStatus.QUEUED, created_at=datetime.utcnow(),
+            lang=lang, entry=entry, case_count=len(cases), stop_on_failure=stop_on_failure,
+            priority=self.priority_class(priority), tenant=tenant,
+        ))
+        self.metrics.observe_phases({"submit": time.monotonic() - t0})
+        return job_id
+
+    def submit_batch(self, items: list[tuple[str, str, str, bool, str | None, str | None]]) -> list[str]:
+        """
+        items: [(code, entry, lang, use_cache, priority, tenant)]
+        -> ghi workdir từng job rồi insert tất cả Job trong 1 transaction.
+        """
+        t0 = time.monotonic()
+        now = datetime.utcnow()
+        jobs = []
+        for code, entry, lang, use_cache, priority, tenant in items:
+            job_id = uuid.uuid4().hex[:12]
+            self.art.write_code(job_id, entry, code)
+            jobs.append(Job(id=job_id, status=JobStatus.QUEUED, created_at=now, lang=lang, entry=entry,
+                            use_cache=use_cache, priority=self.priority_class(priority), tenant=tenant))
+        self.store.add_many(jobs)
+        self.metrics.observe_phases({"submit_batch": time.monotonic() - t0})
+        return [j.id for j in jobs]
+
+    def run(self, job_id: str, queue_wait_s: float | None = None):
+        """Chạy job tới khi xong, chặn thread gọi."""
+        self._enter(job_id)
+        try:
+            st = self._begin(job_id, queue_wait_s)
+            if st is not None:
+                self._execute(st)
+        finally:
+            self._leave(job_id)
+
+    def run_async(self, job_id: str, queue_wait_s: float | None = None,
+                  done: Callable[[BaseException | None], None] | None = None):
+        """
+        Setup (load, cache, compile, prepare, spawn) chạy trên thread gọi. Job chạy 1 lần (không testcase,
+        không zygote) thì phần chờ exit + hoàn tất nằm ở Supervisor -> thread gọi rảnh ngay sau spawn.
+        done(exc) gọi đúng 1 lần khi job xong (exc = lỗi nếu có).
+        """
+        def finish(exc: BaseException | None = None):
+            self._leave(job_id)
+            if done is not None:
+                done(exc)
 
+        self._enter(job_id)
+        try:
+            st = self._begin(job_id, queue_wait_s)
+            if st is not None and not st.job.case_count:
+                try:
+                    started = self.exec.start(st.ctx, st.spec, lambda rc, exc: self._on_exit(st, rc, exc, finish))
+                except BaseException:
+                    self._cleanup(st)
+                    raise
+                if started:
+                    return
+            if st is not None:
+                self._execute(st)
+        except BaseException as e:
+            return finish(e)
+        finish()
+
+    def _begin(self, job_id: str, queue_wait_s: float | None) -> _RunState | None:
+        """Mọi bước trước khi spawn; None = job đã xong luôn (cache hit, lỗi compile, bị cancel)."""
+        # assert_controllers_on()
+        t_run = time.monotonic()
+        s, generation = self.settings.snapshot()
+        spans: dict[str, float] = {}  # giây theo phase, lưu vào job.timings_ms + histogram /metrics
+        if queue_wait_s is not None:
+            spans["queue_wait"] = queue_wait_s
+        if self.artifacts is not None:
+            self.artifacts.hold(job_id)  # không nén/xoá workdir trong lúc chạy
+        with _span(spans, "load_job"):
+            job = self.store.get(job_id)
+        assert job, "job not found"
+        job.settings_version = s.version; job.settings_generation = generation
         workdir = self.art.job_workdir(job_id)
+        runner = self.runners[job.lang or "python"]
+
+        cache_key = fingerprint = None
+        if self.result_cache is not None and job.use_cache and not job.case_count:
+            with _span(spans, "cache_lookup"):
+                fingerprint = self._env_fingerprint(runner, s)
+                cache_key = result_key(fingerprint, runner.lang, job.entry, workdir, skip=CACHE_SKIP)
+                hit = self._serve_cached(job, cache_key)
+            if hit:
+                return self._finish(job, spans, t_run)
+
+        with _span(spans, "mark_running"):
+            job.status = JobStatus.RUNNING; job.started_at = datetime.utcnow(); job.cache_hit = False
+            self.store.update(job)
+            self.events.publish(job_id, job.status)
+
+        with _span(spans, "compile"):
+            compiled = self._compile(job, runner, workdir, s)
+        if not compiled:
+            return self._finish(job, spans, t_run)
+        if self._is_cancelled(job_id):
+            self._mark_killed(job)
+            return self._finish(job, spans, t_run)
+
         spec = ExecSpec(
-            cmd=PythonRunner().command(workdir / job.entry),
-            workdir=workdir, env={}, timeout_s=self.s.default_timeout_s,
+            cmd=runner.command(workdir / job.entry),
+            workdir=workdir, env={}, timeout_s=s.default_timeout_s,
+            py_entry=(workdir / job.entry) if runner.supports_zygote else None,
+            stdout_max_bytes=s.stdout_max_bytes or None,
+            stderr_max_bytes=s.stderr_max_bytes or None,
+            exec_dir=(workdir / runner.build_dir) if runner.exec_build else None,
         )
-        self.exec.prepare(job_id, workdir, getattr(self.s, "limits", {}))
-        rc = self.exec.run(job_id, spec)
+        # ctx giữ leaf/limits/pid riêng của job -> nhiều job chạy song song an toàn
+        ctx = self.exec.prepare(job_id, workdir, s.profile_limits("default"),
+                                group=self.priority_class(job.priority), settings=s)
+        self._track(job_id, ctx)
+        return _RunState(job, s, spans, t_run, workdir, spec, ctx, cache_key, fingerprint)
+
+    def _execute(self, st: _RunState):
+        try:
+            if st.job.case_count:
+                self._run_cases(st.job, st.ctx, st.spec)
+            else:
+                self._record_run(st, self.exec.run(st.ctx, st.spec))
+        except BaseException:
+            self._cleanup(st)
+            raise
+        self._complete(st)
+
+    def _on_exit(self, st: _RunState, rc: int | None, exc: BaseException | None, finish):
+        # thread hoàn tất của Supervisor
+        try:
+            try:
+                if exc is not None:
+                    raise exc
+                self._record_run(st, rc)
+            except BaseException:
+                self._cleanup(st)
+                raise
+            self._complete(st)
+        except BaseException as e:
+            return finish(e)
+        finish()
+
+    @staticmethod
+    def _record_run(st: _RunState, rc: int):
+        job, ctx = st.job, st.ctx
         job.exit_code = rc; job.finished_at = datetime.utcnow()
+        job.output_truncated = ctx.output_truncated
+        if "startup" in ctx.timings:
+            job.startup_ms = round(ctx.timings["startup"] * 1000, 3)
         job.status = JobStatus.TIMEOUT if rc == 124 else (JobStatus.FINISHED if rc == 0 else JobStatus.FAILED)
+        if ctx.disk_exceeded is not None:
+            job.status = JobStatus.FAILED
+            job.reason = Orchestrator._disk_reason(ctx)
+
+    @staticmethod
+    def _disk_reason(ctx: ExecContext) -> str:
+        return f"disk quota exceeded: wrote {ctx.disk_exceeded} bytes to /work (work_max_bytes={ctx.settings.work_max_bytes})"
+
+    def _cleanup(self, st: _RunState):
+        self._untrack(st.job.id)
+        self.exec.cleanup(st.ctx)
+        st.spans.update(st.ctx.timings)  # prepare, spawn, startup, run, logs, cleanup
+
+    def _complete(self, st: _RunState):
+        job = st.job
+        if st.ctx.cancelled:
+            self._mark_killed(job)
+        self._cleanup(st)
+        self._apply_usage(job, st.ctx.usage)
+        self._finish(job, st.spans, st.t_run)
+
+        # TIMEOUT phụ thuộc tải máy -> không cache
+        if st.cache_key and job.status in (JobStatus.FINISHED, JobStatus.FAILED):
+            t0 = time.monotonic()
+            self.result_cache.put(st.cache_key, st.fingerprint, st.workdir, {
+                "status": job.status.value, "exit_code": job.exit_code, "output_truncated": job.output_truncated,
+            }, runner=st.job.lang or "python")
+            self.metrics.observe_phases({"cache_store": time.monotonic() - t0})
+
+    @staticmethod
+    def _apply_usage(job: Job, usage: dict | None):
+        """Chép cgroup accounting vào job; FAILED vì chạm memory.max / pids.max -> OOM / PIDS_LIMIT."""
+        if not usage:
+            return
+        ms = lambda k: round(usage[k] / 1000, 3) if usage.get(k) is not None else None
+        job.peak_memory_bytes = usage.get("peak_memory_bytes")
+        job.cpu_user_ms = ms("cpu_user_us")
+        job.cpu_system_ms = ms("cpu_system_us")
+        job.cpu_throttled_ms = ms("cpu_throttled_us")
+        job.oom_kills = usage.get("oom_kills")
+        job.pids_peak = usage.get("pids_peak")
+        if job.status != JobStatus.FAILED:
+            return
+        if usage.get("oom_kills"):
+            job.status = JobStatus.OOM
+            job.reason = job.reason or f"memory limit exceeded (oom_kill={usage['oom_kills']})"
+        elif usage.get("pids_limit_hits"):
+            job.status = JobStatus.PIDS_LIMIT
+            job.reason = job.reason or f"process limit reached ({usage['pids_limit_hits']} forks refused)"
+
+    def _finish(self, job: Job, spans: dict, t_run: float):
+        """Ghi trạng thái cuối + timings của job (1 lần update), rồi báo cho client và metrics."""
+        spans["total"] = time.monotonic() - t_run
+        keep = {k: v for k, v in (job.timings_ms or {}).items() if k.startswith("submit")}
+        job.timings_ms = {**keep, **{k: round(v * 1000, 3) for k, v in spans.items()}}
+        t0 = time.monotonic()
         self.store.update(job)
-        self.exec.cleanup(job_id)
+        spans["persist"] = time.monotonic() - t0
+        self.events.publish(job.id, job.status)
+        self.metrics.observe_phases(spans)
+        self.metrics.jobs_finished.inc(status=job.status.value)
+        if self.artifacts is not None:
+            self.artifacts.job_done(job.id, job.status.value, job.entry)
+
+    def _compile(self, job: Job, runner: Runner, workdir: Path, s: Settings) -> bool:
+        """
+        Compile trong sandbox (leaf riêng, profile "compile", không seccomp của code user).
+        Output build/ lấy từ compile cache nếu source + toolchain đã gặp. False = lỗi compile, job đã FAILED.
+        """
+        cmd = runner.compile_command(workdir / job.entry)
+        if cmd is None:
+            return True
+        chroot = self.exec.rootfs_ready()
+        if not (resolve_in(s.rootfs, cmd[0]) is not None if chroot else os.path.exists(cmd[0])):
+            where = f" in rootfs {s.rootfs}" if chroot else ""
+            return self._compile_failed(job, None, f"compiler not available{where}: {cmd[0]}")
+        t0 = time.monotonic()
+        build = workdir / runner.build_dir
+        key = None
+        if self.compile_cache is not None:
+            # CHROOT mode: compiler là bản trong rootfs -> version rootfs nằm trong key
+            toolchain = runner.toolchain_id() + (f" {self._rootfs_version(runner, s)}" if chroot else "")
+            key = compile_key(runner.lang, toolchain, workdir, skip=CACHE_SKIP)
+            job.compile_cache_hit = self.compile_cache.get(key, build)
+            if job.compile_cache_hit:
+                job.compile_ms = round((time.monotonic() - t0) * 1000, 3)
+                return True
+
+        shutil.rmtree(build, ignore_errors=True)
+        build.mkdir(parents=True)
+        spec = ExecSpec(
+            cmd=cmd, workdir=workdir, env={"PATH": "/usr/local/bin:/usr/bin:/bin"},
+            timeout_s=s.compile_timeout_s,
+            stdout_path=workdir / "compile.log",
+            stderr_path=workdir / "stderr.log",  # lỗi compile hiện ngay trong log của job
+            # chỉ cap log lỗi (qua relay); compile.log và file binary/.class không bị giới hạn
+            stderr_max_bytes=s.stderr_max_bytes or None,
+        )
+        ctx = self.exec.prepare(f"{job.id}-cc", workdir, s.profile_limits("compile"),
+                                profile="compile", seccomp=False, group=self.priority_class(job.priority), settings=s)
+        self._track(job.id, ctx)
+        try:
+            rc = self.exec.run(ctx, spec)
+        finally:
+            self._untrack(job.id)
+            self.exec.cleanup(ctx)
+        job.compile_ms = round((time.monotonic() - t0) * 1000, 3)
+        if ctx.cancelled:
+            self._mark_killed(job)
+            return False
+        if ctx.disk_exceeded is not None:
+            return self._compile_failed(job, rc, self._disk_reason(ctx))
+        if rc != 0:
+            return self._compile_failed(job, rc, "compile timeout" if rc == 124 else "compile error")
+        if key is not None:
+            self.compile_cache.put(key, build)
+        return True
+
+    def _dump_cds(self, argv: list[str], workdir: Path) -> bool:
+        """Chạy lệnh dump CDS trong sandbox (JDK của rootfs), workdir là /work."""
+        s = self.s
+        spec = ExecSpec(cmd=argv, workdir=workdir, env={"PATH": "/usr/local/bin:/usr/bin:/bin"},
+                        timeout_s=s.compile_timeout_s)
+        ctx = self.exec.prepare("java-cds", workdir, s.profile_limits("compile"),
+                                profile="compile", seccomp=False, settings=s)
+        try:
+            rc = self.exec.run(ctx, spec)
+        finally:
+            self.exec.cleanup(ctx)
+        return rc == 0
+
+    @staticmethod
+    def _compile_failed(job: Job, rc, reason: str) -> bool:
+        job.status = JobStatus.FAILED; job.exit_code = rc; job.reason = reason
+        job.finished_at = datetime.utcnow()
+        return False
+
+    def _env_fingerprint(self, runner, s: Settings) -> str:
+        """Mọi thứ ngoài bài nộp làm đổi kết quả; file đọc lại theo mtime nên sửa limits/policy là key đổi ngay."""
+        parts = {
+            "limits": s.profile_limits("default"),
+            "limits_file": file_digest(s.limits_file),
+            "seccomp": file_digest(s.seccomp_policy) if s.seccomp_enabled else None,
+            "rootfs": self._rootfs_version(runner, s) if self.exec.rootfs_ready() else self._host_version(runner),
+            "timeout_s": s.default_timeout_s,
+            "output": [s.stdout_max_bytes, s.stderr_max_bytes],
+            "work_max_bytes": s.work_max_bytes,
+        }
+        return hashlib.sha256(json.dumps(parts, sort_keys=True, default=str).encode()).hexdigest()
+
+    @staticmethod
+    def _rootfs_version(runner, s: Settings) -> str:
+        marker = s.rootfs / ".sbx-version"  # script build rootfs ghi version vào đây
+        if marker.exists():
+            return "rootfs:" + file_digest(marker)
+        return f"rootfs:{s.rootfs.stat().st_mtime_ns}"
+
+    @staticmethod
+    def _host_version(runner) -> str:
+        # HOST mode: kết quả phụ thuộc interpreter trên host (và của zygote)
+        return f"host:{runner.toolchain_id()}:{sys.version}"
+
+    def _serve_cached(self, job: Job, key: str) -> bool:
+        hit = self.result_cache.get(key, self.art.job_workdir(job.id))
+        if hit is None:
+            return False
+        now = datetime.utcnow()
+        job.started_at = job.finished_at = now
+        job.status = JobStatus(hit["status"])
+        job.exit_code = hit.get("exit_code")
+        job.output_truncated = hit.get("output_truncated")
+        job.cache_hit = True
+        job.startup_ms = None
+        return True
+
+    def _run_cases(self, job: Job, ctx, spec: ExecSpec):
+        """
+        Dùng chung ctx (leaf cgroup, seccomp, workdir) cho mọi testcase, mỗi case chỉ spawn entry 1 lần.
+        Case sau không thấy file case trước ghi ra vì stdout/stderr nằm ở cases/<i>.out|err.
+        """
+        results = []
+        totals: dict[str, float] = {}
+        ooms = read_oom_kills(ctx.leaf)
+        for i, meta in enumerate(self.art.read_cases(job.id)):
+            if ctx.cancelled or ctx.disk_exceeded is not None:
+                break
+            case_spec = dataclasses.replace(
+                spec,
+                timeout_s=meta.get("time_limit_s") or spec.timeout_s,
+                stdin_path=self.art.case_path(job.id, i, "in"),
+                stdout_path=self.art.case_path(job.id, i, "out"),
+                stderr_path=self.art.case_path(job.id, i, "err"),
+            )
+            ctx.peak_memory_kb = ctx.cpu_s = None
+            rc = self.exec.run(ctx, case_spec)
+            for phase in ("spawn", "run", "logs"):
+                totals[phase] = totals.get(phase, 0.0) + ctx.timings.get(phase, 0.0)
+            ooms, prev_ooms = read_oom_kills(ctx.leaf), ooms
+            if ctx.disk_exceeded is not None:
+                verdict = CaseVerdict.RE  # bị kill vì ghi quá work_max_bytes (hoặc vừa vượt lúc thoát)
+            elif rc == 124:
+                verdict = CaseVerdict.TLE
+            elif rc != 0 and ooms > prev_ooms:
+                verdict = CaseVerdict.MLE
+            elif rc != 0:
+                verdict = CaseVerdict.RE
+            elif meta.get("has_expected") and not _same_output(self.art.case_path(job.id, i, "out"),
+                                                                self.art.case_path(job.id, i, "ans")):
+                verdict = CaseVerdict.WA
+            else:
+                verdict = CaseVerdict.OK
+            results.append(CaseResult(
+                job_id=job.id, idx=i, verdict=verdict, exit_code=rc,
+                time_ms=round(ctx.timings.get("run", 0.0) * 1000, 3),
+                cpu_ms=round(ctx.cpu_s * 1000, 3) if ctx.cpu_s is not None else None,
+                peak_memory_kb=ctx.peak_memory_kb,
+            ))
+            if verdict != CaseVerdict.OK and job.stop_on_failure:
+                break
+
+        ctx.timings.update(totals)  # timings của job = tổng mọi case
+        self.store.set_case_results(job.id, results)
+        failed = next((r for r in results if r.verdict != CaseVerdict.OK), None)
+        job.cases_passed = sum(r.verdict == CaseVerdict.OK for r in results)
+        job.output_truncated = ctx.output_truncated
+        job.finished_at = datetime.utcnow()
+        if failed is None:
+            job.status = JobStatus.FINISHED; job.exit_code = 0
+        else:
+            job.status = JobStatus.FAILED; job.exit_code = failed.exit_code
+            job.reason = f"case {failed.idx}: {failed.verdict.value}"
+            if ctx.disk_exceeded is not None:
+                job.reason = f"case {results[-1].idx}: {self._disk_reason(ctx)}"  # case vượt quota là case cuối đã chạy
 
     def logs(self, job_id: str) -> dict:
         return self.art.read_logs(job_id)
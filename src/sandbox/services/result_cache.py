@@ -0,0 +1,175 @@
+# src/sandbox/services/result_cache.py
+"""
+Cache kết quả theo nội dung (opt-in): nộp lại đúng từng byte -> trả exit code + log cũ, không chạy lại.
+
+Key = sha256(fingerprint môi trường + runner/entry + toàn bộ file trong workdir + stdin).
+Fingerprint gồm limits profile, policy seccomp, phiên bản rootfs/toolchain... -> đổi 1 thứ là key đổi,
+entry cũ không bao giờ được dùng lại và bị dọn ở lần put() kế tiếp của cùng runner (mỗi runner có
+fingerprint riêng, vd HOST mode gồm toolchain_id -> job C không làm mất entry của Python).
+
+Layout: <cache_dir>/<key[:2]>/<key>/{meta.json, stdout.log, stderr.log}
+"""
+from __future__ import annotations
+import hashlib, json, os, shutil, threading, time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Iterable, Optional
+
+from .artifact_store import LOG_STREAMS
+
+_digests: dict[str, tuple[tuple[int, int], str]] = {}  # path -> ((mtime_ns, size), sha256)
+_digests_lock = threading.Lock()
+
+
+def file_digest(path: Path) -> str:
+    """sha256 nội dung file, chỉ đọc lại khi mtime/size đổi; file không tồn tại -> "-"."""
+    path = Path(path)
+    try:
+        st = path.stat()
+    except OSError:
+        return "-"
+    sig = (st.st_mtime_ns, st.st_size)
+    with _digests_lock:
+        memo = _digests.get(str(path))
+        if memo and memo[0] == sig:
+            return memo[1]
+    digest = hashlib.sha256(path.read_bytes()).hexdigest()
+    with _digests_lock:
+        _digests[str(path)] = (sig, digest)
+    return digest
+
+
+def result_key(fingerprint: str, runner: str, entry: str, workdir: Path,
+               stdin: bytes = b"", skip: Iterable[str] = ()) -> str:
+    h = hashlib.sha256()
+    for part in (fingerprint, runner, entry):
+        h.update(part.encode() + b"\0")
+    h.update(hashlib.sha256(stdin).digest())
+    hash_tree(h, workdir, skip)
+    return h.hexdigest()
+
+
+def hash_tree(h, root: Path, skip: Iterable[str] = ()):
+    """Băm tên + nội dung mọi file dưới root (thứ tự cố định); skip theo tên file/thư mục cấp 1."""
+    skip = set(skip)
+    for p in sorted(root.rglob("*")):
+        rel = p.relative_to(root).as_posix()
+        if rel.split("/", 1)[0] in skip or not p.is_file():
+            continue
+        h.update(rel.encode() + b"\0")
+        h.update(p.read_bytes())
+        h.update(b"\0")
+
+
+class ResultCache:
+    def __init__(self, cache_dir: Path, max_bytes: int = 256 << 20, max_entries: int = 10000):
+        self.cache_dir = Path(cache_dir)
+        self.max_bytes = max(0, int(max_bytes))
+        self.max_entries = max(1, int(max_entries))
+        self._lock = threading.Lock()
+        self._lru: "OrderedDict[str, tuple[int, str, str]]" = OrderedDict()  # key -> (bytes, fingerprint, runner)
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._fingerprints: dict[str, str] = {}  # runner -> fingerprint của lần put() gần nhất
+        self._load()
+
+    def _entry(self, key: str) -> Path:
+        return self.cache_dir / key[:2] / key
+
+    def _load(self):
+        # dựng lại thứ tự LRU từ mtime của meta.json (get() có touch)
+        found = []
+        for meta in self.cache_dir.glob("*/*/meta.json"):
+            try:
+                m = json.loads(meta.read_text())
+                found.append((meta.stat().st_mtime, meta.parent.name, int(m.get("bytes", 0)),
+                              m.get("fingerprint", ""), m.get("runner", "")))
+            except (OSError, ValueError):
+                shutil.rmtree(meta.parent, ignore_errors=True)
+        for _, key, size, fp, runner in sorted(found):
+            self._lru[key] = (size, fp, runner)
+            self._bytes += size
+
+    # ------------ API ------------
+
+    def get(self, key: str, workdir: Path) -> Optional[dict]:
+        """Hit: chép log vào workdir, trả về meta (exit_code, status, output_truncated)."""
+        with self._lock:
+            if key not in self._lru:
+                self.misses += 1
+                return None
+            self._lru.move_to_end(key)
+        d = self._entry(key)
+        try:
+            meta = json.loads((d / "meta.json").read_text())
+            for stream in LOG_STREAMS:
+                shutil.copyfile(d / f"{stream}.log", workdir / f"{stream}.log")
+            os.utime(d / "meta.json")
+        except (OSError, ValueError):
+            self._drop(key)
+            with self._lock:
+                self.misses += 1
+            return None
+        with self._lock:
+            self.hits += 1
+        return meta
+
+    def put(self, key: str, fingerprint: str, workdir: Path, result: dict, runner: str = ""):
+        d = self._entry(key)
+        tmp = d.with_name(f".{key}.tmp{os.getpid()}.{threading.get_ident()}")
+        try:
+            tmp.mkdir(parents=True, exist_ok=True)
+            size = 0
+            for stream in LOG_STREAMS:
+                src = workdir / f"{stream}.log"
+                if src.exists():
+                    shutil.copyfile(src, tmp / f"{stream}.log")
+                else:
+                    (tmp / f"{stream}.log").touch()
+                size += (tmp / f"{stream}.log").stat().st_size
+            meta = {**result, "fingerprint": fingerprint, "runner": runner, "bytes": size, "created": time.time()}
+            (tmp / "meta.json").write_text(json.dumps(meta))
+            if d.exists():
+                shutil.rmtree(tmp, ignore_errors=True)  # job khác vừa ghi cùng key
+                return
+            os.rename(tmp, d)
+        except OSError:
+            shutil.rmtree(tmp, ignore_errors=True)
+            return
+        with self._lock:
+            self._lru[key] = (size, fingerprint, runner)
+            self._bytes += size
+        self._evict(fingerprint, runner)
+
+    def _evict(self, fingerprint: str, runner: str):
+        with self._lock:
+            drop = []
+            if fingerprint != self._fingerprints.get(runner):
+                # limits/policy/rootfs/toolchain của runner này đã đổi: entry cũ của nó không còn hit được -> bỏ
+                drop = [k for k, (_, fp, r) in self._lru.items() if r == runner and fp != fingerprint]
+                self._fingerprints[runner] = fingerprint
+            dropped = set(drop)
+            n = len(self._lru) - len(drop)
+            total = self._bytes - sum(self._lru[k][0] for k in drop)
+            for k, (size, _, _) in self._lru.items():  # cũ nhất trước, mọi runner
+                if n <= self.max_entries and (not self.max_bytes or total <= self.max_bytes):
+                    break
+                if k in dropped:
+                    continue
+                drop.append(k); n -= 1; total -= size
+            self.evictions += len(drop)
+        for k in drop:
+            self._drop(k)
+
+    def _drop(self, key: str):
+        with self._lock:
+            size, _, _ = self._lru.pop(key, (0, "", ""))
+            self._bytes -= size
+        shutil.rmtree(self._entry(key), ignore_errors=True)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"entries": len(self._lru), "bytes": self._bytes, "hits": self.hits,
+                    "misses": self.misses, "evictions": self.evictions}
@@ -0,0 +1,263 @@
+# src/sandbox/services/scheduler.py
+from __future__ import annotations
+import itertools, threading, time, traceback
+from datetime import datetime
+from typing import Dict, Optional, Set
+
+from .admission import AdmissionController, Saturated, job_cost
+from .fair_queue import FairQueue
+from .job_store import ACTIVE, JobStatus, JobStore
+from .orchestrator import Orchestrator
+
+
+class QueueFull(Saturated):
+    pass
+
+
+class JobScheduler:
+    """
+    Hàng đợi job + pool worker cố định. API chỉ enqueue rồi trả về ngay.
+    Worker lo phần setup (compile, prepare, spawn) qua Orchestrator.run_async; chờ exit + deadline nằm ở
+    Supervisor nên số job chạy cùng lúc (max_running) không bị giới hạn bởi số worker.
+    Thứ tự lấy job: priority class trước, fair share theo tenant trong class (FairQueue).
+    """
+
+    def __init__(self, orc: Orchestrator, store: JobStore, *, workers: int = 4, max_queue: int = 0,
+                 max_running: int = 0, admission: Optional[AdmissionController] = None):
+        self.orc = orc
+        self.store = store
+        self.workers = max(1, int(workers))
+        # không có supervisor thì mỗi job chiếm 1 worker tới khi xong -> chạy song song tối đa = workers
+        async_ok = orc.supervisor is not None and orc.supervisor.available
+        self.max_running = max(1, int(max_running)) if (async_ok and max_running) else self.workers
+        self._slots = threading.Semaphore(self.max_running)
+        self.max_queue = max(0, int(max_queue))
+        self.classes = list(orc.s.priority_classes)
+        self.default_class = orc.s.priority_default
+        self._q = FairQueue(self.classes, orc.s.tenant_weights)
+        self._lock = threading.Lock()
+        self._pending: Dict[str, str] = {}  # đã enqueue, chưa có worker nhận -> class
+        self._running: Set[str] = set()   # đang chạy trong worker
+        self._skip: Set[str] = set()      # đã cancel khi còn trong hàng đợi -> worker bỏ qua
+        self._enqueued_at: Dict[str, float] = {}  # monotonic lúc enqueue -> queue_wait của job
+        self._reserved: Dict[str, int] = {}  # enqueue() đang reset DB, chưa đưa vào FairQueue -> vé
+        self._tickets = itertools.count()
+        self._threads: list[threading.Thread] = []
+        self.admission = admission
+
+    # ------------ lifecycle ------------
+
+    def start(self):
+        if self._threads:
+            return
+        for i in range(self.workers):
+            t = threading.Thread(target=self._worker, name=f"sbx-worker-{i}", daemon=True)
+            t.start()
+            self._threads.append(t)
+
+    def stop(self, timeout: float = 5.0):
+        if self.admission is not None:
+            self.admission.close()  # worker đang bị hoãn thì thoát luôn
+        self._q.close()
+        for _ in self._threads:
+            self._slots.release()  # worker đang chờ chỗ chạy cũng thoát được
+        for t in self._threads:
+            t.join(timeout=timeout)
+        self._threads = []
+
+    # ------------ API ------------
+
+    def enqueue(self, job_id: str, *, fresh: bool = False, priority: Optional[str] = None,
+                tenant: Optional[str] = None) -> bool:
+        """
+        Trả về False nếu job đã nằm trong hàng đợi / đang chạy.
+        fresh=True: job vừa tạo (đã QUEUED trong DB) -> bỏ qua bước đọc/reset DB,
+        priority/tenant lấy từ tham số thay vì từ job.
+        Raise Saturated (QueueFull là 1 trường hợp) nếu admission control từ chối.
+        Đọc/ghi DB nằm ngoài self._lock: lock chỉ giữ cho phần đụng tới hàng đợi trong RAM.
+        """
+        if self.is_active(job_id):
+            return False
+        job = None if fresh else self.store.get(job_id)
+        if job is not None:
+            priority, tenant = job.priority, job.tenant
+        cls = self._class(priority)
+        with self._lock:
+            if job_id in self._pending or job_id in self._running:
+                return False
+            if self.max_queue and self._q.qsize() >= self.max_queue:
+                raise QueueFull(f"queue is full ({self.max_queue})", retry_after_s=self._estimate_wait(cls))
+            if self.admission is not None:
+                self.admission.check(self._ahead(cls), *self._cost(), self.max_running)
+            self._pending[job_id] = cls  # giữ chỗ: enqueue/cancel khác thấy job đã nằm trong hàng đợi
+            ticket = self._reserved[job_id] = next(self._tickets)
+        self.orc.clear_cancel(job_id)
+
+        # reset trạng thái TRƯỚC khi đưa vào queue, tránh ghi đè RUNNING của worker
+        if job and job.status != JobStatus.QUEUED:
+            # chạy lại job cũ: reset trạng thái về QUEUED
+            if self.orc.artifacts is not None:
+                self.orc.artifacts.hold(job_id)
+            job.status = JobStatus.QUEUED
+            job.started_at = None; job.finished_at = None
+            job.exit_code = None; job.reason = None; job.cases_passed = None
+            self.store.update(job)
+        self.orc.events.publish(job_id, JobStatus.QUEUED)
+        with self._lock:
+            if self._reserved.get(job_id) != ticket:
+                return True  # bị cancel rồi enqueue lại trong lúc reset: lần enqueue sau lo tiếp
+            del self._reserved[job_id]
+            cancelled = job_id not in self._pending
+            if cancelled:
+                self._skip.discard(job_id)  # chưa vào FairQueue -> worker không gặp job này
+            else:
+                self._enqueued_at[job_id] = time.monotonic()
+                self._q.put(job_id, cls, tenant or "default")
+        if cancelled:
+            # cancel() chen vào giữa lúc reset: ghi lại KILLED (update QUEUED ở trên có thể đã đè lên)
+            self._mark(job_id, JobStatus.KILLED, "cancelled")
+        return True
+
+    def cancel(self, job_id: str) -> str:
+        """
+        "running": giết leaf của job (cgroup.kill), worker ghi KILLED khi run() trả về.
+        "queued": bỏ khỏi hàng đợi và ghi KILLED ngay (kể cả job QUEUED chưa từng enqueue).
+        "untracked": DB ghi RUNNING nhưng không có process nào của service này chạy job
+        (vd còn lại sau restart) -> không ghi gì. Job đã xong: trả về status trong DB, không ghi gì.
+        """
+        with self._lock:
+            if job_id in self._running:
+                self.orc.cancel(job_id)
+                return "running"
+            queued = self._pending.pop(job_id, None) is not None
+            if queued:
+                self._enqueued_at.pop(job_id, None)
+                self._skip.add(job_id)
+        if not queued:
+            job = self.store.get(job_id)
+            if job is not None and job.status not in ACTIVE:
+                return job.status.value
+            if job is not None and job.status == JobStatus.RUNNING:
+                # vd /run đồng bộ: chạy trong orchestrator nhưng không qua worker
+                return "running" if self.orc.cancel(job_id, if_running=True) else "untracked"
+        self._mark(job_id, JobStatus.KILLED, "cancelled")
+        return "queued"
+
+    def _take(self, job_id: str) -> bool:
+        with self._lock:
+            if job_id in self._skip:
+                self._skip.discard(job_id)
+                return False
+            return True
+
+    def is_active(self, job_id: str) -> bool:
+        with self._lock:
+            return job_id in self._pending or job_id in self._running
+
+    def _class(self, priority: Optional[str]) -> str:
+        """Class theo tập class của FairQueue (dựng lúc khởi động), không theo snapshot settings hiện tại."""
+        return priority if priority in self.classes else self.default_class
+
+    def _cost(self) -> tuple[int, float]:
+        """(bytes, cores) giữ chỗ cho 1 job, theo limits "default" của snapshot hiện tại."""
+        return job_cost(self.orc.s.profile_limits("default"))
+
+    def _ahead(self, cls: str) -> int:
+        """Job chạy trước 1 job mới của class `cls`: đang chạy + đang chờ ở class bằng/cao hơn."""
+        rank = self.classes.index(cls)
+        return len(self._running) + sum(1 for c in self._pending.values() if self.classes.index(c) <= rank)
+
+    def _estimate_wait(self, cls: Optional[str] = None) -> float:
+        ahead = self._ahead(cls) if cls else len(self._pending) + len(self._running)
+        if self.admission is not None:
+            return self.admission.estimate_wait(ahead, *self._cost(), self.max_running)
+        return float(ahead // self.max_running)  # không có số liệu thời gian chạy -> coi ~1s/job
+
+    def estimate_wait(self, priority: Optional[str] = None) -> float:
+        with self._lock:
+            return self._estimate_wait(self._class(priority))
+
+    def stats(self) -> dict:
+        with self._lock:
+            st = {
+                "workers": self.workers,
+                "max_running": self.max_running,
+                "queue_depth": len(self._pending),
+                "in_flight": len(self._running),
+                "max_queue": self.max_queue,
+                "estimated_wait_s": self._estimate_wait(),
+                "classes": {c: {"queue_depth": n, "estimated_wait_s": self._estimate_wait(c)}
+                            for c, n in self._q.depth().items()},
+            }
+        m = self.orc.metrics
+        for c, cs in st["classes"].items():
+            cs["queue_wait_s"] = m.class_queue_wait.summary(**{"class": c})
+            cs["run_s"] = m.class_run.summary(**{"class": c})
+        if self.admission is not None:
+            st["admission"] = self.admission.stats()
+        return st
+
+    # ------------ worker ------------
+
+    def _worker(self):
+        while True:
+            # giữ chỗ chạy TRƯỚC khi lấy job -> job được nhận là job ưu tiên nhất lúc có chỗ trống
+            self._slots.acquire()
+            item = self._q.get()
+            if item is None:
+                return
+            job_id, cls, _tenant = item
+            if not self._take(job_id):
+                self._slots.release()
+                continue
+            # hết ngân sách / PSI cao -> job vẫn ở _pending (QUEUED) tới khi được nhận;
+            # rank: job class cao đang chờ thì class thấp không được nhận trước
+            rank = self.classes.index(cls)
+            cost = self._cost()  # giữ nguyên tới _done dù limits reload giữa chừng
+            if self.admission is not None and not self.admission.acquire(*cost, rank=rank):
+                return
+            with self._lock:
+                if job_id in self._skip:  # bị cancel trong lúc admission hoãn
+                    self._skip.discard(job_id)
+                    if self.admission is not None:
+                        self.admission.release(*cost)
+                    self._slots.release()
+                    continue
+                self._pending.pop(job_id, None)
+                self._running.add(job_id)
+                t_enq = self._enqueued_at.pop(job_id, None)
+            t0 = time.monotonic()
+            if t_enq is not None:
+                self.orc.metrics.class_queue_wait.observe(t0 - t_enq, **{"class": cls})
+            # có supervisor: hàm trả về ngay sau spawn, _done chạy trên thread hoàn tất khi job thoát
+            self.orc.run_async(job_id, queue_wait_s=t0 - t_enq if t_enq is not None else None,
+                               done=lambda exc, job_id=job_id, cls=cls, t0=t0, cost=cost:
+                                   self._done(job_id, cls, t0, cost, exc))
+
+    def _done(self, job_id: str, cls: str, t0: float, cost: tuple[int, float], exc: BaseException | None):
+        try:
+            if exc is not None:
+                print(f"Error while running job {job_id}: {exc}")
+                traceback.print_exception(exc)
+                self._mark(job_id, JobStatus.FAILED, str(exc))
+        finally:
+            run_s = time.monotonic() - t0
+            self.orc.metrics.class_run.observe(run_s, **{"class": cls})
+            if self.admission is not None:
+                self.admission.release(*cost, run_s=run_s)
+            with self._lock:
+                self._running.discard(job_id)
+            self._slots.release()
+
+    def _mark(self, job_id: str, status: JobStatus, reason: str):
+        job = self.store.get(job_id)
+        if not job:
+            return
+        job.status = status
+        job.reason = reason
+        job.finished_at = datetime.utcnow()
+        self.store.update(job)
+        self.orc.events.publish(job_id, job.status)
+        self.orc.metrics.jobs_finished.inc(status=job.status.value)
+        if self.orc.artifacts is not None:
+            self.orc.artifacts.job_done(job_id, job.status.value, job.entry)
@@ -1,8 +1,8 @@
 from __future__ import annotations
 
-import os
+import hashlib, os, threading, traceback
 from pathlib import Path
-from typing import Any, Dict
+from typing import Any, Dict, List, Optional
 
 import yaml
 from pydantic import Field
@@ -18,6 +18,13 @@ class Settings(BaseSettings):
     enable_loopback: bool = False
     noexec_work: bool = True
     bind_full_etc: bool = False
+    cgroup_launcher: str = "preexec"  # "preexec" | "attach"
+    rootfs_overlay: bool = True  # CHROOT mode: overlay (image read-only + upper tmpfs mỗi job) thay cho bash + bind mount
+    rootfs_upper_size: str = "64m"  # quota tmpfs upper của mỗi job (size= của tmpfs)
+    rootfs_scratch_dir: Path = Path("/srv/sbx/overlay")  # mountpoint tmpfs trong mount ns của job, trên host luôn rỗng
+    stdout_max_bytes: int = 1 << 20  # cap mỗi stream log, 0 = không giới hạn
+    stderr_max_bytes: int = 1 << 20
+    work_max_bytes: int = 64 << 20  # byte job ghi thêm vào workdir (/work) khi đang chạy, vượt -> kill; 0 = không giới hạn
 
     # ---- config files ----
     limits_file: Path = Path("conf/limits.yaml")
@@ -31,14 +38,113 @@ class Settings(BaseSettings):
     # ---- seccomp ----
     seccomp_enabled: bool = False
     seccomp_policy: Path = Path("conf/seccomp.min.yaml")
+    seccomp_cache_dir: Path = Path("/srv/sbx/seccomp-cache")  # blob BPF đã compile
 
+    # ---- scheduler ----
+    scheduler_workers: int = 4
+    scheduler_max_queue: int = 0  # 0 = không giới hạn
+    scheduler_max_running: int = 256  # job chạy cùng lúc (worker chỉ lo setup/spawn), 0 = bằng số worker
+    supervisor_enabled: bool = True  # chờ exit/deadline của mọi job trên 1 vòng lặp epoll (pidfd)
+    supervisor_completion_threads: int = 4  # thread hoàn tất job (cắt log, teardown, ghi DB)
 
-def load_settings() -> Settings:
+    # ---- pool leaf cgroup dựng sẵn ----
+    cgroup_pool_enabled: bool = False
+    cgroup_pool_size: int = 8
+    cgroup_pool_low_watermark: int = 2
+    cgroup_pool_profiles: Dict[str, int] = {}  # profile -> size riêng
+
+    # ---- pool namespace user/net/ipc/uts dựng sẵn (CHROOT mode) ----
+    ns_pool_enabled: bool = False
+    ns_pool_size: int = 8
+    ns_pool_low_watermark: int = 2
+    ns_pool_max_idle_s: float = 300.0  # bộ nằm lâu hơn thì bỏ, dựng bộ mới
+
+    # ---- vòng đời artifact trong jobs_dir (GC, nén log, quota) ----
+    artifacts_enabled: bool = False
+    artifacts_retention: Dict[str, float] = {}  # status (hoặc "default") -> giây giữ sau khi xong, 0 = giữ mãi
+    artifacts_max_total_bytes: int = 0  # cả jobs_dir; vượt thì bỏ job xong sớm nhất, 0 = không giới hạn
+    artifacts_job_max_bytes: int = 0    # 1 job sau khi xong; vượt thì bỏ file job tự ghi, 0 = không giới hạn
+    artifacts_compress_logs: bool = True
+    artifacts_settle_s: float = 60.0    # chờ sau khi job xong rồi mới nén/cắt (client còn đang đọc log)
+    artifacts_batch_size: int = 500     # thư mục mỗi lượt quét/xoá
+    artifacts_interval_s: float = 30.0
+
+    # ---- zygote Python (opt-in) ----
+    zygote_enabled: bool = False
+    zygote_pool_size: int = 2
+    zygote_recycle_after: int = 200
+
+    # ---- cache kết quả theo nội dung (opt-in) ----
+    result_cache_enabled: bool = False
+    result_cache_dir: Path = Path("/srv/sbx/result-cache")
+    result_cache_max_bytes: int = 256 << 20
+    result_cache_max_entries: int = 10000
+
+    # ---- compile (C / Java) ----
+    compile_timeout_s: int = 30
+    compile_cache_enabled: bool = True
+    compile_cache_dir: Path = Path("/srv/sbx/compile-cache")
+    compile_cache_max_entries: int = 2000
+    c_compiler: str = "/usr/bin/gcc"
+    c_flags: List[str] = ["-O2", "-std=c17", "-pipe"]
+    javac: str = "/usr/bin/javac"
+    java: str = "/usr/bin/java"
+    java_cds_dir: Path = Path("/srv/sbx/java-cds")  # class-data archive dùng chung (CHROOT: trong rootfs), "" = tắt
+
+    # ---- priority class + fair share theo tenant ----
+    priority_classes: Dict[str, int] = {"interactive": 1000, "batch": 100}  # thứ tự = độ ưu tiên, giá trị = cpu.weight
+    priority_default: str = "batch"
+    tenant_weights: Dict[str, float] = {}  # tenant -> trọng số fair share (không có = 1)
+
+    # ---- admission control ----
+    admission_enabled: bool = False
+    admission_memory_budget: int = 0  # bytes, 0 = 80% MemTotal
+    admission_cpu_budget: float = 0  # số core, 0 = os.cpu_count()
+    admission_cpu_some_max: float = 0  # % avg10 cpu.pressure "some" -> hoãn job mới, 0 = bỏ qua
+    admission_memory_some_max: float = 0
+    admission_memory_full_reject: float = 0  # % avg10 memory.pressure "full" -> 429
+    admission_max_wait_s: float = 0  # thời gian chờ ước lượng vượt ngưỡng -> 429, 0 = không giới hạn
+
+    # ---- job store (SQLite) ----
+    store_url: str = "sqlite:///./sandbox.db"
+    store_wal: bool = True
+    store_synchronous: str = "NORMAL"
+    store_busy_timeout_ms: int = 5000
+    store_coalesce_ms: float = 5  # gom update trạng thái trong cửa sổ này thành 1 commit, 0 = ghi ngay
+    store_active_cache: bool = True  # job QUEUED/RUNNING đọc từ RAM
+
+    # ---- hot reload ----
+    reload_enabled: bool = True
+    reload_poll_s: float = 2.0  # chu kỳ stat() sandbox.yaml + limits.yaml
+
+    version: str = ""  # sha256 (12 hex) của toàn bộ giá trị đã merge, gán trong load_settings()
+
+    def profile_limits(self, name: str = "default") -> Dict[str, Any]:
+        """limits.yaml gốc là profile "default"; mục `profiles.<name>` ghi đè từng nhóm (memory/pids/cpu)."""
+        base = {k: v for k, v in self.limits.items() if k != "profiles"}
+        if name == "default":
+            return base
+        over = (self.limits.get("profiles") or {}).get(name) or {}
+        merged = dict(base)
+        for k, v in over.items():
+            merged[k] = {**(base.get(k) or {}), **v} if isinstance(v, dict) else v
+        return merged
+
+
+def config_path() -> Path:
+    return Path(os.environ.get("SANDBOX_CONF", "conf/sandbox.yaml"))
+
+
+def load_settings(strict: bool = False) -> Settings:
+    """
+    strict=True (hot reload): limits.yaml lỗi / không phải dict -> raise thay vì lặng lẽ dùng limits rỗng,
+    cấu hình sai kiểu/giá trị -> raise ValueError. Snapshot đang dùng được giữ nguyên.
+    """
     # 0) Nạp base từ env SBX_*
     s = Settings()
 
     # 1) Đọc conf/sandbox.yaml (hoặc SANDBOX_CONF)
-    sbx_yaml = os.environ.get("SANDBOX_CONF", "conf/sandbox.yaml")
+    sbx_yaml = config_path()
     try:
         with open(sbx_yaml, "r") as f:
             data = yaml.safe_load(f) or {}
@@ -56,6 +162,62 @@ def load_settings() -> Settings:
     if not isinstance(sec, dict):
         sec = {}
 
+    output = defaults.get("output") or {}
+    if not isinstance(output, dict):
+        output = {}
+
+    sched = data.get("scheduler") or {}
+    if not isinstance(sched, dict):
+        sched = {}
+
+    pool = data.get("cgroup_pool") or {}
+    if not isinstance(pool, dict):
+        pool = {}
+
+    nsp = data.get("ns_pool") or {}
+    if not isinstance(nsp, dict):
+        nsp = {}
+
+    arts = data.get("artifacts") or {}
+    if not isinstance(arts, dict):
+        arts = {}
+
+    zyg = data.get("zygote") or {}
+    if not isinstance(zyg, dict):
+        zyg = {}
+
+    rcache = data.get("result_cache") or {}
+    if not isinstance(rcache, dict):
+        rcache = {}
+
+    comp = data.get("compile") or {}
+    if not isinstance(comp, dict):
+        comp = {}
+    comp_c = comp.get("c") or {}
+    comp_java = comp.get("java") or {}
+
+    prio = data.get("priority") or {}
+    if not isinstance(prio, dict):
+        prio = {}
+    prio_classes = prio.get("classes") or {}
+
+    adm = data.get("admission") or {}
+    if not isinstance(adm, dict):
+        adm = {}
+    adm_psi = adm.get("psi") or {}
+
+    store = data.get("store") or {}
+    if not isinstance(store, dict):
+        store = {}
+
+    ovl = data.get("rootfs_overlay") or {}
+    if not isinstance(ovl, dict):
+        ovl = {}
+
+    reload = data.get("reload") or {}
+    if not isinstance(reload, dict):
+        reload = {}
+
     # 2) Merge vào Settings (dùng đúng kiểu Path/bool/int)
     s = s.model_copy(
         update={
@@ -65,8 +227,72 @@ def load_settings() -> Settings:
             "enable_loopback": bool(defaults.get("enable_loopback", s.enable_loopback)),
             "noexec_work": bool(defaults.get("noexec_work", s.noexec_work)),
             "bind_full_etc": bool(defaults.get("bind_full_etc", s.bind_full_etc)),
+            "cgroup_launcher": str(defaults.get("cgroup_launcher", s.cgroup_launcher)),
+            "rootfs_overlay": bool(ovl.get("enabled", s.rootfs_overlay)),
+            "rootfs_upper_size": str(ovl.get("upper_size", s.rootfs_upper_size)),
+            "rootfs_scratch_dir": Path(str(ovl.get("scratch_dir", s.rootfs_scratch_dir))),
+            "stdout_max_bytes": int(output.get("stdout_max_bytes", s.stdout_max_bytes)),
+            "stderr_max_bytes": int(output.get("stderr_max_bytes", s.stderr_max_bytes)),
+            "work_max_bytes": int(defaults.get("work_max_bytes", s.work_max_bytes)),
             "seccomp_enabled": bool(sec.get("enabled", s.seccomp_enabled)),
             "seccomp_policy": Path(str(sec.get("policy", s.seccomp_policy))),
+            "seccomp_cache_dir": Path(str(sec.get("cache_dir", s.seccomp_cache_dir))),
+            "scheduler_workers": int(sched.get("workers", s.scheduler_workers)),
+            "scheduler_max_queue": int(sched.get("max_queue", s.scheduler_max_queue)),
+            "scheduler_max_running": int(sched.get("max_running", s.scheduler_max_running)),
+            "supervisor_enabled": bool(sched.get("supervisor", s.supervisor_enabled)),
+            "supervisor_completion_threads": int(sched.get("completion_threads", s.supervisor_completion_threads)),
+            "cgroup_pool_enabled": bool(pool.get("enabled", s.cgroup_pool_enabled)),
+            "cgroup_pool_size": int(pool.get("size", s.cgroup_pool_size)),
+            "cgroup_pool_low_watermark": int(pool.get("low_watermark", s.cgroup_pool_low_watermark)),
+            "cgroup_pool_profiles": {str(k): int(v) for k, v in (pool.get("profiles") or {}).items()},
+            "ns_pool_enabled": bool(nsp.get("enabled", s.ns_pool_enabled)),
+            "ns_pool_size": int(nsp.get("size", s.ns_pool_size)),
+            "ns_pool_low_watermark": int(nsp.get("low_watermark", s.ns_pool_low_watermark)),
+            "ns_pool_max_idle_s": float(nsp.get("max_idle_s", s.ns_pool_max_idle_s)),
+            "artifacts_enabled": bool(arts.get("enabled", s.artifacts_enabled)),
+            "artifacts_retention": {str(k): float(v) for k, v in (arts.get("retention") or {}).items()},
+            "artifacts_max_total_bytes": int(arts.get("max_total_bytes", s.artifacts_max_total_bytes)),
+            "artifacts_job_max_bytes": int(arts.get("job_max_bytes", s.artifacts_job_max_bytes)),
+            "artifacts_compress_logs": bool(arts.get("compress_logs", s.artifacts_compress_logs)),
+            "artifacts_settle_s": float(arts.get("settle_s", s.artifacts_settle_s)),
+            "artifacts_batch_size": int(arts.get("batch_size", s.artifacts_batch_size)),
+            "artifacts_interval_s": float(arts.get("interval_s", s.artifacts_interval_s)),
+            "zygote_enabled": bool(zyg.get("enabled", s.zygote_enabled)),
+            "zygote_pool_size": int(zyg.get("pool_size", s.zygote_pool_size)),
+            "zygote_recycle_after": int(zyg.get("recycle_after", s.zygote_recycle_after)),
+            "result_cache_enabled": bool(rcache.get("enabled", s.result_cache_enabled)),
+            "result_cache_dir": Path(str(rcache.get("dir", s.result_cache_dir))),
+            "result_cache_max_bytes": int(rcache.get("max_bytes", s.result_cache_max_bytes)),
+            "result_cache_max_entries": int(rcache.get("max_entries", s.result_cache_max_entries)),
+            "compile_timeout_s": int(comp.get("timeout_s", s.compile_timeout_s)),
+            "compile_cache_enabled": bool(comp.get("cache_enabled", s.compile_cache_enabled)),
+            "compile_cache_dir": Path(str(comp.get("cache_dir", s.compile_cache_dir))),
+            "compile_cache_max_entries": int(comp.get("cache_max_entries", s.compile_cache_max_entries)),
+            "c_compiler": str(comp_c.get("cc", s.c_compiler)),
+            "c_flags": [str(x) for x in comp_c.get("flags", s.c_flags)],
+            "javac": str(comp_java.get("javac", s.javac)),
+            "java": str(comp_java.get("java", s.java)),
+            "java_cds_dir": Path(str(comp_java.get("cds_dir", s.java_cds_dir))),
+            "priority_classes": ({str(k): int((v or {}).get("cpu_weight", 100)) for k, v in prio_classes.items()}
+                                 or s.priority_classes),
+            "priority_default": str(prio.get("default_class", s.priority_default)),
+            "tenant_weights": {str(k): float(v) for k, v in (prio.get("tenant_weights") or {}).items()},
+            "admission_enabled": bool(adm.get("enabled", s.admission_enabled)),
+            "admission_memory_budget": int(adm.get("memory_budget", s.admission_memory_budget)),
+            "admission_cpu_budget": float(adm.get("cpu_budget", s.admission_cpu_budget)),
+            "admission_cpu_some_max": float(adm_psi.get("cpu_some_max", s.admission_cpu_some_max)),
+            "admission_memory_some_max": float(adm_psi.get("memory_some_max", s.admission_memory_some_max)),
+            "admission_memory_full_reject": float(adm_psi.get("memory_full_reject", s.admission_memory_full_reject)),
+            "admission_max_wait_s": float(adm.get("max_wait_s", s.admission_max_wait_s)),
+            "store_url": str(store.get("url", s.store_url)),
+            "store_wal": bool(store.get("wal", s.store_wal)),
+            "store_synchronous": str(store.get("synchronous", s.store_synchronous)).upper(),
+            "store_busy_timeout_ms": int(store.get("busy_timeout_ms", s.store_busy_timeout_ms)),
+            "store_coalesce_ms": float(store.get("coalesce_ms", s.store_coalesce_ms)),
+            "store_active_cache": bool(store.get("active_cache", s.store_active_cache)),
+            "reload_enabled": bool(reload.get("enabled", s.reload_enabled)),
+            "reload_poll_s": float(reload.get("poll_s", s.reload_poll_s)),
         }
     )
 
@@ -77,10 +303,139 @@ def load_settings() -> Settings:
             limits_raw = yaml.safe_load(s.limits_file.read_text()) or {}
             if isinstance(limits_raw, dict):
                 limits = limits_raw
+            elif strict:
+                raise ValueError(f"{s.limits_file}: expected a mapping")
     except Exception:
+        if strict:
+            raise
         # Không làm app sập vì limits lỗi — giữ mặc định rỗng
         limits = {}
 
     s = s.model_copy(update={"limits": limits})
-    return s
+    if strict:
+        _validate(s)
+    return _stamp(s)
+
+
+def _stamp(s: Settings) -> Settings:
+    s = s.model_copy(update={"version": ""})
+    return s.model_copy(update={"version": hashlib.sha256(s.model_dump_json().encode()).hexdigest()[:12]})
+
+
+# Dựng thành state lúc khởi động (cgroup sbx/class-<name>, FairQueue của scheduler) -> reload giữ giá trị cũ
+STARTUP_ONLY = ("priority_classes", "priority_default", "tenant_weights")
+
+
+def _validate(s: Settings):
+    """model_copy(update=...) bỏ qua validate của pydantic -> kiểm tra lại cả model + vài ràng buộc chéo."""
+    Settings.model_validate(s.model_dump())
+    if s.cgroup_launcher not in ("preexec", "attach"):
+        raise ValueError(f"defaults.cgroup_launcher: unknown launcher {s.cgroup_launcher!r}")
+    if s.default_timeout_s <= 0 or s.compile_timeout_s <= 0:
+        raise ValueError("timeout_s must be > 0")
+    if not s.priority_classes or s.priority_default not in s.priority_classes:
+        raise ValueError(f"priority.default_class {s.priority_default!r} is not a declared class")
+
+
+class LiveSettings:
+    """
+    Snapshot Settings dùng chung cả service: parse + validate 1 lần, mọi nơi đọc `.current`.
+
+    - Thread nền stat() sandbox.yaml + limits.yaml mỗi reload_poll_s; đổi (mtime/size/inode) -> load_settings(strict)
+      rồi thay cả object bằng 1 phép gán -> reader thấy snapshot cũ hoặc mới, không bao giờ nửa nọ nửa kia.
+    - Job lấy snapshot 1 lần lúc bắt đầu và dùng nó tới cuối (timeout, limits, seccomp...) dù có reload giữa chừng.
+    - File lỗi: giữ snapshot cũ, tăng reload_errors. Chỉ giá trị đọc theo job được áp dụng nóng;
+      pool, worker, rootfs, store... dựng lúc khởi động, đổi phải restart; các key trong STARTUP_ONLY
+      (priority class, tenant weight) reload giữ nguyên giá trị cũ.
+    """
+
+    def __init__(self, snapshot: Optional[Settings] = None):
+        snap = snapshot or load_settings()
+        self._cur: tuple[Settings, int] = (snap, 1)  # (snapshot, generation): đổi cả cặp bằng 1 phép gán
+        self._sig = self._signature(snap)
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.reloads = 0
+        self.reload_errors = 0
+        self.last_error: Optional[str] = None
+
+    @property
+    def current(self) -> Settings:
+        return self._cur[0]
+
+    @property
+    def generation(self) -> int:
+        """+1 mỗi lần swap snapshot (1 = chưa reload)."""
+        return self._cur[1]
+
+    def snapshot(self) -> tuple[Settings, int]:
+        return self._cur
+
+    @staticmethod
+    def _signature(s: Settings) -> tuple:
+        sig = []
+        for path in (config_path(), s.limits_file):
+            try:
+                st = os.stat(path)
+                sig.append((str(path), st.st_mtime_ns, st.st_size, st.st_ino))
+            except OSError:
+                sig.append((str(path), None))
+        return tuple(sig)
+
+    def check(self) -> bool:
+        """True nếu đã swap snapshot mới."""
+        if self._signature(self.current) == self._sig:
+            return False
+        return self.reload()
+
+    def reload(self) -> bool:
+        with self._lock:
+            old, gen = self._cur
+            sig = self._signature(old)
+            try:
+                new = load_settings(strict=True)
+            except Exception as e:
+                self._sig = sig  # không thử lại tới khi file đổi tiếp
+                self.reload_errors += 1
+                self.last_error = f"{type(e).__name__}: {e}"
+                print(f"[WARN] settings reload failed, keeping version {old.version}: {self.last_error}")
+                return False
+            self._sig = self._signature(new)  # limits_file có thể đã đổi đường dẫn
+            pinned = {k: getattr(old, k) for k in STARTUP_ONLY if getattr(new, k) != getattr(old, k)}
+            if pinned:
+                print(f"[WARN] settings reload: {', '.join(pinned)} only change on restart, keeping current values")
+                new = _stamp(new.model_copy(update=pinned))
+            if new.version == old.version:
+                return False  # chỉ đổi mtime / comment
+            self._cur = (new, gen + 1)
+            self.reloads += 1
+            self.last_error = None
+            return True
+
+    def start(self):
+        if self._thread or not self.current.reload_enabled:
+            return
+        self._thread = threading.Thread(target=self._loop, name="sbx-settings-reload", daemon=True)
+        self._thread.start()
+
+    def close(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+    def _loop(self):
+        while not self._stop.wait(max(0.1, self.current.reload_poll_s)):
+            try:
+                self.check()
+            except Exception:
+                traceback.print_exc()
+
+    def stats(self) -> dict:
+        snap, gen = self._cur
+        return {
+            "version": snap.version, "generation": gen, "reloads": self.reloads,
+            "reload_errors": self.reload_errors, "last_error": self.last_error,
+        }
 
@@ -3,7 +3,13 @@ import requests, time
 def test_lifecycle():
     # giả định API đang chạy localhost:8000 (bạn có thể chuyển sang httpx + TestClient nếu muốn)
     jid = requests.post("http://localhost:8000/jobs", json={"code":"print('ok')","entry":"main.py"}).json()["job_id"]
-    requests.post(f"http://localhost:8000/jobs/{jid}/run")
-    time.sleep(0.5)
-    st = requests.get(f"http://localhost:8000/jobs/{jid}").json()
+    r = requests.post(f"http://localhost:8000/jobs/{jid}/run")
+    assert r.status_code == 202
+    # run chỉ enqueue -> poll tới khi job xong
+    deadline = time.time() + 10
+    while True:
+        st = requests.get(f"http://localhost:8000/jobs/{jid}").json()
+        if st["status"] not in ("QUEUED", "RUNNING") or time.time() > deadline:
+            break
+        time.sleep(0.1)
     assert st["status"] in ("FINISHED","FAILED","TIMEOUT")
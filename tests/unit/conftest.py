@@ -0,0 +1,43 @@
+# tests/unit: logic thuần, chạy không cần root / cgroup / rootfs (HOST mode)
+import os, sys
+from pathlib import Path
+
+import pytest
+
+os.environ.setdefault("USE_CGROUP", "0")
+sys.path.insert(0, str(Path(__file__).resolve().parents[2] / "src"))
+
+from sandbox.services.job_store import JobStore  # noqa: E402
+from sandbox.services.orchestrator import Orchestrator  # noqa: E402
+from sandbox.settings import LiveSettings, Settings  # noqa: E402
+
+
+@pytest.fixture
+def store(tmp_path):
+    st = JobStore(f"sqlite:///{tmp_path}/jobs.db")
+    yield st
+    st.close()
+
+
+@pytest.fixture
+def make_orc(tmp_path, store):
+    """Orchestrator HOST mode (không có rootfs), chạy đồng bộ: không supervisor, không cache."""
+    made = []
+
+    def make(**kw) -> Orchestrator:
+        s = Settings(**{"rootfs": tmp_path / "no-rootfs", "jobs_dir": tmp_path / "jobs",
+                        "limits_file": tmp_path / "limits.yaml", "supervisor_enabled": False,
+                        "compile_cache_enabled": False, "result_cache_enabled": False,
+                        "default_timeout_s": 10, **kw})
+        made.append(Orchestrator(store, LiveSettings(s)))
+        return made[-1]
+    yield make
+    for o in made:
+        o.disk_watch.close()
+        if o.zygote_pool is not None:
+            o.zygote_pool.close()
+
+
+@pytest.fixture
+def orc(make_orc):
+    return make_orc()
@@ -0,0 +1,98 @@
+import os, time
+from datetime import datetime, timedelta
+
+import pytest
+
+from sandbox.services.artifact_manager import ArtifactManager
+from sandbox.services.artifact_store import ArtifactStore
+from sandbox.services.job_store import Job, JobStatus
+
+
+@pytest.fixture
+def art(tmp_path):
+    return ArtifactStore(tmp_path / "jobs")
+
+
+def _mk(art, store, job_id, status=JobStatus.FINISHED, age_s=0.0, junk=0):
+    wd = art.job_workdir(job_id)
+    wd.mkdir(parents=True)
+    art.write_code(job_id, "main.py", "print(1)\n")
+    (wd / "stdout.log").write_text("hello world\n" * 2000)
+    if junk:
+        (wd / "junk.bin").write_bytes(os.urandom(junk))
+    done = None if status in (JobStatus.QUEUED, JobStatus.RUNNING) else datetime.utcnow() - timedelta(seconds=age_s)
+    store.add(Job(id=job_id, status=status, created_at=datetime.utcnow(), finished_at=done))
+
+
+def _wait(pred, timeout=10.0):
+    end = time.monotonic() + timeout
+    while not pred():
+        assert time.monotonic() < end, "timed out"
+        time.sleep(0.05)
+
+
+def _manager(art, store, **kw) -> ArtifactManager:
+    m = ArtifactManager(art, store, settle_s=1, interval_s=0.1, **kw)
+    m.start()
+    _wait(lambda: m.stats()["scan_done"] and not m.stats()["trash_backlog"])
+    return m
+
+
+def _jobs(art) -> list[str]:
+    return sorted(p for p in os.listdir(art.jobs_dir) if not p.startswith("."))
+
+
+def test_retention_by_status(art, store):
+    _mk(art, store, "old", JobStatus.FINISHED, age_s=1000)
+    _mk(art, store, "failed", JobStatus.FAILED, age_s=1000)
+    _mk(art, store, "queued", JobStatus.QUEUED)
+    (art.jobs_dir / "orphan").mkdir()
+    m = _manager(art, store, retention={"default": 3600, "FINISHED": 500})
+    try:
+        assert _jobs(art) == ["failed", "orphan", "queued"]
+        st = m.stats()
+        assert st["deleted"] == {"retention": 1, "quota": 0}
+        assert st["jobs"] == 2  # job QUEUED không được tính
+        assert art.log_file("failed", "stdout").name == "stdout.log.gz"
+        assert art.log_file("queued", "stdout").name == "stdout.log"
+    finally:
+        m.close()
+
+
+def test_zero_retention_keeps_forever(art, store):
+    _mk(art, store, "old", JobStatus.FINISHED, age_s=10 ** 8)
+    m = _manager(art, store, retention={"default": 0})
+    try:
+        assert _jobs(art) == ["old"]
+    finally:
+        m.close()
+
+
+def test_quota_drops_oldest_first(art, store):
+    for i, age in enumerate((300, 100, 200)):
+        _mk(art, store, f"j{i}", age_s=age, junk=256 << 10)
+    m = _manager(art, store, max_total_bytes=600 << 10, compress=False)
+    try:
+        assert _jobs(art) == ["j1", "j2"]
+        st = m.stats()
+        assert st["deleted"] == {"retention": 0, "quota": 1}
+        assert st["bytes"] <= 600 << 10
+    finally:
+        m.close()
+
+
+def test_hold_protects_rerun(art, store):
+    _mk(art, store, "j")
+    m = _manager(art, store, retention={"FINISHED": 1})
+    try:
+        _wait(lambda: not (art.jobs_dir / "j").exists())  # quét lúc khởi động -> hết hạn -> xoá
+        _mk(art, store, "j2")
+        m.job_done("j2", "FINISHED", "main.py")
+        _wait(lambda: m.stats()["jobs"] == 1)  # đã settle + nén log
+        m.hold("j2")  # chạy lại: bỏ khỏi GC, bỏ log nén của lần trước
+        assert m.stats()["jobs"] == 0
+        assert art.log_file("j2", "stdout") is None
+        time.sleep(1.5)
+        assert _jobs(art) == ["j2"]
+    finally:
+        m.close()
@@ -0,0 +1,66 @@
+import gzip
+
+import pytest
+
+from sandbox.services.artifact_store import COMPRESS_MIN_BYTES, ArtifactStore, utf8_safe_len
+
+TEXT = "xin chào thế giới 🎉 " * 400  # ký tự 1, 2, 3 và 4 byte
+
+
+@pytest.mark.parametrize("data, n", [
+    (b"", 0),
+    (b"abc", 3),
+    ("é".encode(), 2),
+    ("é".encode()[:1], 0),
+    (b"a" + "ế".encode()[:2], 1),
+    (b"a" + "🎉".encode()[:3], 1),
+    ("a🎉".encode(), 5),
+    (b"a\x80", 2),  # byte tiếp nối lạc: không phải ký tự dở -> giữ nguyên
+])
+def test_utf8_safe_len(data, n):
+    assert utf8_safe_len(data) == n
+
+
+@pytest.fixture
+def art(tmp_path):
+    a = ArtifactStore(tmp_path / "jobs")
+    a.job_workdir("j").mkdir(parents=True)
+    a.log_path("j", "stdout").write_bytes(TEXT.encode())
+    return a
+
+
+def _read_all(art: ArtifactStore, limit: int) -> str:
+    out, off = [], 0
+    while True:
+        r = art.read_log_range("j", "stdout", off, limit)
+        out.append(r["data"])
+        off = r["next_offset"]
+        if r["eof"]:
+            return "".join(out)
+
+
+def test_read_log_range_gz_matches_plain(art):
+    raw = TEXT.encode()
+    assert len(raw) >= COMPRESS_MIN_BYTES
+    plain = [art.read_log_range("j", "stdout", off, 1000) for off in (0, 1001, len(raw) - 3, len(raw) + 10)]
+    assert _read_all(art, 7) == TEXT
+
+    assert art.compress_log("j", "stdout")[0] == len(raw)
+    assert not art.log_path("j", "stdout").exists()
+    assert art.log_file("j", "stdout").name == "stdout.log.gz"
+    assert art.log_size("j", "stdout") == len(raw)
+    assert [art.read_log_range("j", "stdout", off, 1000) for off in (0, 1001, len(raw) - 3, len(raw) + 10)] == plain
+    assert _read_all(art, 7) == TEXT
+    assert art.read_logs("j")["stdout"] == TEXT
+
+
+def test_small_log_not_compressed(art):
+    art.log_path("j", "stderr").write_bytes(b"x" * (COMPRESS_MIN_BYTES - 1))
+    assert art.compress_log("j", "stderr") == (0, 0)
+    assert art.log_file("j", "stderr").name == "stderr.log"
+
+
+def test_gz_is_plain_gzip(art):
+    art.compress_log("j", "stdout")
+    with gzip.open(art.log_file("j", "stdout"), "rt") as f:
+        assert f.read() == TEXT
@@ -0,0 +1,49 @@
+import os, shutil
+from pathlib import Path
+
+import pytest
+
+from sandbox.services.job_store import JobStatus
+
+# CHROOT mode cần rootfs có gcc (vd /srv/sbx/rootfs) + quyền tạo user/mount namespace
+ROOTFS = Path(os.environ.get("SBX_TEST_ROOTFS", "/srv/sbx/rootfs"))
+needs_rootfs = pytest.mark.skipif(not (ROOTFS / "usr/bin/gcc").exists() or shutil.which("unshare") is None,
+                                  reason=f"no rootfs with gcc at {ROOTFS} (set SBX_TEST_ROOTFS)")
+
+CODE = r"""
+#include <stdio.h>
+int main(void) {
+    int x;
+    if (scanf("%d", &x) != 1) x = 41;
+    printf("%d\n", x + 1);
+    FILE *f = fopen("build/planted", "w");  /* build/ chạy được nhưng không ghi được */
+    printf("%s\n", f ? "writable" : "read-only");
+    return 0;
+}
+"""
+
+
+def _run_c(orc) -> tuple:
+    jid = orc.submit(CODE, "main.c", "c")
+    orc.run(jid)
+    job = orc.store.get(jid)
+    return job.status, job.reason, orc.art.read_logs(jid)["stdout"]
+
+
+@pytest.mark.skipif(shutil.which("gcc") is None, reason="no gcc on host")
+def test_c_job_host_mode(make_orc):
+    status, reason, out = _run_c(make_orc(c_compiler=shutil.which("gcc")))
+    assert (status, reason) == (JobStatus.FINISHED, None)
+    assert out.splitlines()[0] == "42"
+
+
+@needs_rootfs
+@pytest.mark.parametrize("overlay", [True, False])
+def test_c_job_chroot_noexec_work(make_orc, tmp_path, overlay):
+    (tmp_path / "scratch").mkdir()
+    orc = make_orc(rootfs=ROOTFS, rootfs_overlay=overlay, rootfs_scratch_dir=tmp_path / "scratch",
+                   noexec_work=True)
+    assert orc.exec.rootfs_ready()
+    status, reason, out = _run_c(orc)
+    assert (status, reason) == (JobStatus.FINISHED, None)
+    assert out.splitlines() == ["42", "read-only"]
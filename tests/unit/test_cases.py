@@ -0,0 +1,13 @@
+from sandbox.services.job_store import CaseVerdict, JobStatus
+
+
+def test_case_job_runs_twice(orc, store):
+    jid = orc.submit_cases("print(input())", "main.py",
+                           [{"stdin": "1\n", "expected": "1\n"}, {"stdin": "2\n", "expected": "3\n"}])
+    for _ in range(2):
+        orc.run(jid)
+        job = store.get(jid)
+        assert job.status == JobStatus.FAILED
+        assert job.reason == "case 1: WA"
+        assert job.cases_passed == 1
+        assert [r.verdict for r in store.get_case_results(jid)] == [CaseVerdict.OK, CaseVerdict.WA]
@@ -0,0 +1,68 @@
+import time
+
+from sandbox.executor.diskwatch import DiskWatch
+from sandbox.services.job_store import CaseVerdict, JobStatus
+
+LIMIT = 1 << 20
+WRITE = "open('big.bin', 'wb').write(b'x' * (4 << 20))\n"
+
+
+def test_job_killed_while_running(make_orc):
+    orc = make_orc(work_max_bytes=LIMIT)
+    jid = orc.submit(WRITE + "import time; time.sleep(8)\n", use_cache=False)
+    t0 = time.monotonic()
+    orc.run(jid)
+    job = orc.store.get(jid)
+    assert time.monotonic() - t0 < 5  # bị kill ngay khi vượt, không chờ tới timeout
+    assert job.status == JobStatus.FAILED
+    assert job.reason.startswith("disk quota exceeded: wrote ")
+
+
+def test_write_then_exit_between_polls(make_orc):
+    orc = make_orc(work_max_bytes=LIMIT)
+    orc.disk_watch.interval_s = 60  # chỉ còn lần đo lúc process thoát
+    jid = orc.submit(WRITE, use_cache=False)
+    orc.run(jid)
+    job = orc.store.get(jid)
+    assert job.status == JobStatus.FAILED and job.reason.startswith("disk quota exceeded")
+
+    small = orc.submit("open('s.bin', 'wb').write(b'x' * 1000)\n", use_cache=False)
+    orc.run(small)
+    assert orc.store.get(small).status == JobStatus.FINISHED
+    assert orc.disk_watch.stats() == {"watching": 0, "exceeded_total": 1}
+
+
+def test_quota_per_case(make_orc):
+    orc = make_orc(work_max_bytes=LIMIT)
+    # mỗi case ghi 600 KB: cộng dồn vượt quota nhưng từng case thì không
+    code = "import sys\nn = int(input())\nopen(f'out{n}.bin', 'wb').write(b'x' * (600 << 10))\nprint(n)\n"
+    jid = orc.submit_cases(code, "main.py", [{"stdin": f"{i}\n", "expected": f"{i}\n"} for i in range(3)])
+    orc.run(jid)
+    assert orc.store.get(jid).status == JobStatus.FINISHED
+
+    code = "n = int(input())\nif n == 1:\n    " + WRITE + "print(n)\n"
+    jid = orc.submit_cases(code, "main.py", [{"stdin": f"{i}\n", "expected": f"{i}\n"} for i in range(3)])
+    orc.run(jid)
+    job = orc.store.get(jid)
+    assert job.status == JobStatus.FAILED
+    assert job.reason.startswith("case 1: disk quota exceeded")
+    assert [r.verdict for r in orc.store.get_case_results(jid)] == [CaseVerdict.OK, CaseVerdict.RE]
+
+
+def test_disk_watch_rebase(tmp_path):
+    hits = []
+    dw = DiskWatch(interval_s=60)
+    try:
+        tok = dw.watch(tmp_path, 8192, hits.append)
+        (tmp_path / "a").write_bytes(b"x" * 6000)
+        dw.check(tok, rebase=True)
+        (tmp_path / "b").write_bytes(b"x" * 6000)
+        dw.check(tok)
+        assert hits == []
+        (tmp_path / "c").write_bytes(b"x" * 6000)
+        dw.check(tok)
+        assert len(hits) == 1 and hits[0] > 8192
+        dw.unwatch(tok)
+        assert dw.stats() == {"watching": 0, "exceeded_total": 1}
+    finally:
+        dw.close()
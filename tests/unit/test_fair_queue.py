@@ -0,0 +1,57 @@
+import threading
+
+from sandbox.services.fair_queue import FairQueue
+
+
+def _drain(q: FairQueue) -> list[str]:
+    out = []
+    while q.qsize():
+        out.append(q.get()[0])
+    return out
+
+
+def test_higher_class_first():
+    q = FairQueue(["interactive", "batch"])
+    q.put("b1", "batch", "t")
+    q.put("i1", "interactive", "t")
+    q.put("b2", "batch", "t")
+    assert q.depth() == {"interactive": 1, "batch": 2}
+    assert q.get() == ("i1", "interactive", "t")
+    assert _drain(q) == ["b1", "b2"]
+
+
+def test_tenants_share_a_class_round_robin():
+    q = FairQueue(["batch"])
+    for j in ("a1", "a2", "a3"):
+        q.put(j, "batch", "A")
+    q.put("b1", "batch", "B")  # tới sau nhưng không phải chờ hết job của A
+    assert _drain(q) == ["a1", "b1", "a2", "a3"]
+
+
+def test_tenant_weights():
+    q = FairQueue(["batch"], {"A": 2.0})
+    for j in ("a1", "a2", "a3", "a4"):
+        q.put(j, "batch", "A")
+    for j in ("b1", "b2"):
+        q.put(j, "batch", "B")
+    assert _drain(q) == ["a1", "b1", "a2", "a3", "b2", "a4"]
+
+
+def test_idle_class_forgets_history():
+    q = FairQueue(["batch"])
+    for j in ("a1", "a2", "a3"):
+        q.put(j, "batch", "A")
+    assert _drain(q) == ["a1", "a2", "a3"]
+    q.put("a4", "batch", "A")
+    q.put("b1", "batch", "B")
+    assert _drain(q) == ["a4", "b1"]  # A không bị "nợ" vì đã chạy nhiều lúc hàng đợi vắng
+
+
+def test_close_wakes_blocked_get():
+    q = FairQueue(["batch"])
+    got = []
+    t = threading.Thread(target=lambda: got.append(q.get()))
+    t.start()
+    q.close()
+    t.join(timeout=2)
+    assert got == [None]
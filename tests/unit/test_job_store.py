@@ -0,0 +1,72 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from sandbox.services.job_store import Job, JobStatus, decode_cursor, encode_cursor
+
+T0 = datetime(2026, 1, 1, 12, 0, 0)
+
+
+def _job(i: int, status=JobStatus.FINISHED, **kw) -> Job:
+    return Job(id=f"j{i:03d}", status=status, created_at=T0 + timedelta(seconds=i // 2), **kw)
+
+
+def test_cursor_roundtrip():
+    job = _job(7)
+    assert decode_cursor(encode_cursor(job)) == (job.created_at, job.id)
+
+
+@pytest.mark.parametrize("bad", ["", "!!!", "bm8tc2VwYXJhdG9y"])  # "no-separator"
+def test_decode_cursor_rejects_garbage(bad):
+    with pytest.raises(ValueError):
+        decode_cursor(bad)
+
+
+def test_list_jobs_pages_without_gaps(store):
+    store.add_many(_job(i) for i in range(25))  # 2 job / giây -> trùng created_at, phân biệt bằng id
+    seen, cursor, late = [], None, 100
+    while True:
+        page, cursor = store.list_jobs(cursor=cursor, limit=10)
+        seen += [j.id for j in page]
+        if cursor is None:
+            break
+        late += 1
+        store.add(_job(late))  # job mới nhất chen vào giữa chừng không làm lặp/mất job của trang sau
+    assert seen == [f"j{i:03d}" for i in reversed(range(25))]
+
+
+def test_list_jobs_filters(store):
+    store.add_many([_job(1, tenant="a"), _job(2, JobStatus.RUNNING, tenant="a"), _job(3, tenant="b"),
+                    _job(4, JobStatus.QUEUED, tenant="a")])
+    page, cursor = store.list_jobs(statuses=list(JobStatus)[:2], tenant="a", limit=1)
+    assert [j.id for j in page] == ["j004"] and cursor is not None
+    page, cursor = store.list_jobs(statuses=list(JobStatus)[:2], tenant="a", cursor=cursor, limit=1)
+    assert [j.id for j in page] == ["j002"] and cursor is None
+
+
+def test_get_does_not_recache_stale_row(store):
+    """Miss cache, đọc row RUNNING; job kết thúc trước khi get() kịp cache -> không được cache bản cũ."""
+    store.add(_job(1, JobStatus.RUNNING))
+    store._active.clear()
+    done = store.get("j001")
+    done.status = JobStatus.FINISHED
+    store._active.clear()
+
+    real = store.SessionLocal
+
+    def racing():
+        s = real()
+        db_get = s.get
+
+        def get(*a, **kw):
+            row = db_get(*a, **kw)
+            store.SessionLocal = real
+            store.update(done)  # ghi + bỏ khỏi cache trong lúc get() đang giữ row cũ
+            return row
+        s.get = get
+        return s
+
+    store.SessionLocal = racing
+    assert store.get("j001").status == JobStatus.RUNNING  # row đọc trước update
+    assert "j001" not in store._active
+    assert store.get("j001").status == JobStatus.FINISHED
@@ -0,0 +1,76 @@
+from sandbox.services.result_cache import ResultCache
+
+
+def _workdir(tmp_path, out: str = "ok\n"):
+    wd = tmp_path / "work"
+    wd.mkdir(exist_ok=True)
+    (wd / "stdout.log").write_text(out)
+    (wd / "stderr.log").write_text("")
+    return wd
+
+
+def _put(cache, key, fp, wd, runner="python"):
+    cache.put(key, fp, wd, {"status": "FINISHED", "exit_code": 0, "output_truncated": False}, runner=runner)
+
+
+def test_fingerprint_change_only_drops_same_runner(tmp_path):
+    cache = ResultCache(tmp_path / "cache")
+    wd = _workdir(tmp_path)
+    _put(cache, "aa01", "fp-py", wd, "python")
+    _put(cache, "bb01", "fp-c", wd, "c")  # HOST mode: fingerprint khác theo toolchain của runner
+    _put(cache, "cc01", "fp-java", wd, "java")
+    assert cache.get("aa01", wd) is not None
+    assert cache.stats()["entries"] == 3
+
+    _put(cache, "aa02", "fp-py2", wd, "python")  # đổi môi trường của python
+    assert cache.get("aa01", wd) is None
+    assert cache.get("bb01", wd) is not None
+    assert cache.get("cc01", wd) is not None
+
+
+def test_miss_then_hit_copies_logs(tmp_path):
+    cache = ResultCache(tmp_path / "cache")
+    _put(cache, "aa01", "fp", _workdir(tmp_path, "hello\n"))
+    other = tmp_path / "other"
+    other.mkdir()
+    assert cache.get("ff01", other) is None
+    meta = cache.get("aa01", other)
+    assert meta["status"] == "FINISHED" and meta["exit_code"] == 0
+    assert (other / "stdout.log").read_text() == "hello\n"
+    assert cache.stats()["hits"] == 1 and cache.stats()["misses"] == 1
+
+
+def test_evicts_least_recently_used_over_max_entries(tmp_path):
+    cache = ResultCache(tmp_path / "cache", max_entries=2)
+    wd = _workdir(tmp_path)
+    _put(cache, "aa01", "fp", wd)
+    _put(cache, "aa02", "fp", wd)
+    assert cache.get("aa01", wd) is not None  # aa01 mới dùng -> aa02 là cũ nhất
+    _put(cache, "aa03", "fp", wd)
+    assert cache.get("aa02", wd) is None
+    assert cache.get("aa01", wd) is not None
+    assert cache.get("aa03", wd) is not None
+    assert cache.stats()["evictions"] == 1
+    assert not (tmp_path / "cache" / "aa" / "aa02").exists()
+
+
+def test_evicts_over_max_bytes(tmp_path):
+    cache = ResultCache(tmp_path / "cache", max_bytes=250)
+    wd = _workdir(tmp_path, "x" * 100)
+    for i in range(4):
+        _put(cache, f"aa0{i}", "fp", wd)
+    st = cache.stats()
+    assert st["entries"] == 2 and st["bytes"] == 200
+    assert cache.get("aa00", wd) is None and cache.get("aa03", wd) is not None
+
+
+def test_reload_keeps_entries_and_runner(tmp_path):
+    wd = _workdir(tmp_path)
+    cache = ResultCache(tmp_path / "cache")
+    _put(cache, "aa01", "fp-py", wd, "python")
+    _put(cache, "bb01", "fp-c", wd, "c")
+    cache = ResultCache(tmp_path / "cache")  # restart service
+    assert cache.stats()["entries"] == 2
+    _put(cache, "bb02", "fp-c2", wd, "c")
+    assert cache.get("bb01", wd) is None
+    assert cache.get("aa01", wd) is not None
@@ -0,0 +1,71 @@
+import os
+
+from pathlib import Path
+
+from sandbox.executor.rootfs import resolve_in
+from sandbox.runners.java_runner import JavaRunner
+from sandbox.services.job_store import JobStatus
+
+
+def _fake_rootfs(tmp_path):
+    root = tmp_path / "rootfs"
+    (root / "usr/bin").mkdir(parents=True)
+    (root / "usr/lib/jvm/jdk/bin").mkdir(parents=True)
+    (root / "etc/alternatives").mkdir(parents=True)
+    os.symlink("usr/bin", root / "bin")
+    (root / "usr/bin/bash").write_text("")
+    (root / "usr/bin/cc-12").write_text("")
+    os.symlink("cc-12", root / "usr/bin/cc")
+    (root / "usr/lib/jvm/jdk/bin/javac").write_text("")
+    (root / "usr/lib/jvm/jdk/bin/java").write_text("")
+    (root / "usr/lib/jvm/jdk/release").write_text('JAVA_VERSION="17.0.9"\n')
+    os.symlink("/usr/lib/jvm/jdk/bin/java", root / "usr/bin/java")
+    os.symlink("/usr/lib/jvm/jdk/bin/javac", root / "etc/alternatives/javac")  # tuyệt đối: theo trong rootfs
+    os.symlink("/etc/alternatives/javac", root / "usr/bin/javac")
+    os.symlink("/usr/bin/loop", root / "usr/bin/loop")
+    return root
+
+
+def test_resolve_in(tmp_path):
+    root = _fake_rootfs(tmp_path)
+    assert resolve_in(root, "/bin/cc") == root / "usr/bin/cc-12"
+    assert resolve_in(root, "/usr/bin/javac") == root / "usr/lib/jvm/jdk/bin/javac"
+    assert resolve_in(root, "/usr/../bin/bash") == root / "usr/bin/bash"
+    assert resolve_in(root, "/usr/bin/gcc") is None
+    assert resolve_in(root, "/usr/bin/loop") is None
+
+
+def test_compiler_checked_in_rootfs(make_orc, tmp_path):
+    root = _fake_rootfs(tmp_path)
+    orc = make_orc(rootfs=root, rootfs_overlay=False, c_compiler="/usr/bin/gcc")  # có trên host, không có trong image
+    assert orc.exec.rootfs_ready()
+    jid = orc.submit("int main(void){return 0;}", "main.c", "c")
+    orc.run(jid)
+    job = orc.store.get(jid)
+    assert job.status == JobStatus.FAILED
+    assert job.reason == f"compiler not available in rootfs {root}: /usr/bin/gcc"
+
+
+def test_java_cds_uses_rootfs_jdk(tmp_path):
+    root = _fake_rootfs(tmp_path)
+    calls = []
+
+    def dump(argv, workdir):
+        calls.append(argv)
+        (workdir / "jdk.jsa").write_text("archive")
+        return True
+
+    java = JavaRunner(java="/usr/bin/java", cds_dir=Path("/srv/sbx/java-cds"), rootfs=root)
+    out = java.ensure_cds(dump)
+    assert out.parent == Path("/srv/sbx/java-cds")  # đường dẫn job thấy trong chroot
+    assert (root / "srv/sbx/java-cds" / out.name).read_text() == "archive"
+    assert calls[0][0] == "/usr/bin/java" and calls[0][-1] == "-XX:SharedArchiveFile=/work/jdk.jsa"
+    assert f"-XX:SharedArchiveFile={out}" in java.command(Path("/work/Main.java"))
+    assert java.ensure_cds(dump) == out and len(calls) == 1
+
+    # đổi JDK trong rootfs -> key mới
+    (root / "usr/lib/jvm/jdk/release").write_text('JAVA_VERSION="21.0.1"\n')
+    other = JavaRunner(java="/usr/bin/java", cds_dir=Path("/srv/sbx/java-cds"), rootfs=root)
+    assert other.cds_archive() != out
+    assert "-Xshare:auto" not in other.command(Path("/work/Main.java"))
+    assert JavaRunner(java="/usr/bin/nojava", cds_dir=Path("/srv/sbx/java-cds"), rootfs=root).cds_archive() is None
@@ -0,0 +1,46 @@
+import threading, time
+
+from sandbox.services.job_store import JobStatus
+from sandbox.services.scheduler import JobScheduler
+
+
+def _wait(pred, timeout=10.0):
+    end = time.monotonic() + timeout
+    while not pred():
+        assert time.monotonic() < end, "timed out"
+        time.sleep(0.05)
+
+
+def test_cancel_untracked_running_job_is_left_alone(orc, store):
+    sched = JobScheduler(orc, store)
+    jid = orc.submit("print(1)")
+    job = store.get(jid)
+    job.status = JobStatus.RUNNING  # vd còn lại sau restart
+    store.update(job)
+    assert sched.cancel(jid) == "untracked"
+    assert store.get(jid).status == JobStatus.RUNNING
+
+
+def test_cancel_sync_run_kills_process(orc, store):
+    sched = JobScheduler(orc, store)
+    jid = orc.submit("import time\nprint('up', flush=True)\ntime.sleep(30)")
+    t = threading.Thread(target=orc.run, args=(jid,))
+    t.start()
+    _wait(lambda: orc.art.read_logs(jid)["stdout"] == "up\n")
+    t0 = time.monotonic()
+    assert sched.cancel(jid) == "running"
+    t.join(timeout=10)
+    assert not t.is_alive() and time.monotonic() - t0 < 5
+    assert store.get(jid).status == JobStatus.KILLED
+
+
+def test_cancel_queued_and_finished(orc, store):
+    sched = JobScheduler(orc, store)
+    jid = orc.submit("print(1)")
+    assert sched.enqueue(jid)
+    assert sched.cancel(jid) == "queued"
+    assert store.get(jid).status == JobStatus.KILLED
+    orc.run(jid)  # chạy lại ngoài scheduler
+    assert store.get(jid).status == JobStatus.FINISHED
+    assert sched.cancel(jid) == "FINISHED"
+    assert store.get(jid).status == JobStatus.FINISHED
@@ -0,0 +1,37 @@
+from sandbox.settings import LiveSettings
+
+CONF = """\
+defaults:
+  timeout_s: {timeout}
+priority:
+  default_class: {default}
+  classes:
+{classes}
+"""
+
+
+def _write(path, timeout=8, default="batch", classes=("interactive", "batch")):
+    path.write_text(CONF.format(timeout=timeout, default=default,
+                                classes="".join(f"    {c}: {{cpu_weight: 100}}\n" for c in classes)))
+
+
+def test_reload_keeps_priority_classes(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    conf = tmp_path / "sandbox.yaml"
+    monkeypatch.setenv("SANDBOX_CONF", str(conf))
+    _write(conf)
+    live = LiveSettings()
+    v0 = live.current.version
+
+    # chỉ đổi class -> bị giữ lại, snapshot không đổi
+    _write(conf, default="bulk", classes=("bulk",))
+    assert live.reload() is False
+    assert live.current.version == v0
+
+    # đổi kèm giá trị áp dụng nóng -> phần đó vẫn được reload
+    _write(conf, timeout=3, default="bulk", classes=("bulk",))
+    assert live.reload() is True
+    s = live.current
+    assert s.default_timeout_s == 3
+    assert list(s.priority_classes) == ["interactive", "batch"]
+    assert s.priority_default == "batch"
@@ -0,0 +1,18 @@
+from sandbox.services.job_store import JobStatus
+
+CODE = "import sys\nprint(sys.version)\nprint(sys.stdin.read()[::-1])\n"
+
+
+def _run(orc) -> str:
+    jid = orc.submit(CODE)
+    orc.run(jid)
+    assert orc.store.get(jid).status == JobStatus.FINISHED
+    return orc.art.read_logs(jid)["stdout"]
+
+
+def test_zygote_matches_plain_runner(make_orc):
+    plain = _run(make_orc())
+    zyg = make_orc(zygote_enabled=True, zygote_pool_size=1)
+    assert zyg.zygote_pool.python == zyg.runners["python"].python
+    assert _run(zyg) == plain
+    assert zyg.zygote_pool._idle.queue[0].jobs == 1  # job đã chạy qua zygote